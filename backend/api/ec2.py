@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from backend.functions import ec2_functions
+from backend.functions import ec2_functions, executor
+from backend.functions.jobs import jobs
+from backend.functions.sync_engine import sync_engine
+from backend.api.streaming import ndjson_response, sse_job_response
 
 router = APIRouter()
 
@@ -10,38 +14,89 @@ class EC2CreateRequest(BaseModel):
     ami: str
     pubkey_path: str
 
+class EC2BatchCreateRequest(BaseModel):
+    name_template: str  # e.g. "web-{n}"
+    count: int
+    instance_type: str
+    ami: str
+    pubkey_path: str
+
 class InstanceIdentifierRequest(BaseModel):
     instance_identifier: str
 
-@router.post("/create")
+class BulkInstanceRequest(BaseModel):
+    instance_identifiers: List[str]
+
+@router.post("/create", status_code=202)
 async def create_ec2(request: EC2CreateRequest):
-    result = ec2_functions.create_ec2(
+    # Launching and booting takes minutes, so it runs as a job; follow /create/jobs/{job_id}
+    job = await executor.run(
+        "ec2",
+        ec2_functions.start_create_ec2,
         request.instance_name, 
         request.instance_type, 
         request.ami, 
         request.pubkey_path
     )
+    if job.get("error"):
+        raise HTTPException(status_code=400, detail=job["error"])
+    return {"message": f"Launching instance '{request.instance_name}'.", **job}
+
+@router.post("/create/batch")
+async def create_ec2_batch(request: EC2BatchCreateRequest):
+    # One launch for the whole batch; each instance comes back with a job_id to follow
+    result = await executor.run(
+        "ec2",
+        ec2_functions.create_ec2_batch,
+        request.name_template,
+        request.count,
+        request.instance_type,
+        request.ami,
+        request.pubkey_path
+    )
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
-    return {
-        "instance_id": result["id"], 
-        "instance_name": result["name"], 
-        "public_ip": result["public_ip"],
-        "message": result["message"]
-    }
+    return result
+
+@router.get("/create/jobs/{job_id}")
+async def create_ec2_status(job_id: str):
+    job = await executor.run("ec2", jobs.get, job_id)
+    if job is None or job["kind"] != "ec2-create":
+        raise HTTPException(status_code=404, detail=f"Launch job '{job_id}' not found.")
+    return job
+
+@router.get("/create/jobs/{job_id}/events")
+async def create_ec2_events(job_id: str):
+    # Server-sent events for each launch phase: pending, running, ip-assigned, status-ok
+    job = await executor.run("ec2", jobs.get, job_id)
+    if job is None or job["kind"] != "ec2-create":
+        raise HTTPException(status_code=404, detail=f"Launch job '{job_id}' not found.")
+    return sse_job_response("ec2", job_id)
 
 @router.get("/list")
-async def list_ec2():
-    instances = ec2_functions.list_ec2()
-    return instances
+async def list_ec2(
+    fresh: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False
+    ):
+    if stream:
+        return ndjson_response("ec2", ec2_functions.iter_ec2_pages())
+    if limit or cursor:
+        return await executor.run("ec2", ec2_functions.list_ec2_page, limit, cursor)
+    # Served from the synced inventory store; fresh=1 resyncs from AWS first
+    listing = await executor.run("ec2", sync_engine.read, "ec2", fresh=fresh)
+    if listing["synced_at"] is None:
+        return {"error": listing["error"]}
+    return {"instances": listing["items"], "synced_at": listing["synced_at"]}
 
 @router.post("/start")
 async def start_ec2(request: InstanceIdentifierRequest):
     instance_identifier = request.instance_identifier
     if instance_identifier.startswith("i-"):
-        result = ec2_functions.start_ec2(instance_id=instance_identifier)
+        result = await executor.run("ec2", ec2_functions.start_ec2, instance_id=instance_identifier)
     else:
-        result = ec2_functions.start_ec2(instance_name=instance_identifier)
+        result = await executor.run("ec2", ec2_functions.start_ec2, instance_name=instance_identifier)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return {"message": result["message"]}
@@ -50,9 +105,9 @@ async def start_ec2(request: InstanceIdentifierRequest):
 async def stop_ec2(request: InstanceIdentifierRequest):
     instance_identifier = request.instance_identifier
     if instance_identifier.startswith("i-"):
-        result = ec2_functions.stop_ec2(instance_id=instance_identifier)
+        result = await executor.run("ec2", ec2_functions.stop_ec2, instance_id=instance_identifier)
     else:
-        result = ec2_functions.stop_ec2(instance_name=instance_identifier)
+        result = await executor.run("ec2", ec2_functions.stop_ec2, instance_name=instance_identifier)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return {"message": result["message"]}
@@ -61,9 +116,34 @@ async def stop_ec2(request: InstanceIdentifierRequest):
 async def terminate_ec2(request: InstanceIdentifierRequest):
     instance_identifier = request.instance_identifier
     if instance_identifier.startswith("i-"):
-        result = ec2_functions.delete_ec2(instance_id=instance_identifier)
+        result = await executor.run("ec2", ec2_functions.delete_ec2, instance_id=instance_identifier)
     else:
-        result = ec2_functions.delete_ec2(instance_name=instance_identifier)
+        result = await executor.run("ec2", ec2_functions.delete_ec2, instance_name=instance_identifier)
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return {"message": result["message"]}
+
+async def _bulk_lifecycle(action, request):
+    identifiers = request.instance_identifiers
+    result = await executor.run(
+        "ec2",
+        ec2_functions.bulk_lifecycle,
+        action,
+        instance_ids=[i for i in identifiers if i.startswith("i-")],
+        instance_names=[i for i in identifiers if not i.startswith("i-")]
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+@router.post("/bulk/start")
+async def bulk_start_ec2(request: BulkInstanceRequest):
+    return await _bulk_lifecycle("start", request)
+
+@router.post("/bulk/stop")
+async def bulk_stop_ec2(request: BulkInstanceRequest):
+    return await _bulk_lifecycle("stop", request)
+
+@router.post("/bulk/terminate")
+async def bulk_terminate_ec2(request: BulkInstanceRequest):
+    return await _bulk_lifecycle("terminate", request)
@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from backend.functions import route53_functions
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from backend.functions import route53_functions, executor
+from backend.functions.change_tracker import change_tracker, SYNCED_STATUS
+from backend.functions.sync_engine import sync_engine
+from backend.api.streaming import ndjson_response, sse_response
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -21,23 +25,50 @@ class DNSRecordCreateRequest(BaseModel):
 class ZoneCreateRequest(BaseModel):
     zone_name: str
 
+class RecordChange(BaseModel):
+    action: str  # CREATE, UPSERT or DELETE
+    record_name: str
+    record_type: str
+    record_values: List[str] = []
+    ttl: int = 300
+    set_identifier: Optional[str] = None  # picks a weighted/latency/failover record set to DELETE
+
+class BulkRecordRequest(BaseModel):
+    zone_id: str
+    changes: List[RecordChange]
+
 @router.post("/zone/create")
 async def create_zone(request: ZoneCreateRequest):
-    zone_id = route53_functions.create_route53_zone(request.zone_name)
-    if not zone_id:
+    result = await executor.run("route53", route53_functions.create_route53_zone, request.zone_name)
+    if not result:
         raise HTTPException(status_code=400, detail="Error creating hosted zone")
-    return {"zone_id": zone_id, "message": f"Hosted zone '{request.zone_name}' created."}
+    return {**result, "message": f"Hosted zone '{request.zone_name}' created."}
 
 @router.get("/zone/list")
-async def list_zones():
-    zones = route53_functions.list_route53_zones()
-    if zones:
-        return {"zones": zones}
-    return {"message": "No hosted zones found."}
+async def list_zones(
+    fresh: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    stream: bool = False
+    ):
+    if stream:
+        return ndjson_response("route53", route53_functions.iter_route53_zone_pages())
+    if limit or cursor:
+        try:
+            return await executor.run("route53", route53_functions.list_route53_zones_page, limit, cursor)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # Served from the synced inventory store; fresh=1 resyncs from AWS first
+    listing = await executor.run("route53", sync_engine.read, "route53_zones", fresh=fresh)
+    if listing["synced_at"] is None:
+        raise HTTPException(status_code=400, detail=listing["error"])
+    if listing["items"]:
+        return {"zones": listing["items"], "synced_at": listing["synced_at"]}
+    return {"message": "No hosted zones found.", "synced_at": listing["synced_at"]}
 
 @router.delete("/zone/delete")
 async def delete_zone(zone_id: str):
-    response = route53_functions.delete_hosted_zone(zone_id)  
+    response = await executor.run("route53", route53_functions.delete_hosted_zone, zone_id)
     if "error" in response:
         raise HTTPException(status_code=400, detail=response["error"])  
     return response  
@@ -45,7 +76,9 @@ async def delete_zone(zone_id: str):
 @router.post("/record/create")
 async def create_record(request: DNSRecordCreateRequest):
     try:
-        route53_functions.create_route53_record(
+        change = await executor.run(
+            "route53",
+            route53_functions.create_route53_record,
             request.zone_id, 
             request.record_name, 
             request.record_type, 
@@ -54,17 +87,34 @@ async def create_record(request: DNSRecordCreateRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return {"message": f"Record '{request.record_name}' created in zone '{request.zone_id}'."}
+    return {"message": f"Record '{request.record_name}' created in zone '{request.zone_id}'.", "change": change}
 
 @router.get("/record/list")
-async def list_records(zone_id: str):
-    result = route53_functions.list_dns_records(zone_id)
-    return result
+async def list_records(
+    zone_id: str,
+    fresh: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=300),
+    cursor: Optional[str] = None,
+    stream: bool = False
+    ):
+    if stream:
+        return ndjson_response("route53", route53_functions.iter_dns_record_pages(zone_id))
+    if limit or cursor:
+        return await executor.run("route53", route53_functions.list_dns_records, zone_id, limit, cursor)
+    # Served from the synced inventory store; fresh=1 resyncs from AWS first
+    listing = await executor.run("route53", sync_engine.read, "route53_records", zone_id, fresh=fresh)
+    if listing["synced_at"] is None:
+        return {"error": listing["error"]}
+    if not listing["items"]:
+        return {"message": f"No DNS records found in zone {zone_id}.", "synced_at": listing["synced_at"]}
+    return {"records": listing["items"], "synced_at": listing["synced_at"]}
 
 @router.put("/record/update")
 async def update_record(request: DNSRecordUpdateRequest):
     # Check if the record already exists and if its type is different
-    existing_record = route53_functions.get_existing_record(request.zone_id, request.record_name)
+    existing_record = await executor.run(
+        "route53", route53_functions.get_existing_record, request.zone_id, request.record_name, request.record_type
+    )
     if existing_record:
         if existing_record.get("Type") != request.record_type:
             raise HTTPException(
@@ -72,7 +122,9 @@ async def update_record(request: DNSRecordUpdateRequest):
                 detail="Cannot update record type. Please delete the existing record and create a new one."
             )
     try:
-        route53_functions.update_route53_record(
+        change = await executor.run(
+            "route53",
+            route53_functions.update_route53_record,
             request.zone_id, 
             request.record_name, 
             request.record_type, 
@@ -81,9 +133,44 @@ async def update_record(request: DNSRecordUpdateRequest):
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return {"message": f"Record '{request.record_name}' updated in zone '{request.zone_id}'."}
+    return {"message": f"Record '{request.record_name}' updated in zone '{request.zone_id}'.", "change": change}
 
 @router.delete("/record/delete")
-async def delete_record(zone_id: str, record_name: str):
-    route53_functions.delete_route53_record(zone_id, record_name)
-    return {"message": f"Record '{record_name}' deletion initiated in zone '{zone_id}'."}
+async def delete_record(zone_id: str, record_name: str, record_type: Optional[str] = None, set_identifier: Optional[str] = None):
+    change = await executor.run(
+        "route53", route53_functions.delete_route53_record, zone_id, record_name, record_type, set_identifier
+    )
+    return {"message": f"Record '{record_name}' deletion initiated in zone '{zone_id}'.", "change": change}
+
+@router.post("/record/bulk")
+async def bulk_records(request: BulkRecordRequest):
+    result = await executor.run(
+        "route53",
+        route53_functions.bulk_record_changes,
+        request.zone_id,
+        [change.dict() for change in request.changes]
+    )
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result)
+    return {"message": f"{result['applied_changes']} change(s) applied to zone '{request.zone_id}'.", **result}
+
+@router.get("/change/{change_id}")
+async def get_change(change_id: str):
+    change = await executor.run("route53", change_tracker.get, change_id)
+    if change is None:
+        raise HTTPException(status_code=404, detail=f"Change {change_id} not found.")
+    return change
+
+@router.get("/change/{change_id}/events")
+async def change_events(change_id: str):
+    # Server-sent events with the change status until Route53 reports it INSYNC. The first
+    # read may ask Route53 and starts tracking the change; the events only read its record.
+    change = await executor.run("route53", change_tracker.get, change_id)
+    if change is None:
+        raise HTTPException(status_code=404, detail=f"Change {change_id} not found.")
+    return sse_response(
+        "route53",
+        lambda: change_tracker.peek(change_id),
+        lambda change: change["status"] == SYNCED_STATUS,
+        f"Change {change_id} not found."
+    )
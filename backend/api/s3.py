@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
 from pydantic import BaseModel
-from backend.functions import s3_functions
+from backend.functions import s3_functions, s3_presign, s3_uploads, executor
+from backend.functions.jobs import jobs
+from backend.functions.sync_engine import sync_engine
+from backend.api.streaming import ndjson_response, sse_job_response
 
 router = APIRouter()
 
@@ -8,21 +12,65 @@ class S3CreateRequest(BaseModel):
     bucket_name: str
     access: str 
 
+class StreamUploadRequest(BaseModel):
+    bucket_name: str
+    key: str
+    part_size_mb: Optional[int] = None
+
+class PresignUploadRequest(BaseModel):
+    bucket_name: str
+    key: str
+    method: str = "put"
+    expires_in: Optional[int] = None
+    content_type: Optional[str] = None
+    max_size_mb: Optional[int] = None
+
+class PresignMultipartRequest(BaseModel):
+    bucket_name: str
+    key: str
+    parts: int
+    expires_in: Optional[int] = None
+
+class MultipartPart(BaseModel):
+    part_number: int
+    etag: str
+
+class CompleteMultipartRequest(BaseModel):
+    bucket_name: str
+    key: str
+    upload_id: str
+    parts: Optional[List[MultipartPart]] = None
+
 @router.post("/create")
 async def create_s3(request: S3CreateRequest):
     try:
-        s3_functions.create_s3(request.bucket_name, request.access)
+        await executor.run("s3", s3_functions.create_s3, request.bucket_name, request.access)
         return {"message": f"S3 bucket '{request.bucket_name}' created successfully with {request.access} access."}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))  
 
 
 @router.get("/list")
-async def list_s3():
-    buckets = s3_functions.list_s3() 
-    if not buckets:
-        return {"message": "No S3 buckets found."}
-    return {"buckets": buckets}
+async def list_s3(
+    fresh: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False
+    ):
+    if stream:
+        return ndjson_response("s3", s3_functions.iter_s3_pages())
+    if limit or cursor:
+        result = await executor.run("s3", s3_functions.list_s3_page, limit, cursor)
+        if "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        return result
+    # Served from the synced inventory store; fresh=1 resyncs from AWS first
+    listing = await executor.run("s3", sync_engine.read, "s3", fresh=fresh)
+    if listing["synced_at"] is None:
+        raise HTTPException(status_code=400, detail=listing["error"])
+    if not listing["items"]:
+        return {"message": "No S3 buckets found.", "synced_at": listing["synced_at"]}
+    return {"buckets": listing["items"], "synced_at": listing["synced_at"]}
 
 
 @router.post("/upload")
@@ -31,17 +79,131 @@ async def upload_file(
     file: UploadFile = File(...)
     ):
     try:
-        s3_functions.upload_to_s3(bucket_name, file)
+        await executor.run("s3", s3_functions.upload_to_s3, bucket_name, file)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     return {"message": f"File uploaded successfully to bucket '{bucket_name}'."}
 
-@router.delete("/delete/{bucket_name}")
+# Streaming upload: POST creates the multipart upload, PUT streams the raw file body
+# (again from ?offset=<resume_offset> after an interruption), GET/events report progress.
+@router.post("/upload/stream")
+async def start_stream_upload(request: StreamUploadRequest):
+    part_size = request.part_size_mb * 1024 * 1024 if request.part_size_mb else None
+    try:
+        job = await executor.run("s3", s3_uploads.start_upload, request.bucket_name, request.key, part_size)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job
+
+@router.put("/upload/stream/{job_id}")
+async def stream_upload(job_id: str, request: Request, offset: int = 0):
+    content_length = request.headers.get("content-length")
+    try:
+        job = await s3_uploads.stream_upload(
+            job_id,
+            request.stream(),
+            offset=offset,
+            total_bytes=int(content_length) if content_length else None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"File '{job['key']}' uploaded successfully to bucket '{job['bucket_name']}'.", **job}
+
+@router.get("/upload/stream/{job_id}")
+async def stream_upload_status(job_id: str):
+    try:
+        job = await executor.run("s3", s3_uploads.upload_status, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found.")
+    return job
+
+@router.get("/upload/stream/{job_id}/events")
+async def stream_upload_events(job_id: str):
+    if await executor.run("s3", s3_uploads.get_upload, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found.")
+    return sse_job_response("s3", job_id)
+
+@router.delete("/upload/stream/{job_id}")
+async def abort_stream_upload(job_id: str):
+    try:
+        job = await executor.run("s3", s3_uploads.abort_upload, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found.")
+    return {"message": f"Upload of '{job['key']}' aborted."}
+
+# Presigned URLs: the client transfers directly with S3, bypassing this server
+@router.post("/presign/upload")
+async def presign_upload(request: PresignUploadRequest):
+    try:
+        return await executor.run(
+            "s3",
+            s3_presign.presign_upload,
+            request.bucket_name,
+            request.key,
+            method=request.method.lower(),
+            expires_in=request.expires_in,
+            content_type=request.content_type,
+            max_size=request.max_size_mb * 1024 * 1024 if request.max_size_mb else None
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/presign/download")
+async def presign_download(bucket_name: str, key: str, expires_in: Optional[int] = None):
+    try:
+        return await executor.run("s3", s3_presign.presign_download, bucket_name, key, expires_in)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/presign/multipart")
+async def presign_multipart(request: PresignMultipartRequest):
+    try:
+        return await executor.run(
+            "s3", s3_presign.presign_multipart, request.bucket_name, request.key, request.parts, request.expires_in
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/presign/multipart/complete")
+async def complete_presigned_multipart(request: CompleteMultipartRequest):
+    parts = [part.dict() for part in request.parts] if request.parts else None
+    try:
+        return await executor.run(
+            "s3", s3_presign.complete_multipart, request.bucket_name, request.key, request.upload_id, parts
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/presign/multipart")
+async def abort_presigned_multipart(bucket_name: str, key: str, upload_id: str):
+    try:
+        return await executor.run("s3", s3_presign.abort_multipart, bucket_name, key, upload_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/delete/{bucket_name}", status_code=202)
 async def delete_s3(bucket_name: str):
+    # Emptying a big bucket takes a while, so it runs as a job; poll /delete/jobs/{job_id}
     try:
-        s3_functions.delete_s3(bucket_name)
+        job = await executor.run("s3", s3_functions.start_delete_s3, bucket_name)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return {"message": f"S3 bucket '{bucket_name}' deleted successfully."}
+    return {"message": f"Deletion of S3 bucket '{bucket_name}' started.", **job}
 
+@router.get("/delete/jobs/{job_id}")
+async def delete_s3_status(job_id: str):
+    job = await executor.run("s3", jobs.get, job_id)
+    if job is None or job["kind"] != "s3-delete":
+        raise HTTPException(status_code=404, detail=f"Deletion job '{job_id}' not found.")
+    return job
 
+@router.get("/delete/jobs/{job_id}/events")
+async def delete_s3_events(job_id: str):
+    job = await executor.run("s3", jobs.get, job_id)
+    if job is None or job["kind"] != "s3-delete":
+        raise HTTPException(status_code=404, detail=f"Deletion job '{job_id}' not found.")
+    return sse_job_response("s3", job_id)
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from fastapi.responses import StreamingResponse
+from backend.functions import executor
+from backend.functions.event_hub import event_hub
+from backend.functions.jobs import FINISHED_STATES, jobs
+
+
+def ndjson_response(service, pages):
+    # Streams one JSON object per line as soon as each AWS page arrives, so the browser
+    # can render the first rows while the rest of a big listing is still being fetched.
+    async def lines():
+        try:
+            async for page in executor.iterate(service, pages):
+                for item in page:
+                    yield json.dumps(item, default=str) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def sse_job_response(service, job_id, interval=0.5):
+    # Pushes the job record as a server-sent event whenever it changes, until it finishes
+    return sse_response(
+        service,
+        lambda: jobs.get(job_id),
+        lambda job: job["status"] in FINISHED_STATES,
+        f"Job {job_id} not found.",
+        interval,
+    )
+
+
+def sse_response(service, load, finished, missing_msg, interval=0.5):
+    # Polls the record returned by load() and sends it as a server-sent event each time it
+    # changes, until finished(record) is true. load() runs on the executor of `service`, as
+    # with shared state it reads the shared store.
+    async def events():
+        last = None
+        while True:
+            record = await executor.run(service, load)
+            if record is None:
+                yield f"event: error\ndata: {json.dumps({'error': missing_msg})}\n\n"
+                return
+            if record != last:
+                yield f"data: {json.dumps(record, default=str)}\n\n"
+                last = record
+            if finished(record):
+                return
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def sse_live_response(snapshots, keepalive=15):
+    # Streams the inventory: one "snapshot" event per listing from snapshots(), then the
+    # "diff" and "drop" events the sync engine publishes. A client that falls behind is
+    # sent fresh snapshots instead of the events it missed.
+    async def events():
+        subscriber = event_hub.subscribe()
+        try:
+            while True:
+                # Subscribed before the snapshots are read, so no change between them is lost
+                subscriber.overflowed = False
+                for event in await snapshots():
+                    yield _sse_event(event)
+                while not subscriber.overflowed:
+                    try:
+                        event = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    yield _sse_event(event)
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+        finally:
+            event_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _sse_event(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
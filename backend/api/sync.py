@@ -0,0 +1,51 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from backend.api.streaming import sse_live_response
+from backend.functions import executor
+from backend.functions.sync_engine import sync_engine, resource_types
+
+router = APIRouter()
+
+# Executor service used for each resource type's sync
+SYNC_SERVICES = {"ec2": "ec2", "s3": "s3", "route53_zones": "route53", "route53_records": "route53"}
+
+@router.get("/status")
+async def sync_status():
+    # Last sync time, duration, item count and error of every mirrored listing
+    return sync_engine.status()
+
+@router.post("/resync")
+async def resync(resource_type: Optional[str] = None, scope: str = ""):
+    # Without a type every listing is marked for the background worker; with one it is
+    # synced now (scope is the zone ID for route53_records)
+    if resource_type is None:
+        for listing_type in ("ec2", "s3", "route53_zones"):
+            sync_engine.mark_dirty(listing_type)
+        return {"message": "Resync of all resources requested."}
+    if resource_type not in resource_types:
+        raise HTTPException(status_code=400, detail=f"Unknown resource type '{resource_type}'.")
+    if resource_type == "route53_records" and not scope:
+        raise HTTPException(status_code=400, detail="Resyncing route53_records needs the zone ID as scope.")
+    synced = await executor.run(SYNC_SERVICES[resource_type], sync_engine.sync, resource_type, scope, force=True)
+    listing = sync_engine.status()["listings"]
+    state = next((state for state in listing if state["type"] == resource_type and state["scope"] == scope), None)
+    if not synced:
+        raise HTTPException(status_code=502, detail=state["error"] if state else "Sync failed.")
+    return state
+
+@router.get("/events")
+async def live_events():
+    # Live dashboard: a snapshot of every listing, then the changes each sync finds.
+    # All open tabs share the sync engine's single poll loop.
+    return sse_live_response(_snapshots)
+
+async def _snapshots():
+    listings = await asyncio.gather(*(_snapshot(listing_type) for listing_type in ("ec2", "s3", "route53_zones")))
+    zones = listings[-1]["items"]
+    listings += await asyncio.gather(*(_snapshot("route53_records", zone["id"]) for zone in zones))
+    return listings
+
+async def _snapshot(resource_type, scope=""):
+    state = await executor.run(SYNC_SERVICES[resource_type], sync_engine.read, resource_type, scope, with_ids=True)
+    return {"event": "snapshot", "type": resource_type, "scope": scope, **state}
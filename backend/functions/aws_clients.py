@@ -0,0 +1,92 @@
+import os
+import threading
+from backend.functions.metrics import metrics
+from backend.functions.rate_limiter import rate_limiter
+
+# -------------------------
+# SHARED CLIENT REGISTRY
+# -------------------------
+# boto3 clients are thread-safe once built, but building one is expensive
+# (endpoint resolution, credential chain, a fresh connection pool). Every function
+# module gets its clients from here so connections are reused across requests.
+# Each client is paced by the shared rate limiter of its service and region, and
+# reports its calls to the metrics registry. boto3 itself is only imported when the
+# first client is built (see warm_up), which keeps it off the import path of the app.
+#
+# This is also where the cloud provider is chosen: AWS_UI_PROVIDER=simulator hands out
+# in-memory simulated clients instead, so the app runs without an AWS account.
+
+PROVIDER = os.getenv("AWS_UI_PROVIDER", "aws")  # aws | simulator
+if PROVIDER not in ("aws", "simulator"):
+    raise ValueError(f"Unknown AWS_UI_PROVIDER '{PROVIDER}', expected 'aws' or 'simulator'")
+
+MAX_POOL_CONNECTIONS = int(os.getenv("AWS_UI_MAX_POOL_CONNECTIONS", "50"))
+MAX_ATTEMPTS = int(os.getenv("AWS_UI_MAX_ATTEMPTS", "5"))
+WARM_UP_SERVICES = ("ec2", "s3", "route53", "resourcegroupstaggingapi")
+
+
+def _client_config(service):
+    from botocore.config import Config
+
+    config = Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        # Standard retries back off with jitter; the rate limiter does the adaptive pacing
+        retries={"max_attempts": MAX_ATTEMPTS, "mode": "standard"},
+    )
+    if service == "s3":
+        # Presigned S3 URLs must use SigV4 to work in every region and for up to 7 days
+        config = config.merge(Config(signature_version="s3v4"))
+    return config
+
+
+# boto3 sessions are not thread-safe, so creation is serialized with this lock.
+_lock = threading.Lock()
+_sessions = {}
+_clients = {}
+
+
+def _get_session(profile):
+    session = _sessions.get(profile)
+    if session is None:
+        import boto3
+
+        session = boto3.session.Session(profile_name=profile)
+        _sessions[profile] = session
+    return session
+
+
+def get_client(service, region=None, profile=None):
+    profile = profile or os.getenv("AWS_PROFILE")
+    key = (service, region, profile)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        # Another thread may have built it while we were waiting
+        client = _clients.get(key)
+        if client is None:
+            if PROVIDER == "simulator":
+                from backend.functions import simulator
+
+                client = simulator.client(service, region)
+            else:
+                session = _get_session(profile)
+                client = session.client(service, region_name=region, config=_client_config(service))
+            rate_limiter.attach(client, service)
+            metrics.attach(client, service)
+            _clients[key] = client
+    return client
+
+
+def reset():
+    with _lock:
+        _clients.clear()
+        _sessions.clear()
+
+
+def warm_up(services=WARM_UP_SERVICES):
+    # Builds the default clients (importing boto3 and loading the service models) so the
+    # first requests don't pay for it
+    for service in services:
+        get_client(service)
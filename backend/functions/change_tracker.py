@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from backend.functions.aws_clients import get_client
+from backend.functions.jobs import JOB_RETENTION
+from backend.functions.shared_state import shared_state
+
+# -------------------------
+# ROUTE53 CHANGE TRACKING
+# -------------------------
+# Route53 accepts a change as PENDING and applies it to its name servers later.
+# Every change we submit is registered here and a single background thread polls
+# get_change for all pending ones, backing off per change, so any number of clients
+# can wait for INSYNC while AWS sees one poll per change per interval. With shared
+# state the worker that submitted a change polls it and the others read its record from
+# the shared store. That is why the poller runs in every worker instead of only on the
+# leader: the pending changes it polls are the ones held in its own memory, and each
+# change is in exactly one worker's.
+
+POLL_INITIAL = float(os.getenv("AWS_UI_CHANGE_POLL_INITIAL", "2"))
+POLL_MAX = float(os.getenv("AWS_UI_CHANGE_POLL_MAX", "30"))
+POLL_BACKOFF = 1.5
+SYNCED_STATUS = "INSYNC"
+
+
+def change_key(change_id):
+    # "/change/C123" -> "C123", so the ID can be used in URLs
+    return change_id.split("/")[-1]
+
+
+class ChangeTracker:
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._changes = {}
+        self._next_poll = {}  # change ID -> (monotonic time of next poll, current interval)
+        self._poller = None
+
+    def track(self, change_info, **fields):
+        # Registers a ChangeInfo returned by Route53 and returns its public record
+        now = time.time()
+        change = {
+            "change_id": change_key(change_info["Id"]),
+            "status": change_info.get("Status"),
+            "submitted_at": change_info.get("SubmittedAt"),
+            "updated_at": now,
+            **fields,
+        }
+        with self._lock:
+            self._prune(now)
+            self._changes[change["change_id"]] = change
+            if change["status"] != SYNCED_STATUS:
+                self._schedule(change["change_id"], POLL_INITIAL)
+            change = dict(change)
+        _share(change)
+        return change
+
+    def get(self, change_id):
+        change = self.peek(change_id)
+        if change is not None:
+            return change
+        # Not submitted by this process (or pruned); look it up once and follow it from here
+        change_id = change_key(change_id)
+        try:
+            change_info = get_client("route53").get_change(Id=change_id)["ChangeInfo"]
+        except Exception as e:
+            print(f"Error retrieving change {change_id}: {e}")
+            return None
+        return self.track(change_info)
+
+    def peek(self, change_id):
+        # The record this worker or the shared store holds, without asking Route53
+        change_id = change_key(change_id)
+        with self._lock:
+            change = self._changes.get(change_id)
+            if change is not None:
+                return dict(change)
+        if shared_state.enabled:
+            return shared_state.store.get("route53_changes", change_id)
+        return None
+
+    def _schedule(self, change_id, interval):
+        self._next_poll[change_id] = (time.monotonic() + interval, interval)
+        if self._poller is None or not self._poller.is_alive():
+            self._poller = threading.Thread(target=self._run, name="route53-change-poller", daemon=True)
+            self._poller.start()
+        self._lock.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._next_poll:
+                    self._poller = None
+                    return
+                now = time.monotonic()
+                due = [change_id for change_id, (at, _) in self._next_poll.items() if at <= now]
+                if not due:
+                    self._lock.wait(min(at for at, _ in self._next_poll.values()) - now)
+                    continue
+            for change_id in due:
+                self._poll(change_id)
+
+    def _poll(self, change_id):
+        try:
+            change_info = get_client("route53").get_change(Id=change_id)["ChangeInfo"]
+            error = None
+        except Exception as e:
+            print(f"Error polling change {change_id}: {e}")
+            change_info, error = None, str(e)
+        with self._lock:
+            _, interval = self._next_poll.pop(change_id, (None, POLL_INITIAL))
+            change = self._changes.get(change_id)
+            if change is None:
+                return
+            status = change_info.get("Status") if change_info is not None else change["status"]
+            # Only real transitions touch the record, so SSE clients are not sent duplicates
+            changed = (status, error) != (change["status"], change.get("error"))
+            if changed:
+                change.update(status=status, error=error, updated_at=time.time())
+            if change["status"] != SYNCED_STATUS:
+                self._schedule(change_id, min(interval * POLL_BACKOFF, POLL_MAX))
+            else:
+                print(f"Route53 change {change_id} is {SYNCED_STATUS}.")
+            change = dict(change)
+        if changed:
+            _share(change)
+
+    def _prune(self, now):
+        expired = [
+            change_id for change_id, change in self._changes.items()
+            if change["status"] == SYNCED_STATUS and now - change["updated_at"] > JOB_RETENTION
+        ]
+        for change_id in expired:
+            del self._changes[change_id]
+
+
+def _share(change):
+    if shared_state.enabled:
+        shared_state.store.put("route53_changes", change["change_id"], change, JOB_RETENTION)
+
+
+change_tracker = ChangeTracker()
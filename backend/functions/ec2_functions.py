@@ -1,15 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import hashlib
 import os
-import boto3
+import threading
+import time
+from backend.functions.aws_clients import get_client
+from backend.functions.instance_index import instance_index
+from backend.functions.instance_watcher import instance_watcher
+from backend.functions.inventory_invalidation import inventory_invalidation
+from backend.functions.jobs import jobs
+from backend.functions.launch_catalog import resolve_image
+from backend.functions.shared_state import shared_state
+from backend.functions.single_flight import single_flight
 
-config_path = os.path.join(os.path.dirname(__file__), "ec2configuration", "configuration.txt")
-data = {}
-with open(config_path, "r") as file:
-    for line in file:
-        key, value = line.strip().split(":", 1)
-        data[key.strip()] = value.strip()
-subnet_id = data.get("subnet-id")
-security_group = data.get("security-group")
+MANAGED_FILTER = [{"Name": "tag:cli-managed", "Values": ["true"]}]
+
+# Bulk lifecycle: boto3 method, response key, and the states an instance must be in
+# for a name to resolve to it.
+LIFECYCLE_ACTIONS = {
+    "start": ("start_instances", "StartingInstances", ["stopped"]),
+    "stop": ("stop_instances", "StoppingInstances", ["running"]),
+    "terminate": ("terminate_instances", "TerminatingInstances", ["pending", "running", "stopping", "stopped"]),
+}
+LIFECYCLE_BATCH_SIZE = 100  # instance IDs per start/stop/terminate call
+
+# Launch quota: cli-managed instances that may be pending or running at the same time
+MAX_RUNNING_INSTANCES = int(os.getenv("AWS_UI_MAX_RUNNING_INSTANCES", "2"))
+QUOTA_STATES = ["pending", "running"]
+MAX_BATCH_LAUNCH = 100
+# run_instances tags every instance it launches alike, so a batch launches one instance
+# per call (with its own Name tag), LAUNCH_WORKERS calls at a time
+LAUNCH_WORKERS = int(os.getenv("AWS_UI_EC2_LAUNCH_WORKERS", "8"))
+# Instances we launched in the last RECENT_LAUNCH_WINDOW seconds count against the quota
+# even if describe_instances doesn't show them yet. With shared state the check runs
+# under a lock shared by all workers and the recent launches of all workers count.
+RECENT_LAUNCH_WINDOW = 60
+SHARED_LAUNCH_TIMEOUT = 60
+_launch_lock = threading.Lock()
+_recent_launches = {}  # instance ID -> launch time
+
+# Key pairs known to exist in EC2, keyed by (public key fingerprint, key name), and the
+# fingerprint of each public key file by (path, mtime, size) so unchanged files aren't re-read.
+# Key pairs checked without a readable public key file are keyed by (None, key name).
+_key_pairs = set()
+_key_files = {}
 
 def get_or_create_key_pair_boto(pubkey_path: str) -> str:
     # Check if running inside a Docker container
@@ -34,36 +68,67 @@ def get_or_create_key_pair_boto(pubkey_path: str) -> str:
         key_name = basename[:-4]
     else:
         key_name = basename
-    ec2_client = boto3.client("ec2")
+    # The file is only needed to import a key pair EC2 doesn't have. Inside the container the
+    # rewritten path may not exist, which is fine as long as the key pair is already in EC2.
+    fingerprint = None
+    public_key = None
+    if os.path.isfile(pubkey_path):
+        try:
+            stat = os.stat(pubkey_path)
+            file_key = (pubkey_path, stat.st_mtime_ns, stat.st_size)
+            fingerprint = _key_files.get(file_key)
+            if fingerprint is None:
+                public_key = _read_public_key(pubkey_path)
+                fingerprint = hashlib.sha256(public_key.encode()).hexdigest()
+                _key_files[file_key] = fingerprint
+        except OSError as e:
+            error_msg = f"Error reading public key file '{pubkey_path}': {e}"
+            print(error_msg)
+            return {"error": error_msg}
+    if (fingerprint, key_name) in _key_pairs:
+        return key_name
+
+    ec2_client = get_client("ec2")
     try:
         ec2_client.describe_key_pairs(KeyNames=[key_name])
         print(f"Key pair '{key_name}' exists.")
     except ec2_client.exceptions.ClientError:
         print(f"Key pair '{key_name}' not found. Importing your public key.")
-        with open(pubkey_path, 'r', encoding='utf-8') as f:
-            public_key = f.read().strip()
-        ec2_client.import_key_pair(KeyName=key_name, PublicKeyMaterial=public_key)
+        try:
+            if public_key is None:
+                public_key = _read_public_key(pubkey_path)
+            ec2_client.import_key_pair(KeyName=key_name, PublicKeyMaterial=public_key)
+        except OSError as e:
+            error_msg = f"Error: Key pair '{key_name}' does not exist in EC2 and its public key can't be read: {e}"
+            print(error_msg)
+            return {"error": error_msg}
+        except ec2_client.exceptions.ClientError as e:
+            # A concurrent launch with the same key imported it first
+            if e.response["Error"]["Code"] != "InvalidKeyPair.Duplicate":
+                error_msg = f"Error importing key pair '{key_name}': {e}"
+                print(error_msg)
+                return {"error": error_msg}
+    _key_pairs.add((fingerprint, key_name))
     return key_name
 
+def _read_public_key(pubkey_path):
+    with open(pubkey_path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+def _forget_key_pair(key_name):
+    # The key pair was deleted in EC2 behind our back; check again on the next launch
+    for known in [known for known in _key_pairs if known[1] == key_name]:
+        _key_pairs.discard(known)
+
 def delete_ec2(instance_id=None, instance_name=None):
-    ec2_client = boto3.client("ec2")
+    ec2_client = get_client("ec2")
     if not instance_id:
         if instance_name:
-            response = ec2_client.describe_instances(
-                Filters=[
-                    {"Name": "tag:Name", "Values": [instance_name]},
-                    {"Name": "tag:cli-managed", "Values": ["true"]}
-                ]
-            )
-            instances = [
-                instance for reservation in response.get("Reservations", [])
-                for instance in reservation.get("Instances", [])
-            ]
-            if not instances:
-                error_msg = f"No instance found with name {instance_name}."
-                print(error_msg)
-                return {"error": error_msg}
-            instance_id = instances[0]["InstanceId"]
+            resolved = instance_index.resolve(instance_name, LIFECYCLE_ACTIONS["terminate"][2])
+            if "error" in resolved:
+                print(resolved["error"])
+                return resolved
+            instance_id = resolved["instance_id"]
         else:
             error_msg = "Error: Must specify either instance_id or instance_name."
             print(error_msg)
@@ -71,6 +136,8 @@ def delete_ec2(instance_id=None, instance_name=None):
     try:
         ec2_client.terminate_instances(InstanceIds=[instance_id])
         success_msg = f"Terminating instance {instance_id}"
+        inventory_invalidation.invalidate("ec2")
+        instance_index.mark_changed([instance_id])
         print(success_msg)
         return {"message": success_msg}
     except Exception as e:
@@ -79,25 +146,14 @@ def delete_ec2(instance_id=None, instance_name=None):
         return {"error": error_msg}
 
 def start_ec2(instance_id=None, instance_name=None):
-    ec2_client = boto3.client("ec2")
+    ec2_client = get_client("ec2")
     if not instance_id:
         if instance_name:
-            response = ec2_client.describe_instances(
-                Filters=[
-                    {"Name": "tag:Name", "Values": [instance_name]},
-                    {"Name": "tag:cli-managed", "Values": ["true"]},
-                    {"Name": "instance-state-name", "Values": ["stopped"]}
-                ]
-            )
-            instances = [
-                instance for reservation in response.get("Reservations", [])
-                for instance in reservation.get("Instances", [])
-            ]
-            if not instances:
-                error_msg = f"No stopped instance found with name {instance_name}."
-                print(error_msg)
-                return {"error": error_msg}
-            instance_id = instances[0]["InstanceId"]
+            resolved = instance_index.resolve(instance_name, ["stopped"])
+            if "error" in resolved:
+                print(resolved["error"])
+                return resolved
+            instance_id = resolved["instance_id"]
         else:
             error_msg = "Error: Must specify either instance_id or instance_name."
             print(error_msg)
@@ -105,6 +161,8 @@ def start_ec2(instance_id=None, instance_name=None):
     try:
         ec2_client.start_instances(InstanceIds=[instance_id])
         success_msg = f"Starting instance {instance_id}"
+        inventory_invalidation.invalidate("ec2")
+        instance_index.mark_changed([instance_id])
         print(success_msg)
         return {"message": success_msg}
     except Exception as e:
@@ -112,146 +170,271 @@ def start_ec2(instance_id=None, instance_name=None):
         print(error_msg)
         return {"error": error_msg}
 
-def create_ec2(cli_name, cli_instance_type, cli_ami, cli_pubkey_path):
+def start_create_ec2(cli_name, cli_instance_type, cli_ami, cli_pubkey_path):
+    # Validates the request, then launches on a background thread and returns a job the
+    # client can follow through the launch phases (see instance_watcher).
     if not os.path.isfile(cli_pubkey_path):
         error_msg = f"Error: Public key file '{cli_pubkey_path}' does not exist."
         print(error_msg)
         return {"error": error_msg}
-    final_key_name = get_or_create_key_pair_boto(cli_pubkey_path)
+    launch_spec = resolve_image(cli_instance_type, cli_ami)
+    if "error" in launch_spec:
+        return launch_spec
+    job = jobs.create(
+        "ec2-create",
+        instance_name=cli_name,
+        instance_type=cli_instance_type,
+        ami=cli_ami,
+        phase="queued",
+        transitions=[],
+        instance_id=None,
+        state=None,
+        public_ip=None,
+        system_status=None,
+        instance_status=None,
+        error=None,
+    )
+    threading.Thread(
+        target=_run_create_job,
+        args=(job["job_id"], cli_name, cli_instance_type, cli_ami, cli_pubkey_path),
+        daemon=True,
+    ).start()
+    return job
 
-    if cli_instance_type == "t4g.nano":
-        if cli_ami == "ubuntu":
-            resolved_ami = "ami-0a7a4e87939439934"  # ARM Ubuntu
-            user_data_file = os.path.join(os.path.dirname(__file__), "ec2configuration", "user_data_ubuntu.sh")
+def _run_create_job(job_id, cli_name, cli_instance_type, cli_ami, cli_pubkey_path):
+    jobs.update(job_id, status="running", phase="launching")
+    try:
+        result = create_ec2(cli_name, cli_instance_type, cli_ami, cli_pubkey_path)
+    except Exception as e:
+        result = {"error": f"Error creating instance: {e}"}
+    if "error" in result:
+        jobs.update(job_id, status="failed", error=result["error"])
+        return
+    jobs.update(
+        job_id,
+        instance_id=result["id"],
+        user_data_sha256=result["user_data_sha256"],
+        phase="pending",
+        state="pending",
+        transitions=[{"phase": "pending", "at": time.time()}],
+    )
+    instance_watcher.watch(result["id"], job_id)
 
-        elif cli_ami == "amazon-linux":
-            resolved_ami = "ami-0c518311db5640eff"  # ARM Amazon Linux
-            user_data_file = os.path.join(os.path.dirname(__file__), "ec2configuration", "user_data_amazon-linux.sh")
+def create_ec2(cli_name, cli_instance_type, cli_ami, cli_pubkey_path):
+    launch_spec = _prepare_launch(cli_instance_type, cli_ami, cli_pubkey_path)
+    if "error" in launch_spec:
+        return launch_spec
+    launched = _launch_instances([cli_name], cli_instance_type, launch_spec)
+    if "error" in launched:
+        return launched
+    instance = launched["instances"][0]
+    success_msg = f"EC2 Instance Created: - Instance ID: {instance['id']}, Name: {instance['name']}, Public IP: {instance['public_ip']}"
+    print(success_msg)
+    return {**instance, "message": success_msg}
 
-        else:
-            error_msg = "Invalid AMI selection."
-            print(error_msg)
-            return {"error": error_msg}
-    elif cli_instance_type == "t3.nano":
-        if cli_ami == "ubuntu":
-            resolved_ami = "ami-04b4f1a9cf54c11d0"  # x86_64 Ubuntu
-            user_data_file = os.path.join(os.path.dirname(__file__), "ec2configuration", "user_data_ubuntu.sh")
+def create_ec2_batch(name_template, count, cli_instance_type, cli_ami, cli_pubkey_path):
+    # Launches `count` instances. "{n}" in the template is replaced by 1..count (e.g. "web-{n}");
+    # without it "-{n}" is appended. Each instance gets a launch job the watcher follows, like
+    # single creates. Instances that failed to launch are listed with their error.
+    if not 1 <= count <= MAX_BATCH_LAUNCH:
+        return {"error": f"Count must be between 1 and {MAX_BATCH_LAUNCH}."}
+    if "{n}" not in name_template:
+        name_template += "-{n}"
+    names = [name_template.replace("{n}", str(n)) for n in range(1, count + 1)]
+    try:
+        launch_spec = _prepare_launch(cli_instance_type, cli_ami, cli_pubkey_path)
+        if "error" in launch_spec:
+            return launch_spec
+        launched = _launch_instances(names, cli_instance_type, launch_spec)
+        if "error" in launched:
+            return launched
+        for instance in launched["instances"]:
+            if instance["id"] is None:
+                continue
+            job = jobs.create(
+                "ec2-create",
+                instance_name=instance["name"],
+                instance_type=cli_instance_type,
+                ami=cli_ami,
+                status="running",
+                phase="pending",
+                transitions=[{"phase": "pending", "at": time.time()}],
+                instance_id=instance["id"],
+                state="pending",
+                public_ip=instance["public_ip"],
+                system_status=None,
+                instance_status=None,
+                error=None,
+            )
+            instance["job_id"] = job["job_id"]
+            instance_watcher.watch(instance["id"], job["job_id"])
+    except Exception as e:
+        error_msg = f"Error creating instances: {e}"
+        print(error_msg)
+        return {"error": error_msg}
+    started = [instance["name"] for instance in launched["instances"] if instance["id"] is not None]
+    success_msg = f"Launched {len(started)} of {len(names)} instance(s): {', '.join(started)}"
+    print(success_msg)
+    return {"instances": launched["instances"], "message": success_msg}
 
-        elif cli_ami == "amazon-linux":
-            resolved_ami = "ami-085ad6ae776d8f09c"  # x86_64 Amazon Linux
-            user_data_file = os.path.join(os.path.dirname(__file__), "ec2configuration", "user_data_amazon-linux.sh")
+def _prepare_launch(cli_instance_type, cli_ami, cli_pubkey_path):
+    # AMI, user data and key pair all come from memory once warm (see launch_catalog)
+    if not os.path.isfile(cli_pubkey_path):
+        error_msg = f"Error: Public key file '{cli_pubkey_path}' does not exist."
+        print(error_msg)
+        return {"error": error_msg}
+    launch_spec = resolve_image(cli_instance_type, cli_ami)
+    if "error" in launch_spec:
+        return launch_spec
+    key_name = get_or_create_key_pair_boto(cli_pubkey_path)
+    if isinstance(key_name, dict):
+        return key_name
+    return {**launch_spec, "key_name": key_name}
 
-        else:
-            error_msg = "Invalid AMI selection."
+def _launch_instances(names, instance_type, launch_spec):
+    # Checks the quota and launches under one lock, so concurrent requests can't both pass
+    # the check. Returns {"instances"}, where instances that failed have an "error" and no
+    # id, or {"error"} if none launched.
+    ec2_client = get_client("ec2")
+    with _launch_lock, shared_state.lock("ec2-launch", SHARED_LAUNCH_TIMEOUT) as acquired:
+        if not acquired:
+            error_msg = "Another launch is still in progress. Try again shortly."
+            print(error_msg)
+            return {"error": error_msg}
+        now = time.time()
+        if shared_state.enabled:
+            _recent_launches.clear()
+            _recent_launches.update(shared_state.store.get("quota", "ec2_recent_launches") or {})
+        for instance_id, launched_at in list(_recent_launches.items()):
+            if now - launched_at > RECENT_LAUNCH_WINDOW:
+                del _recent_launches[instance_id]
+        active = instance_index.ids_in(QUOTA_STATES)
+        active.update(_recent_launches)
+        if len(active) + len(names) > MAX_RUNNING_INSTANCES:
+            error_msg = (
+                f"Maximum running instances is {MAX_RUNNING_INSTANCES}. Cannot create {len(names)} new instance(s) "
+                f"while {len(active)} are running or pending."
+            )
             print(error_msg)
             return {"error": error_msg}
-    else:
-        error_msg = "Invalid instance type selection."
-        print(error_msg)
-        return {"error": error_msg}
 
-    with open(user_data_file, 'r') as f:
-        user_data_script = f.read()
+        with ThreadPoolExecutor(max_workers=min(LAUNCH_WORKERS, len(names)), thread_name_prefix="ec2-launch") as pool:
+            outcomes = list(pool.map(lambda name: _run_instance(ec2_client, name, instance_type, launch_spec), names))
+        launched = [instance for instance, _ in outcomes if instance is not None]
+        if not launched:
+            return {"error": outcomes[0][1]}
+        for instance in launched:
+            _recent_launches[instance["InstanceId"]] = now
+        if shared_state.enabled:
+            shared_state.store.put("quota", "ec2_recent_launches", _recent_launches, RECENT_LAUNCH_WINDOW)
 
-    max_instances = 2
-    ec2_client = boto3.client("ec2")
-    response = ec2_client.describe_instances(
-        Filters=[
-            {"Name": "tag:cli-managed", "Values": ["true"]},
-            {"Name": "instance-state-name", "Values": ["running"]}
-        ]
-    )
-    running_instances = sum(
-        1 for reservation in response.get("Reservations", [])
-        for _ in reservation.get("Instances", [])
-    )
-    if running_instances >= max_instances:
-        error_msg = "Maximum running instances is 2. Cannot create a new instance if current running instances is 2."
-        print(error_msg)
-        return {"error": error_msg}
+    inventory_invalidation.invalidate("ec2")
+    instances = []
+    for name, (instance, error_msg) in zip(names, outcomes):
+        if instance is None:
+            instances.append({"id": None, "name": name, "public_ip": None, "error": error_msg})
+            continue
+        instances.append({
+            "id": instance["InstanceId"],
+            "name": name,
+            "public_ip": instance.get("PublicIpAddress"),
+            "user_data_sha256": launch_spec["user_data_sha256"],
+        })
+    instance_index.mark_changed(names=names)
+    return {"instances": instances}
 
-    resource_ec2 = boto3.resource("ec2")
-    date_created = datetime.now().strftime("%Y-%m-%d")
-    instance_name = f"{cli_name}"
+def _run_instance(ec2_client, name, instance_type, launch_spec):
+    # Returns (instance, None), or (None, error message) if the launch failed
+    tags = [
+        {"Key": "Name", "Value": name},
+        {"Key": "creation_date", "Value": datetime.now().strftime("%Y-%m-%d")},
+        {"Key": "cli-managed", "Value": "true"},
+        {"Key": "owner", "Value": "itaimoshe"},
+    ]
     try:
-        instances = resource_ec2.create_instances(
-            ImageId=resolved_ami,
+        response = ec2_client.run_instances(
+            ImageId=launch_spec["ami"],
             MinCount=1,
             MaxCount=1,
-            InstanceType=cli_instance_type,
-            KeyName=final_key_name,
+            InstanceType=instance_type,
+            KeyName=launch_spec["key_name"],
             NetworkInterfaces=[{
                 "AssociatePublicIpAddress": True,
                 "DeviceIndex": 0,
-                "SubnetId": subnet_id,
-                "Groups": [security_group],
-            }],
-            TagSpecifications=[{
-                "ResourceType": "instance",
-                "Tags": [
-                    {"Key": "Name", "Value": instance_name},
-                    {"Key": "creation_date", "Value": date_created},
-                    {"Key": "cli-managed", "Value": "true"},
-                    {"Key": "owner", "Value": "itaimoshe"},
-                ]
+                "SubnetId": launch_spec["subnet_id"],
+                "Groups": [launch_spec["security_group"]],
             }],
-            UserData=user_data_script,
+            TagSpecifications=[{"ResourceType": "instance", "Tags": tags}],
+            UserData=launch_spec["user_data"],
         )
     except Exception as e:
+        if "InvalidKeyPair" in str(e):
+            _forget_key_pair(launch_spec["key_name"])
         error_msg = f"Error creating instance: {e}"
         print(error_msg)
-        return {"error": error_msg}
-
-    instance = instances[0]
-    public_ip = instance.public_ip_address
-    success_msg = f"EC2 Instance Created: - Instance ID: {instance.id}, Name: {instance_name}, Public IP: {public_ip}"
-    print(success_msg)
-    return {"id": instance.id, "name": instance_name, "public_ip": public_ip, "message": success_msg}
+        return None, error_msg
+    return response["Instances"][0], None
 
+@single_flight.coalesce("ec2")
 def list_ec2():
-    ec2_client = boto3.client("ec2")
-    instances_list = []
     try:
-        response = ec2_client.describe_instances(
-            Filters=[{"Name": "tag:cli-managed", "Values": ["true"]}]
-        )
-        for reservation in response.get("Reservations", []):
-            for instance in reservation.get("Instances", []):
-                tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
-                name_tag = tags.get("Name", "Unknown")
-                public_ip = instance.get("PublicIpAddress", "N/A")
-                instances_list.append({
-                    "id": instance["InstanceId"],
-                    "name": name_tag,
-                    "public_ip": public_ip,
-                    "state": instance["State"]["Name"]
-                })
+        started = time.monotonic()
+        instances_list = [instance for page in iter_ec2_pages() for instance in page]
+        instance_index.ingest(instances_list, started)
         return {"instances": instances_list}
     except Exception as e:
         error_msg = f"No EC2 instances found: {e}"
         print(error_msg)
         return {"error": error_msg}
 
+@single_flight.coalesce("ec2")
+def list_ec2_page(limit=None, cursor=None):
+    # One page of the listing; pass the returned next_cursor back to get the next one.
+    try:
+        pages = _describe_pages(MANAGED_FILTER, {"MaxItems": limit, "StartingToken": cursor})
+        instances_list = [_format_instance(instance) for instance in _instances_in(pages)]
+        return {"instances": instances_list, "next_cursor": pages.resume_token}
+    except Exception as e:
+        error_msg = f"No EC2 instances found: {e}"
+        print(error_msg)
+        return {"error": error_msg}
+
+def iter_ec2_pages():
+    # Yields one list of instances per AWS page, so callers can stream large fleets.
+    for page in _describe_pages(MANAGED_FILTER):
+        yield [
+            _format_instance(instance)
+            for reservation in page.get("Reservations", [])
+            for instance in reservation.get("Instances", [])
+        ]
+
+def _format_instance(instance):
+    tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
+    return {
+        "id": instance["InstanceId"],
+        "name": tags.get("Name", "Unknown"),
+        "public_ip": instance.get("PublicIpAddress", "N/A"),
+        "state": instance["State"]["Name"]
+    }
+
+def _describe_pages(filters, pagination_config=None):
+    paginator = get_client("ec2").get_paginator("describe_instances")
+    return paginator.paginate(Filters=filters, PaginationConfig=pagination_config or {})
+
+def _instances_in(pages):
+    for page in pages:
+        for reservation in page.get("Reservations", []):
+            yield from reservation.get("Instances", [])
+
 def stop_ec2(instance_id=None, instance_name=None):
-    ec2_client = boto3.client("ec2")
+    ec2_client = get_client("ec2")
     if not instance_id:
         if instance_name:
-            response = ec2_client.describe_instances(
-                Filters=[
-                    {"Name": "tag:Name", "Values": [instance_name]},
-                    {"Name": "tag:cli-managed", "Values": ["true"]},
-                    {"Name": "instance-state-name", "Values": ["running"]}
-                ]
-            )
-            instances = [
-                instance for reservation in response.get("Reservations", [])
-                for instance in reservation.get("Instances", [])
-            ]
-            if not instances:
-                error_msg = f"No running instance found with name {instance_name}."
-                print(error_msg)
-                return {"error": error_msg}
-            instance_id = instances[0]["InstanceId"]
+            resolved = instance_index.resolve(instance_name, ["running"])
+            if "error" in resolved:
+                print(resolved["error"])
+                return resolved
+            instance_id = resolved["instance_id"]
         else:
             error_msg = "Error: Must specify either instance_id or instance_name."
             print(error_msg)
@@ -259,6 +442,8 @@ def stop_ec2(instance_id=None, instance_name=None):
     try:
         ec2_client.stop_instances(InstanceIds=[instance_id])
         success_msg = f"Stopping instance {instance_id}"
+        inventory_invalidation.invalidate("ec2")
+        instance_index.mark_changed([instance_id])
         print(success_msg)
         return {"message": success_msg}
     except Exception as e:
@@ -266,36 +451,57 @@ def stop_ec2(instance_id=None, instance_name=None):
         print(error_msg)
         return {"error": error_msg}
 
-def start_ec2(instance_id=None, instance_name=None):
-    ec2_client = boto3.client("ec2")
-    if not instance_id:
-        if instance_name:
-            response = ec2_client.describe_instances(
-                Filters=[
-                    {"Name": "tag:Name", "Values": [instance_name]},
-                    {"Name": "tag:cli-managed", "Values": ["true"]},
-                    {"Name": "instance-state-name", "Values": ["stopped"]}
-                ]
-            )
-            instances = [
-                instance for reservation in response.get("Reservations", [])
-                for instance in reservation.get("Instances", [])
-            ]
-            if not instances:
-                error_msg = f"No stopped instance found with name {instance_name}."
-                print(error_msg)
-                return {"error": error_msg}
-            instance_id = instances[0]["InstanceId"]
-        else:
-            error_msg = "Error: Must specify either instance_id or instance_name."
-            print(error_msg)
-            return {"error": error_msg}
+def bulk_lifecycle(action, instance_ids=(), instance_names=()):
+    # Applies one lifecycle action to many instances. Unlike the single-instance
+    # functions, a name selects every instance carrying it (in a state the action applies to).
+    if action not in LIFECYCLE_ACTIONS:
+        return {"error": f"Unknown action '{action}'."}
+    method_name, response_key, states = LIFECYCLE_ACTIONS[action]
+    ec2_client = get_client("ec2")
+    results = []
+
+    target_ids = list(dict.fromkeys(instance_ids))
+    seen_ids = set(target_ids)
     try:
-        ec2_client.start_instances(InstanceIds=[instance_id])
-        success_msg = f"Starting instance {instance_id}"
-        print(success_msg)
-        return {"message": success_msg}
+        matches = instance_index.find(list(dict.fromkeys(instance_names)), states)
     except Exception as e:
-        error_msg = f"Error starting instance: {e}"
-        print(error_msg)
-        return {"error": error_msg}
+        return {"error": f"Error resolving instance names: {e}"}
+    for name, ids in matches.items():
+        if not ids:
+            results.append({"identifier": name, "error": f"No {_state_label(states)}instance found with name {name}."})
+        for instance_id in ids:
+            if instance_id not in seen_ids:
+                seen_ids.add(instance_id)
+                target_ids.append(instance_id)
+
+    lifecycle_call = getattr(ec2_client, method_name)
+    for start in range(0, len(target_ids), LIFECYCLE_BATCH_SIZE):
+        batch = target_ids[start:start + LIFECYCLE_BATCH_SIZE]
+        try:
+            changes = lifecycle_call(InstanceIds=batch)[response_key]
+        except Exception:
+            # One bad ID fails the whole call, so retry the batch one instance at a time
+            changes = []
+            for instance_id in batch:
+                try:
+                    changes.extend(lifecycle_call(InstanceIds=[instance_id])[response_key])
+                except Exception as e:
+                    results.append({"identifier": instance_id, "error": f"Error running {action} on instance: {e}"})
+        for change in changes:
+            results.append({
+                "identifier": change["InstanceId"],
+                "instance_id": change["InstanceId"],
+                "previous_state": change["PreviousState"]["Name"],
+                "current_state": change["CurrentState"]["Name"],
+            })
+
+    if target_ids:
+        inventory_invalidation.invalidate("ec2")
+        instance_index.mark_changed(target_ids)
+    succeeded = sum(1 for result in results if "error" not in result)
+    message = f"{action.capitalize()} requested for {succeeded} instance(s), {len(results) - succeeded} failed."
+    print(message)
+    return {"message": message, "results": results}
+
+def _state_label(states):
+    return f"{states[0]} " if len(states) == 1 else ""
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import threading
+from backend.functions.shared_state import HOST_ID, shared_state
+
+# -------------------------
+# LIVE UPDATE HUB
+# -------------------------
+# Fans inventory changes out to every open /api/events stream. The sync engine publishes
+# from its worker thread; each subscriber is an asyncio queue on the server's event loop,
+# so any number of browser tabs share the one sync loop. A subscriber that falls more than
+# MAX_PENDING_EVENTS behind is flagged and sent a fresh snapshot instead. With shared
+# state, events are passed on to the other workers of the host, whose streams read the
+# same inventory store.
+
+MAX_PENDING_EVENTS = int(os.getenv("AWS_UI_EVENTS_MAX_PENDING", "1000"))
+
+
+class Subscriber:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+        self.overflowed = False
+
+    def push(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventHub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        # Must be called from the event loop that will consume the events
+        subscriber = Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        self._fan_out(event)
+        shared_state.publish("live", {"host": HOST_ID, "event": event})
+
+    def _on_remote_event(self, data):
+        if data["host"] == HOST_ID:
+            self._fan_out(data["event"])
+
+    def _fan_out(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.push(event)
+            except RuntimeError:
+                # The subscriber's event loop is closed
+                self.unsubscribe(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_hub = EventHub()
+shared_state.subscribe("live", event_hub._on_remote_event)
@@ -0,0 +1,60 @@
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# -------------------------
+# ASYNC SERVICE LAYER
+# -------------------------
+# The functions in this package are blocking boto3 code. Routers never call them
+# directly; they go through run() so the event loop stays free while AWS answers.
+
+DEFAULT_CONCURRENCY = int(os.getenv("AWS_UI_DEFAULT_CONCURRENCY", "8"))
+
+# Max number of in-flight calls per AWS service, e.g. AWS_UI_ROUTE53_CONCURRENCY=2
+service_limits = {
+    service: int(os.getenv(f"AWS_UI_{service.upper()}_CONCURRENCY", DEFAULT_CONCURRENCY))
+    for service in ("ec2", "s3", "route53")
+}
+
+# One worker per allowed in-flight call, so a busy service can never starve the others.
+_executor = ThreadPoolExecutor(
+    max_workers=sum(service_limits.values()),
+    thread_name_prefix="aws-call",
+)
+_semaphores = {}
+
+
+def _get_semaphore(service):
+    loop = asyncio.get_running_loop()
+    entry = _semaphores.get(service)
+    # Semaphores are bound to the loop they were first used on.
+    if entry is None or entry[0] is not loop:
+        limit = service_limits.get(service, DEFAULT_CONCURRENCY)
+        entry = (loop, asyncio.Semaphore(limit))
+        _semaphores[service] = entry
+    return entry[1]
+
+
+async def run(service, func, *args, **kwargs):
+    semaphore = _get_semaphore(service)
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        # The request's context goes along, so AWS time is counted towards its Server-Timing
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, partial(context.run, func, *args, **kwargs))
+
+
+async def iterate(service, iterator):
+    # Pulls one item at a time from a blocking iterator (e.g. one AWS page per item)
+    done = object()
+    while True:
+        item = await run(service, next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+def shutdown():
+    _executor.shutdown(wait=False)
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from backend.functions.aws_clients import get_client
+from backend.functions.shared_state import shared_state
+
+# -------------------------
+# INSTANCE NAME INDEX
+# -------------------------
+# Maps Name tags of cli-managed instances to instance IDs and states, so turning a
+# name into an ID is a dictionary lookup instead of a describe_instances call.
+# The whole index is reloaded after INDEX_TTL seconds; in between only names that are
+# unknown, marked changed, or have an instance mid-transition are re-read from AWS.
+# When another worker changes instances, the whole index is reloaded on next use.
+# AWS is read outside the index lock, which only guards swapping the maps, so a slow
+# describe call doesn't hold up lookups answered from memory.
+
+INDEX_TTL = float(os.getenv("AWS_UI_INSTANCE_INDEX_TTL", "60"))
+NAME_FILTER_BATCH_SIZE = 200  # values allowed in one describe_instances filter
+TRANSITIONAL_STATES = {"pending", "stopping", "shutting-down"}
+MANAGED_FILTER = [{"Name": "tag:cli-managed", "Values": ["true"]}]
+
+
+class InstanceIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # one full reload at a time
+        self._instances = {}  # instance_id -> (name, state)
+        self._by_name = {}  # name -> set of instance IDs
+        self._dirty_names = {}  # name -> time it was marked changed
+        self._loaded_at = None
+        self._invalidated_at = float("-inf")
+
+    def find(self, names, states):
+        # Returns {name: sorted IDs of instances with that name in one of `states`}
+        self._ensure_loaded()
+        with self._lock:
+            stale = [name for name in dict.fromkeys(names) if self._needs_refresh(name)]
+        if stale:
+            self._refresh_names(stale)
+        with self._lock:
+            return {
+                name: sorted(
+                    instance_id for instance_id in self._by_name.get(name, ())
+                    if self._instances[instance_id][1] in states
+                )
+                for name in names
+            }
+
+    def ids_in(self, states):
+        # IDs of all cli-managed instances in one of `states`
+        self._ensure_loaded()
+        with self._lock:
+            stale = [name for name in self._by_name if self._needs_refresh(name)]
+        if stale:
+            self._refresh_names(stale)
+        with self._lock:
+            return {instance_id for instance_id, (_, state) in self._instances.items() if state in states}
+
+    def resolve(self, name, states):
+        matches = self.find([name], states)[name]
+        if not matches:
+            state_label = f"{states[0]} " if len(states) == 1 else ""
+            return {"error": f"No {state_label}instance found with name {name}."}
+        if len(matches) > 1:
+            return {"error": f"Instance name {name} is ambiguous, it matches {', '.join(matches)}. Use the instance ID instead."}
+        return {"instance_id": matches[0]}
+
+    def ingest(self, instances, started):
+        # Full listings (e.g. list_ec2) refresh the index for free; started is the
+        # time.monotonic() taken before the listing was read
+        entries = [(instance["id"], instance["name"], instance["state"]) for instance in instances]
+        with self._lock:
+            # A load that started later already holds newer data
+            if self._loaded_at is None or self._loaded_at <= started:
+                self._replace_all(entries, started)
+
+    def mark_changed(self, instance_ids=(), names=()):
+        now = time.monotonic()
+        with self._lock:
+            for instance_id in instance_ids:
+                entry = self._instances.get(instance_id)
+                if entry is not None:
+                    self._dirty_names[entry[0]] = now
+            for name in names:
+                self._dirty_names[name] = now
+
+    def _on_remote_invalidate(self, invalidation):
+        if "ec2" in invalidation["keys"]:
+            with self._lock:
+                self._invalidated_at = time.monotonic()
+
+    def _needs_refresh(self, name):
+        if name in self._dirty_names or name not in self._by_name:
+            return True
+        return any(self._instances[instance_id][1] in TRANSITIONAL_STATES for instance_id in self._by_name[name])
+
+    def _expired(self):
+        return self._loaded_at is None or self._loaded_at < self._invalidated_at or \
+            time.monotonic() - self._loaded_at > INDEX_TTL
+
+    def _ensure_loaded(self):
+        with self._reload_lock:
+            with self._lock:
+                if not self._expired():
+                    return
+            started = time.monotonic()
+            entries = list(_describe(MANAGED_FILTER))
+            with self._lock:
+                self._replace_all(entries, started)
+
+    def _replace_all(self, entries, started):
+        # Names marked changed after the listing started are still re-read on next use
+        self._instances = {}
+        self._by_name = {}
+        for instance_id, name, state in entries:
+            self._add(instance_id, name, state)
+        self._dirty_names = {name: marked_at for name, marked_at in self._dirty_names.items() if marked_at > started}
+        self._loaded_at = started
+
+    def _refresh_names(self, names):
+        for start in range(0, len(names), NAME_FILTER_BATCH_SIZE):
+            batch = names[start:start + NAME_FILTER_BATCH_SIZE]
+            started = time.monotonic()
+            fetched = list(_describe(MANAGED_FILTER + [{"Name": "tag:Name", "Values": batch}]))
+            with self._lock:
+                for name in batch:
+                    for instance_id in self._by_name.pop(name, ()):
+                        self._instances.pop(instance_id, None)
+                    # An empty set records that AWS has no instance with this name
+                    self._by_name[name] = set()
+                    # Unless it was marked changed again while the describe call ran
+                    if self._dirty_names.get(name, started) <= started:
+                        self._dirty_names.pop(name, None)
+                for instance_id, name, state in fetched:
+                    self._add(instance_id, name, state)
+
+    def _add(self, instance_id, name, state):
+        # A renamed instance leaves its old name
+        previous = self._instances.get(instance_id)
+        if previous is not None and previous[0] != name:
+            self._by_name.get(previous[0], set()).discard(instance_id)
+        self._instances[instance_id] = (name, state)
+        self._by_name.setdefault(name, set()).add(instance_id)
+
+
+def _describe(filters):
+    paginator = get_client("ec2").get_paginator("describe_instances")
+    for page in paginator.paginate(Filters=filters):
+        for reservation in page.get("Reservations", []):
+            for instance in reservation.get("Instances", []):
+                tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
+                yield instance["InstanceId"], tags.get("Name", "Unknown"), instance["State"]["Name"]
+
+
+instance_index = InstanceIndex()
+shared_state.subscribe("invalidate", instance_index._on_remote_invalidate)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from backend.functions.aws_clients import get_client
+from backend.functions.instance_index import instance_index
+from backend.functions.inventory_invalidation import inventory_invalidation
+from backend.functions.jobs import jobs
+
+# -------------------------
+# LAUNCH WATCHER
+# -------------------------
+# Follows newly launched instances until they pass their status checks. One background
+# thread serves every pending launch job: each round is a single describe_instances and
+# a single describe_instance_status call for all watched instances (per 200 IDs), and
+# the jobs are updated as the instances move through the launch phases. With several
+# workers each one watches the instances it launched itself, so the watcher runs in every
+# worker rather than only on the leader; the jobs it updates are in the shared store.
+
+WATCH_INTERVAL = float(os.getenv("AWS_UI_LAUNCH_POLL_INTERVAL", "5"))
+LAUNCH_TIMEOUT = float(os.getenv("AWS_UI_LAUNCH_TIMEOUT", "900"))
+DESCRIBE_BATCH_SIZE = 200  # values allowed in one describe_instances filter
+# Launch phases in the order an instance goes through them
+LAUNCH_PHASES = ["pending", "running", "ip-assigned", "status-ok"]
+FAILED_STATES = {"shutting-down", "terminated", "stopping", "stopped"}
+
+
+class InstanceWatcher:
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._watched = {}  # instance ID -> (job ID, monotonic start time)
+        self._poller = None
+
+    def watch(self, instance_id, job_id):
+        with self._lock:
+            self._watched[instance_id] = (job_id, time.monotonic())
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._run, name="ec2-launch-watcher", daemon=True)
+                self._poller.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._watched:
+                    self._poller = None
+                    return
+                self._lock.wait(WATCH_INTERVAL)
+                watched = dict(self._watched)
+            if not watched:
+                continue
+            try:
+                observed = _observe(list(watched))
+            except Exception as e:
+                # Try again next round; launch timeouts still apply
+                print(f"Error polling launched instances: {e}")
+                observed = {}
+            for instance_id, (job_id, started) in watched.items():
+                self._update(instance_id, job_id, started, observed.get(instance_id))
+
+    def _update(self, instance_id, job_id, started, instance):
+        job = jobs.get(job_id)
+        done = None
+        if job is None:
+            done = "gone"
+        elif instance is not None and instance["state"] in FAILED_STATES:
+            done = jobs.update(job_id, status="failed", state=instance["state"],
+                               error=f"Instance {instance_id} entered state {instance['state']} while launching.")
+        elif instance is not None:
+            phase = _phase(instance)
+            current = LAUNCH_PHASES.index(job["phase"])
+            if LAUNCH_PHASES.index(phase) > current:
+                print(f"Instance {instance_id} is {phase}.")
+                inventory_invalidation.invalidate("ec2")
+                instance_index.mark_changed([instance_id])
+                # Phases passed between two polls are recorded too, so clients see every step
+                now = time.time()
+                reached = [
+                    {"phase": passed, "at": now}
+                    for passed in LAUNCH_PHASES[current + 1:LAUNCH_PHASES.index(phase) + 1]
+                    if passed != "ip-assigned" or instance["public_ip"]
+                ]
+                job = jobs.update(job_id, phase=phase, transitions=job["transitions"] + reached, **instance)
+            if phase == LAUNCH_PHASES[-1]:
+                done = jobs.update(job_id, status="completed")
+        if done is None and time.monotonic() - started > LAUNCH_TIMEOUT:
+            done = jobs.update(job_id, status="failed", error=f"Instance {instance_id} was not ready after {int(LAUNCH_TIMEOUT)}s.")
+        if done is not None:
+            with self._lock:
+                self._watched.pop(instance_id, None)
+
+
+def _phase(instance):
+    if instance["state"] != "running":
+        return "pending"
+    if instance["system_status"] == "ok" and instance["instance_status"] == "ok":
+        return "status-ok"
+    return "ip-assigned" if instance["public_ip"] else "running"
+
+
+def _observe(instance_ids):
+    ec2_client = get_client("ec2")
+    observed = {}
+    for start in range(0, len(instance_ids), DESCRIBE_BATCH_SIZE):
+        batch = instance_ids[start:start + DESCRIBE_BATCH_SIZE]
+        # A filter instead of InstanceIds, so an ID EC2 does not know yet doesn't fail the batch
+        pages = ec2_client.get_paginator("describe_instances").paginate(Filters=[{"Name": "instance-id", "Values": batch}])
+        for page in pages:
+            for reservation in page.get("Reservations", []):
+                for instance in reservation.get("Instances", []):
+                    observed[instance["InstanceId"]] = {
+                        "state": instance["State"]["Name"],
+                        "public_ip": instance.get("PublicIpAddress"),
+                        "system_status": None,
+                        "instance_status": None,
+                    }
+        running = [instance_id for instance_id in batch if observed.get(instance_id, {}).get("state") == "running"]
+        if running:
+            for page in ec2_client.get_paginator("describe_instance_status").paginate(InstanceIds=running):
+                for status in page.get("InstanceStatuses", []):
+                    observed[status["InstanceId"]].update(
+                        system_status=status["SystemStatus"]["Status"],
+                        instance_status=status["InstanceStatus"]["Status"],
+                    )
+    return observed
+
+
+instance_watcher = InstanceWatcher()
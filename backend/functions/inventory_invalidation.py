@@ -0,0 +1,46 @@
+import threading
+import time
+from backend.functions.shared_state import shared_state
+from backend.functions.single_flight import single_flight
+
+# -------------------------
+# INVENTORY INVALIDATION
+# -------------------------
+# Mutating functions call invalidate() with the listings they changed, e.g. "ec2", "s3",
+# "route53_zones" or "route53_records:<zone id>". Listeners (the sync engine, which marks
+# the listing dirty) are told right away, and in-flight coalesced reads of those keys
+# are no longer joined. With shared state, invalidations reach every worker.
+# The list endpoints read the inventory store the sync engine keeps, so listings are not
+# cached in memory here.
+
+
+class InventoryInvalidation:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def invalidate(self, *keys):
+        invalidated_at = time.time()
+        self._invalidate_local(keys, invalidated_at)
+        if shared_state.enabled:
+            shared_state.publish("invalidate", {"keys": list(keys), "at": invalidated_at})
+
+    def _invalidate_local(self, keys, invalidated_at):
+        with self._lock:
+            listeners = list(self._listeners)
+        single_flight.forget(*keys)
+        for listener in listeners:
+            listener(keys, invalidated_at)
+
+    def _on_remote_invalidate(self, invalidation):
+        self._invalidate_local(invalidation["keys"], invalidation["at"])
+
+    def add_listener(self, listener):
+        # listener(keys, invalidated_at) is called after every invalidation, e.g. by the sync
+        # engine; invalidated_at is the wall time of the original call, on whichever worker
+        with self._lock:
+            self._listeners.append(listener)
+
+
+inventory_invalidation = InventoryInvalidation()
+shared_state.subscribe("invalidate", inventory_invalidation._on_remote_invalidate)
@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from backend.functions.aws_clients import PROVIDER
+
+# -------------------------
+# INVENTORY STORE
+# -------------------------
+# SQLite mirror of the cli-managed resources, written by the sync engine and read by
+# the list endpoints. Each (resource type, scope) is one listing, e.g. ("ec2", "") or
+# ("route53_records", <zone id>). WAL mode lets requests read while a sync writes.
+# Every provider, profile and region gets its own file, so switching e.g. from the
+# simulator to AWS never serves the other one's resources.
+
+
+def _default_path():
+    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "default"
+    profile = os.getenv("AWS_PROFILE") or "default"
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{PROVIDER}-{profile}-{region}")
+    return os.path.join(tempfile.gettempdir(), f"aws-ui-inventory-{name}.sqlite3")
+
+
+DB_PATH = os.getenv("AWS_UI_INVENTORY_DB") or _default_path()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    type TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (type, scope, id)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    type TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    synced_at REAL,
+    duration REAL,
+    item_count INTEGER,
+    changed INTEGER,
+    error TEXT,
+    PRIMARY KEY (type, scope)
+);
+"""
+
+
+class InventoryStore:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()  # sqlite3 connections can't be shared across threads
+        self._write_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def replace(self, resource_type, scope, items, key, duration=None):
+        # Makes the stored listing equal to `items`; only rows that changed are written.
+        # Returns the difference: {"upserted": [{"id", "item"}], "removed": [ids]}. A row that
+        # only moved (e.g. after a delete above it) gets its new position but is not in the diff.
+        rows = [(key(item), position, json.dumps(item, sort_keys=True, default=str)) for position, item in enumerate(items)]
+        connection = self._connection()
+        with self._write_lock, connection:
+            stored = {
+                resource_id: (position, data)
+                for resource_id, position, data in connection.execute(
+                    "SELECT id, position, data FROM resources WHERE type = ? AND scope = ?", (resource_type, scope)
+                )
+            }
+            changed, moved = [], []
+            for row in rows:
+                position, data = stored.pop(row[0], (None, None))
+                if data != row[2]:
+                    changed.append(row)
+                elif position != row[1]:
+                    moved.append(row)
+            connection.executemany(
+                "INSERT INTO resources (type, scope, id, position, data) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (type, scope, id) DO UPDATE SET position = excluded.position, data = excluded.data",
+                [(resource_type, scope, *row) for row in changed],
+            )
+            connection.executemany(
+                "UPDATE resources SET position = ? WHERE type = ? AND scope = ? AND id = ?",
+                [(position, resource_type, scope, resource_id) for resource_id, position, _ in moved],
+            )
+            connection.executemany(
+                "DELETE FROM resources WHERE type = ? AND scope = ? AND id = ?",
+                [(resource_type, scope, resource_id) for resource_id in stored],
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO sync_state (type, scope, synced_at, duration, item_count, changed, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (resource_type, scope, time.time(), duration, len(rows), len(changed) + len(stored)),
+            )
+        return {
+            "upserted": [{"id": resource_id, "item": items[position]} for resource_id, position, _ in changed],
+            "removed": list(stored),
+        }
+
+    def record_error(self, resource_type, scope, error):
+        # Keeps the last good listing and its sync time, but remembers why the latest sync failed
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.execute(
+                "INSERT INTO sync_state (type, scope, error) VALUES (?, ?, ?) "
+                "ON CONFLICT (type, scope) DO UPDATE SET error = excluded.error",
+                (resource_type, scope, error),
+            )
+
+    def drop(self, resource_type, scope):
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.execute("DELETE FROM resources WHERE type = ? AND scope = ?", (resource_type, scope))
+            connection.execute("DELETE FROM sync_state WHERE type = ? AND scope = ?", (resource_type, scope))
+
+    def read(self, resource_type, scope="", with_ids=False):
+        rows = self._connection().execute(
+            "SELECT id, data FROM resources WHERE type = ? AND scope = ? ORDER BY position", (resource_type, scope)
+        )
+        if with_ids:
+            return [{"id": resource_id, "item": json.loads(data)} for resource_id, data in rows]
+        return [json.loads(data) for _, data in rows]
+
+    def sync_state(self, resource_type=None, scope=None):
+        query = "SELECT type, scope, synced_at, duration, item_count, changed, error FROM sync_state"
+        conditions, params = [], []
+        if resource_type is not None:
+            conditions.append("type = ?")
+            params.append(resource_type)
+        if scope is not None:
+            conditions.append("scope = ?")
+            params.append(scope)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        columns = ["type", "scope", "synced_at", "duration", "item_count", "changed", "error"]
+        return [dict(zip(columns, row)) for row in self._connection().execute(query + " ORDER BY type, scope", params)]
+
+
+inventory_store = InventoryStore()
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+import uuid
+from backend.functions.shared_state import shared_state
+
+# -------------------------
+# BACKGROUND JOBS
+# -------------------------
+# Status records for long-running work (uploads, deletions, launches). Workers update
+# a job as they go; the API serves it for polling or pushes it over SSE. With shared
+# state the records live in the shared store, so any worker can serve any job.
+
+FINISHED_STATES = {"completed", "failed", "aborted"}
+JOB_RETENTION = float(os.getenv("AWS_UI_JOB_RETENTION", "3600"))
+UNFINISHED_RETENTION = 24 * 3600  # shared jobs of a worker that died still expire
+
+
+class JobRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def create(self, kind, **fields):
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now,
+            **fields,
+        }
+        if shared_state.enabled:
+            shared_state.store.put("jobs", job["job_id"], job, _retention)
+            return dict(job)
+        with self._lock:
+            self._prune(now)
+            self._jobs[job["job_id"]] = job
+            return dict(job)
+
+    def update(self, job_id, **fields):
+        if shared_state.enabled:
+            return shared_state.store.update("jobs", job_id, lambda job: _updated(job, fields), ttl=_retention)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields, updated_at=time.time())
+            return dict(job)
+
+    def update_if(self, job_id, condition, **fields):
+        # Updates the job only if condition(job) holds, atomically across workers.
+        # Returns the updated job, or None if it doesn't exist or the condition failed.
+        if shared_state.enabled:
+            return shared_state.store.update(
+                "jobs", job_id, lambda job: _updated(job, fields) if job and condition(job) else (job, None), ttl=_retention
+            )
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not condition(dict(job)):
+                return None
+            job.update(fields, updated_at=time.time())
+            return dict(job)
+
+    def get(self, job_id):
+        if shared_state.enabled:
+            return shared_state.store.get("jobs", job_id)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _prune(self, now):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATES and now - job["updated_at"] > JOB_RETENTION
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+def _updated(job, fields):
+    if job is None:
+        return None, None
+    job = {**job, **fields, "updated_at": time.time()}
+    return job, dict(job)
+
+
+def _retention(job):
+    return JOB_RETENTION if job["status"] in FINISHED_STATES else UNFINISHED_RETENTION
+
+
+jobs = JobRegistry()
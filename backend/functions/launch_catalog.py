@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import threading
+from typing import NamedTuple
+from backend.functions.aws_clients import get_client
+from backend.functions.shared_state import shared_state
+
+# -------------------------
+# LAUNCH CATALOG
+# -------------------------
+# Everything create_ec2 needs besides the key pair, resolved from memory: the AMI for an
+# (image, instance type) pair comes from ec2configuration/ami_catalog.json, the subnet
+# and security group from ec2configuration/configuration.txt, and user-data scripts are
+# read and hashed once. Nothing is read at import; warm_up() loads it all at startup. With
+# AWS_UI_AMI_REFRESH_INTERVAL set, a background thread replaces the pinned AMI IDs with
+# the latest ones from the SSM public parameters. With several workers only the leader
+# runs it (start_refresher/stop_refresher); the AMI IDs it finds go to the shared store,
+# and the other workers apply them to their own catalog.
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "ec2configuration")
+CATALOG_PATH = os.getenv("AWS_UI_AMI_CATALOG", os.path.join(CONFIG_DIR, "ami_catalog.json"))
+REFRESH_INTERVAL = float(os.getenv("AWS_UI_AMI_REFRESH_INTERVAL", "0"))  # seconds, 0 disables
+SSM_BATCH_SIZE = 10  # names accepted by get_parameters
+NETWORK_CONFIG_PATH = os.getenv("AWS_UI_EC2_CONFIG", os.path.join(CONFIG_DIR, "configuration.txt"))
+# configuration.txt key -> prefix its value must have
+NETWORK_KEYS = {"subnet-id": "subnet-", "security-group": "sg-"}
+
+
+class NetworkConfig(NamedTuple):
+    subnet_id: str
+    security_group: str
+
+
+_lock = threading.Lock()
+_catalog = None
+_network = None
+_user_data = {}
+_refresher = None
+_stop_refresher = threading.Event()
+
+
+def resolve_image(instance_type, image):
+    # Returns {"ami", "user_data", "user_data_sha256"} or {"error"}
+    catalog = _get_catalog()
+    architecture = catalog["instance_types"].get(instance_type)
+    if architecture is None:
+        error_msg = "Invalid instance type selection."
+        print(error_msg)
+        return {"error": error_msg}
+    entry = catalog["images"].get(image)
+    if entry is None or architecture not in entry:
+        error_msg = "Invalid AMI selection."
+        print(error_msg)
+        return {"error": error_msg}
+    try:
+        network = network_config()
+    except (OSError, ValueError) as e:
+        error_msg = f"Invalid EC2 network configuration: {e}"
+        print(error_msg)
+        return {"error": error_msg}
+    script, digest = user_data(entry["user_data"])
+    return {
+        "ami": entry[architecture]["ami"],
+        "user_data": script,
+        "user_data_sha256": digest,
+        "subnet_id": network.subnet_id,
+        "security_group": network.security_group,
+    }
+
+
+def network_config():
+    # Parsed on first use; a bad file raises ValueError naming the line, and is read
+    # again on the next call so fixing it doesn't need a restart
+    global _network
+    with _lock:
+        if _network is None:
+            _network = _load_network_config(NETWORK_CONFIG_PATH)
+        return _network
+
+
+def _load_network_config(path):
+    values = {}
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, separator, value = (part.strip() for part in line.partition(":"))
+            if not separator or key not in NETWORK_KEYS:
+                raise ValueError(f"{path}:{number}: expected 'subnet-id:<id>' or 'security-group:<id>', got '{line}'")
+            if not value.startswith(NETWORK_KEYS[key]):
+                raise ValueError(f"{path}:{number}: {key} must start with '{NETWORK_KEYS[key]}', got '{value}'")
+            values[key] = value
+    missing = [key for key in NETWORK_KEYS if key not in values]
+    if missing:
+        raise ValueError(f"{path}: missing {', '.join(missing)}")
+    return NetworkConfig(subnet_id=values["subnet-id"], security_group=values["security-group"])
+
+
+def warm_up():
+    # Loads the catalog, network config and user-data scripts ahead of the first launch
+    catalog = _get_catalog()
+    for image in catalog["images"].values():
+        user_data(image["user_data"])
+    network_config()
+
+
+def user_data(filename):
+    # Scripts are read once; the hash identifies which version an instance was launched with
+    with _lock:
+        cached = _user_data.get(filename)
+        if cached is None:
+            with open(os.path.join(CONFIG_DIR, filename), "r") as f:
+                script = f.read()
+            cached = (script, hashlib.sha256(script.encode()).hexdigest())
+            _user_data[filename] = cached
+        return cached
+
+
+def refresh_amis():
+    # Looks up the latest AMI ID of every catalog entry with an ssm_parameter
+    names = list(_ssm_entries(_get_catalog()))
+    ssm_client = get_client("ssm")
+    amis = {}
+    for start in range(0, len(names), SSM_BATCH_SIZE):
+        response = ssm_client.get_parameters(Names=names[start:start + SSM_BATCH_SIZE])
+        for parameter in response.get("Parameters", []):
+            amis[parameter["Name"]] = parameter["Value"]
+        for name in response.get("InvalidParameters", []):
+            print(f"SSM parameter {name} not found, keeping the pinned AMI.")
+    updated = _apply_amis(amis)
+    if updated and shared_state.enabled:
+        shared_state.store.put("catalog", "amis", amis)
+        shared_state.publish("amis", amis)
+    return updated
+
+
+def start_refresher():
+    # Called when this worker becomes the leader
+    global _refresher
+    if REFRESH_INTERVAL <= 0:
+        return
+    with _lock:
+        _stop_refresher.clear()
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_loop, name="ami-catalog-refresh", daemon=True)
+            _refresher.start()
+
+
+def stop_refresher():
+    _stop_refresher.set()
+
+
+def _ssm_entries(catalog):
+    # SSM parameter name -> catalog entries (image, architecture) that follow it
+    entries = {}
+    for image in catalog["images"].values():
+        for architecture in set(catalog["instance_types"].values()):
+            entry = image.get(architecture)
+            if entry and entry.get("ssm_parameter"):
+                entries.setdefault(entry["ssm_parameter"], []).append(entry)
+    return entries
+
+
+def _apply_amis(amis):
+    updated = 0
+    with _lock:
+        entries = _ssm_entries(_catalog) if _catalog is not None else {}
+        for name, ami in amis.items():
+            for entry in entries.get(name, []):
+                if entry["ami"] != ami:
+                    print(f"AMI for {name} is now {ami}.")
+                    entry["ami"] = ami
+                    updated += 1
+    return updated
+
+
+def _get_catalog():
+    global _catalog
+    with _lock:
+        if _catalog is not None:
+            return _catalog
+        with open(CATALOG_PATH, "r") as f:
+            _catalog = json.load(f)
+    # AMI IDs the leader found before this worker loaded its catalog
+    if shared_state.enabled:
+        _apply_amis(shared_state.store.get("catalog", "amis") or {})
+    return _catalog
+
+
+def _refresh_loop():
+    while not _stop_refresher.is_set():
+        try:
+            refresh_amis()
+        except Exception as e:
+            print(f"Error refreshing AMI catalog: {e}")
+        _stop_refresher.wait(REFRESH_INTERVAL)
+
+
+shared_state.subscribe("amis", _apply_amis)
@@ -0,0 +1,165 @@
+import contextvars
+import threading
+import time
+
+# -------------------------
+# METRICS
+# -------------------------
+# Counters and latency histograms for the hot paths, rendered in the Prometheus text
+# format at /metrics. boto3 clients report every AWS call through botocore events
+# (latency, retries and error code per service and operation) and the HTTP middleware
+# reports every request. While a request is being served, the AWS time and rate limiter
+# waits it causes are also summed up for its Server-Timing header.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "aws_ui_aws_call_duration_seconds": ("histogram", "AWS API call latency, retries included."),
+    "aws_ui_aws_calls_total": ("counter", "AWS API calls by outcome error code (empty when successful)."),
+    "aws_ui_aws_retries_total": ("counter", "Retried attempts of AWS API calls."),
+    "aws_ui_aws_throttles_total": ("counter", "Attempts of AWS API calls rejected as throttled."),
+    "aws_ui_http_request_duration_seconds": ("histogram", "Time until the response headers were sent, per route."),
+}
+
+# Per-request totals for Server-Timing; set by the HTTP middleware, carried into the AWS
+# worker threads by executor.run
+_request_timing = contextvars.ContextVar("aws_ui_request_timing", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> value
+        self._collectors = []
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collector):
+        # collector() returns extra [(name, type, help, [(labels, value)])] gauges at render time
+        self._collectors.append(collector)
+
+    def attach(self, client, service):
+        # Registers the AWS call instrumentation on a client's botocore events
+        events = client.meta.events
+        events.register("before-call", _before_call)
+        events.register("after-call", lambda **kwargs: self._after_call(service, **kwargs))
+        events.register("after-call-error", lambda **kwargs: self._after_call_error(service, **kwargs))
+
+    def _after_call(self, service, http_response, parsed, model, context, **kwargs):
+        labels = {"service": service, "operation": model.name}
+        self._record_call(labels, context, parsed.get("Error", {}).get("Code", ""))
+        retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        if retries:
+            self.increment("aws_ui_aws_retries_total", labels, retries)
+
+    def _after_call_error(self, service, exception, context, **kwargs):
+        # Connection errors and the like, raised before AWS answered
+        labels = {"service": service, "operation": context.get("aws_ui_operation", "unknown")}
+        self._record_call(labels, context, type(exception).__name__)
+
+    def _record_call(self, labels, context, error_code):
+        started = context.get("aws_ui_started")
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        self.observe("aws_ui_aws_call_duration_seconds", labels, duration)
+        self.increment("aws_ui_aws_calls_total", {**labels, "error_code": error_code})
+        add_request_timing("aws", duration)
+
+    def render(self):
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name, (kind, description) in HELP.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            if kind == "histogram":
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(BUCKETS, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {total}")
+                    lines.append(f"{name}_count{_labels(labels)} {count}")
+            else:
+                lines += [
+                    f"{name}{_labels(labels)} {value}"
+                    for (metric, labels), value in sorted(counters.items()) if metric == name
+                ]
+        for collector in self._collectors:
+            for name, kind, description, samples in collector():
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_labels(tuple(sorted(labels.items())))} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+def _before_call(model, context, **kwargs):
+    context["aws_ui_started"] = time.perf_counter()
+    context["aws_ui_operation"] = model.name
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def start_request_timing():
+    # Returns a token for end_request_timing()
+    return _request_timing.set({"aws": [0.0, 0], "ratelimit": [0.0, 0]})
+
+
+def add_request_timing(name, seconds):
+    timing = _request_timing.get()
+    if timing is not None:
+        # Lists are updated in place so worker threads' context copies share them
+        timing[name][0] += seconds
+        timing[name][1] += 1
+
+
+def end_request_timing(token, total):
+    # Returns the Server-Timing header value for the request
+    timing = _request_timing.get()
+    _request_timing.reset(token)
+    parts = [f"app;dur={total * 1000:.1f}"]
+    for name, (seconds, count) in (timing or {}).items():
+        if count:
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{count} call(s)"')
+    return ", ".join(parts)
+
+
+metrics = Metrics()
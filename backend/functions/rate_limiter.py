@@ -0,0 +1,316 @@
+import os
+import random
+import threading
+import time
+from backend.functions.metrics import add_request_timing, metrics
+from backend.functions.shared_state import shared_state
+
+# -------------------------
+# CLIENT-SIDE RATE LIMITER
+# -------------------------
+# Every request a boto3 client sends (retries included) first takes a token from the
+# bucket of its service and region, shared by all clients and threads, so bulk work
+# queues up here instead of running into the account's API limits. A throttling error
+# halves the bucket's rate and pauses it for a jittered, growing backoff; successful
+# requests raise the rate again step by step up to the configured limit. With shared
+# state the buckets live in the shared store, so all workers together stay within the
+# limit instead of each worker getting the whole budget. A worker takes tokens from the
+# shared bucket in batches (its local share, about LOCAL_SHARE seconds' worth), so most
+# requests don't need a store transaction.
+
+RATE_LIMIT_ENABLED = os.getenv("AWS_UI_RATE_LIMIT_ENABLED", "1") == "1"
+
+# service -> (requests per second, burst); override with AWS_UI_RATE_LIMIT_<SERVICE>
+# and AWS_UI_RATE_BURST_<SERVICE>. Route53 allows 5 requests per second per account.
+DEFAULT_LIMITS = {
+    "route53": (5, 5),
+    "ec2": (20, 100),
+    "s3": (100, 100),
+    "ssm": (10, 10),
+}
+FALLBACK_LIMIT = (10, 10)
+
+THROTTLE_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "PriorRequestNotComplete",
+    "SlowDown",
+    "RequestThrottled",
+    "TooManyRequestsException",
+    "EC2ThrottledException",
+}
+MIN_RATE = 0.5  # requests per second a bucket never drops below
+RATE_DECREASE = 0.5  # rate multiplier on each throttle
+RATE_INCREASE = 0.05  # share of the configured rate regained per successful request
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+LOCAL_SHARE = 0.25  # seconds of a shared bucket's rate a worker takes at once, and keeps unused
+
+
+def _limit(service):
+    rate, burst = DEFAULT_LIMITS.get(service, FALLBACK_LIMIT)
+    rate = float(os.getenv(f"AWS_UI_RATE_LIMIT_{service.upper()}", rate))
+    burst = float(os.getenv(f"AWS_UI_RATE_BURST_{service.upper()}", max(burst, 1)))
+    return rate, burst
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.throttle_streak = 0
+        self.waiting = 0
+        self.counters = {"requests": 0, "throttles": 0, "waited_seconds": 0.0}
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        # Returns the seconds spent waiting for the token
+        started = time.monotonic()
+        with self.condition:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if now < self.paused_until:
+                        delay = self.paused_until - now
+                    elif self.tokens >= 1:
+                        self.tokens -= 1
+                        break
+                    else:
+                        delay = (1 - self.tokens) / self.rate
+                    self.condition.wait(delay)
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - started
+            self.counters["requests"] += 1
+            self.counters["waited_seconds"] += waited
+        return waited
+
+    def throttled(self):
+        with self.condition:
+            self.counters["throttles"] += 1
+            self.throttle_streak += 1
+            self.rate = max(MIN_RATE, self.rate * RATE_DECREASE)
+            self.tokens = min(self.tokens, 0)
+            # Full jitter, so waiting threads don't all retry at the same moment
+            backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.throttle_streak))
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+
+    def succeeded(self):
+        with self.condition:
+            self.throttle_streak = 0
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_INCREASE)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "rate": round(self.rate, 2),
+                "max_rate": self.max_rate,
+                "burst": self.burst,
+                "tokens": round(min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate), 2),
+                "queue_depth": self.waiting,
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                **self.counters,
+                "waited_seconds": round(self.counters["waited_seconds"], 2),
+            }
+
+
+class SharedTokenBucket:
+    # TokenBucket kept in the shared store; the counters and queue depth are this worker's
+    def __init__(self, key, rate, burst):
+        self.key = key
+        self.max_rate = rate
+        self.burst = burst
+        self.waiting = 0
+        self.counters = {"requests": 0, "throttles": 0, "waited_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._share_lock = threading.Lock()
+        self._share = 0  # tokens taken from the shared bucket and not used yet
+        self._share_until = 0.0
+        self._retry_at = 0.0  # threads of this worker wait for this before asking the store again
+        self._recovering = False  # the shared rate was below max_rate at the last take
+
+    def _state(self, bucket):
+        # Refilled copy of the stored bucket
+        now = time.time()
+        if bucket is None:
+            return {"rate": self.max_rate, "tokens": self.burst, "updated": now, "paused_until": 0.0, "throttle_streak": 0}
+        tokens = min(self.burst, bucket["tokens"] + max(0.0, now - bucket["updated"]) * bucket["rate"])
+        return {**bucket, "tokens": tokens, "updated": now}
+
+    def _take(self, bucket, returned):
+        # Hands back an expired share and takes a new one. The result is (tokens taken,
+        # seconds until the bucket has a share again, recovering)
+        bucket = self._state(bucket)
+        bucket["tokens"] = min(self.burst, bucket["tokens"] + returned)
+        recovering = bucket["rate"] < self.max_rate or bucket["throttle_streak"] > 0
+        if bucket["updated"] < bucket["paused_until"]:
+            return bucket, (0, bucket["paused_until"] - bucket["updated"], recovering)
+        wanted = max(1, min(int(self.burst), int(bucket["rate"] * LOCAL_SHARE)))
+        # The tolerance keeps a thread woken a hair early from asking a second time
+        taken = max(0, min(wanted, int(bucket["tokens"] + 0.001)))
+        bucket["tokens"] -= taken
+        # An empty bucket is asked again once a whole share has come back, not every token
+        wait = max(0.0, (wanted - bucket["tokens"]) / bucket["rate"]) if bucket["tokens"] < 1 else 0.0
+        return bucket, (taken, wait, recovering)
+
+    def _throttle(self, bucket):
+        bucket = self._state(bucket)
+        bucket["throttle_streak"] += 1
+        bucket["rate"] = max(MIN_RATE, bucket["rate"] * RATE_DECREASE)
+        bucket["tokens"] = min(bucket["tokens"], 0)
+        backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** bucket["throttle_streak"]))
+        bucket["paused_until"] = max(bucket["paused_until"], bucket["updated"] + backoff)
+        return bucket, None
+
+    def _recover(self, bucket):
+        bucket = self._state(bucket)
+        bucket["throttle_streak"] = 0
+        bucket["rate"] = min(self.max_rate, bucket["rate"] + self.max_rate * RATE_INCREASE)
+        return bucket, bucket["rate"] < self.max_rate
+
+    def acquire(self):
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                delay = self._take_token()
+                if delay <= 0:
+                    break
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        waited = time.monotonic() - started
+        with self._lock:
+            self.counters["requests"] += 1
+            self.counters["waited_seconds"] += waited
+        return waited
+
+    def _take_token(self):
+        # Returns 0 when a token was taken, otherwise the seconds to wait before trying again
+        with self._share_lock:
+            now = time.monotonic()
+            if self._share > 0 and now < self._share_until:
+                self._share -= 1
+                return 0.0
+            if now < self._retry_at:
+                return self._retry_at - now
+            returned, self._share = self._share, 0
+            taken, wait, self._recovering = shared_state.store.update(
+                "rate_limits", self.key, lambda bucket: self._take(bucket, returned)
+            )
+            self._retry_at = now + wait
+            if not taken:
+                return wait
+            self._share = taken - 1
+            self._share_until = now + LOCAL_SHARE
+            return 0.0
+
+    def throttled(self):
+        with self._lock:
+            self.counters["throttles"] += 1
+        with self._share_lock:
+            # Tokens taken before the throttle are not used
+            self._share = 0
+            self._recovering = True
+        shared_state.store.update("rate_limits", self.key, self._throttle)
+
+    def succeeded(self):
+        # Only written while recovering from a throttle, other successes don't touch the store
+        if self._recovering:
+            self._recovering = shared_state.store.update("rate_limits", self.key, self._recover)
+
+    def stats(self):
+        bucket = self._state(shared_state.store.get("rate_limits", self.key))
+        with self._lock:
+            return {
+                "rate": round(bucket["rate"], 2),
+                "max_rate": self.max_rate,
+                "burst": self.burst,
+                "tokens": round(bucket["tokens"], 2),
+                "queue_depth": self.waiting,
+                "paused_for": round(max(0.0, bucket["paused_until"] - bucket["updated"]), 2),
+                **self.counters,
+                "waited_seconds": round(self.counters["waited_seconds"], 2),
+            }
+
+
+class RateLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # (service, region) -> TokenBucket
+
+    def bucket(self, service, region):
+        with self._lock:
+            bucket = self._buckets.get((service, region))
+            if bucket is None:
+                if shared_state.enabled:
+                    bucket = SharedTokenBucket(f"{service}/{region}", *_limit(service))
+                else:
+                    bucket = TokenBucket(*_limit(service))
+                self._buckets[(service, region)] = bucket
+            return bucket
+
+    def attach(self, client, service):
+        # Registers the limiter on a client's botocore events
+        if not RATE_LIMIT_ENABLED:
+            return
+        bucket = self.bucket(service, client.meta.region_name)
+        client.meta.events.register("before-send", lambda **kwargs: _wait(bucket, **kwargs))
+        client.meta.events.register("needs-retry", lambda **kwargs: _observe(bucket, service, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "buckets": {f"{service}/{region}": bucket.stats() for (service, region), bucket in sorted(buckets.items())},
+        }
+
+    def collect(self):
+        # Gauges for /metrics
+        with self._lock:
+            buckets = sorted(self._buckets.items())
+        stats = [({"service": service, "region": region}, bucket.stats()) for (service, region), bucket in buckets]
+        return [
+            ("aws_ui_rate_limit_queue_depth", "gauge", "Requests waiting for a rate limiter token.",
+             [(labels, bucket["queue_depth"]) for labels, bucket in stats]),
+            ("aws_ui_rate_limit_rate", "gauge", "Current requests per second allowed by the rate limiter.",
+             [(labels, bucket["rate"]) for labels, bucket in stats]),
+            ("aws_ui_rate_limit_waited_seconds", "counter", "Total time requests waited for a rate limiter token.",
+             [(labels, bucket["waited_seconds"]) for labels, bucket in stats]),
+        ]
+
+
+def _wait(bucket, **kwargs):
+    # before-send handler: a value returned here would be sent back as the response instead
+    # of calling AWS, so it must return None
+    add_request_timing("ratelimit", bucket.acquire())
+    return None
+
+
+def _observe(bucket, service, response=None, operation=None, **kwargs):
+    # needs-retry handler: only watches the outcome, botocore still decides about the retry
+    if response is None:
+        return None
+    http_response, parsed = response
+    if parsed.get("Error", {}).get("Code") in THROTTLE_CODES or http_response.status_code == 429:
+        bucket.throttled()
+        metrics.increment("aws_ui_aws_throttles_total", {"service": service, "operation": operation.name})
+    elif http_response.status_code < 400:
+        bucket.succeeded()
+    return None
+
+
+rate_limiter = RateLimiter()
+metrics.add_collector(rate_limiter.collect)
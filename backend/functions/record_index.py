@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from backend.functions.aws_clients import get_client
+from backend.functions.shared_state import shared_state
+
+# -------------------------
+# ROUTE53 RECORD INDEX
+# -------------------------
+# Keeps the record sets of each zone we have touched keyed by normalized name, then by
+# (type, set identifier), so finding a record is a dictionary lookup instead of a listing
+# of the whole zone. Weighted, latency and failover record sets share a name and type
+# and are told apart by their SetIdentifier (None for simple records).
+# A zone is loaded in full on first use and again after RECORD_INDEX_TTL seconds; our
+# own writes are applied to the index as they succeed. Names missing from a loaded
+# zone are looked up directly, in case they were created outside this app, and a name
+# that isn't there either is not looked up again for MISSING_NAME_TTL seconds. Zones
+# other workers changed are dropped and loaded again on next use. AWS is read outside
+# the index lock, so a large zone being loaded doesn't hold up lookups in other zones.
+
+RECORD_INDEX_TTL = float(os.getenv("AWS_UI_RECORD_INDEX_TTL", "300"))
+MISSING_NAME_TTL = float(os.getenv("AWS_UI_RECORD_INDEX_MISSING_TTL", "10"))
+LOOKUP_PAGE_SIZE = "100"  # record sets read when looking up a single name
+
+
+def normalize_name(name):
+    # Route53 returns lowercase FQDNs with a trailing dot and escapes '*' as \052
+    return name.replace("\\052", "*").rstrip(".").lower()
+
+
+def record_key(record):
+    return record["Type"], record.get("SetIdentifier")
+
+
+class RecordIndex:
+    def __init__(self):
+        self._lock = threading.Lock()  # guards the maps; never held during AWS calls
+        self._load_locks = {}  # zone_id -> lock held while the zone is read from AWS
+        self._zones = {}  # zone_id -> {normalized name: {(type, set identifier): record set}}
+        self._apex = {}  # zone_id -> normalized zone name
+        self._loaded_at = {}  # zone_id -> time the listing it was loaded from started
+        self._dropped_at = {}
+        self._applying = {}  # zone_id -> changes applied while the zone is being loaded
+        self._missing = {}  # zone_id -> {normalized name: time a lookup found nothing}
+
+    def get(self, zone_id, name, record_type, set_identifier=None):
+        return self.records_for(zone_id, name).get((record_type, set_identifier))
+
+    def records_for(self, zone_id, name):
+        # Returns {(type, set identifier): record set} for every record set named `name`
+        name = normalize_name(name)
+        self._ensure_zone(zone_id)
+        with self._lock:
+            zone = self._zones.get(zone_id, {})
+            if name in zone:
+                return dict(zone[name])
+            missing = self._missing.setdefault(zone_id, {})
+            if time.monotonic() - missing.get(name, float("-inf")) <= MISSING_NAME_TTL:
+                return {}
+        found = _lookup(zone_id, name)
+        with self._lock:
+            zone = self._zones.get(zone_id)
+            if zone is None:
+                return found
+            # A change applied while the lookup ran is newer than what it found
+            if name not in zone:
+                if found:
+                    zone[name] = found
+                else:
+                    self._missing.setdefault(zone_id, {})[name] = time.monotonic()
+            return dict(zone.get(name, {}))
+
+    def is_apex_default(self, zone_id, record):
+        # The NS and SOA records Route53 creates with the zone can't be deleted
+        self._ensure_zone(zone_id)
+        with self._lock:
+            return record["Type"] in ("NS", "SOA") and normalize_name(record["Name"]) == self._apex.get(zone_id)
+
+    def ingest(self, zone_id, records):
+        # Full listings (e.g. list_dns_records) refresh the zone for free
+        with self._lock:
+            self._replace_zone(zone_id, records, time.monotonic())
+
+    def apply(self, zone_id, changes):
+        # Records the effect of changes Route53 has accepted
+        with self._lock:
+            if zone_id in self._applying:
+                self._applying[zone_id].extend(changes)
+            self._apply(zone_id, changes)
+
+    def drop(self, zone_id):
+        with self._lock:
+            self._zones.pop(zone_id, None)
+            self._apex.pop(zone_id, None)
+            self._loaded_at.pop(zone_id, None)
+            self._missing.pop(zone_id, None)
+            # A load still running started before the drop and must not count as fresh
+            self._dropped_at[zone_id] = time.monotonic()
+
+    def _on_remote_invalidate(self, invalidation):
+        for key in invalidation["keys"]:
+            if key.startswith("route53_records:"):
+                self.drop(key.split(":", 1)[1])
+
+    def _expired(self, zone_id):
+        loaded_at = self._loaded_at.get(zone_id)
+        return loaded_at is None or loaded_at < self._dropped_at.get(zone_id, float("-inf")) or \
+            time.monotonic() - loaded_at > RECORD_INDEX_TTL
+
+    def _ensure_zone(self, zone_id):
+        # Loads the zone outside the lock, so lookups in other zones carry on meanwhile;
+        # one load per zone at a time
+        with self._lock:
+            load_lock = self._load_locks.setdefault(zone_id, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if not self._expired(zone_id):
+                    return
+                self._applying[zone_id] = []
+            started = time.monotonic()
+            try:
+                records = list(_iter_zone(zone_id))
+            finally:
+                with self._lock:
+                    applied = self._applying.pop(zone_id)
+            with self._lock:
+                self._replace_zone(zone_id, records, started)
+                # Our own changes accepted while the listing was read may be missing from it
+                self._apply(zone_id, applied)
+
+    def _replace_zone(self, zone_id, records, started):
+        zone = {}
+        for record in records:
+            zone.setdefault(normalize_name(record["Name"]), {})[record_key(record)] = record
+            if record["Type"] == "SOA":
+                self._apex[zone_id] = normalize_name(record["Name"])
+        self._zones[zone_id] = zone
+        self._loaded_at[zone_id] = started
+        self._missing.pop(zone_id, None)
+
+    def _apply(self, zone_id, changes):
+        zone = self._zones.get(zone_id)
+        if zone is None:
+            return
+        missing = self._missing.get(zone_id, {})
+        for change in changes:
+            record = change["ResourceRecordSet"]
+            name = normalize_name(record["Name"])
+            records = zone.setdefault(name, {})
+            missing.pop(name, None)
+            if change["Action"] == "DELETE":
+                records.pop(record_key(record), None)
+            else:
+                records[record_key(record)] = record
+
+
+def _lookup(zone_id, name):
+    # Route53 lists record sets in name order, so one short read from `name` holds all of its sets
+    response = get_client("route53").list_resource_record_sets(
+        HostedZoneId=zone_id, StartRecordName=name, MaxItems=LOOKUP_PAGE_SIZE
+    )
+    return {
+        record_key(record): record
+        for record in response.get("ResourceRecordSets", [])
+        if normalize_name(record["Name"]) == name
+    }
+
+
+def _iter_zone(zone_id):
+    paginator = get_client("route53").get_paginator("list_resource_record_sets")
+    for page in paginator.paginate(HostedZoneId=zone_id):
+        yield from page.get("ResourceRecordSets", [])
+
+
+record_index = RecordIndex()
+shared_state.subscribe("invalidate", record_index._on_remote_invalidate)
@@ -1,131 +1,224 @@
-import boto3
 from fastapi import HTTPException
+from backend.functions.aws_clients import get_client
+from backend.functions.change_tracker import change_tracker
+from backend.functions.inventory_invalidation import inventory_invalidation
+from backend.functions.record_index import record_index
+from backend.functions.single_flight import single_flight
+
+# Max resource IDs accepted by list_tags_for_resources
+TAG_BATCH_SIZE = 10
+# change_resource_record_sets limits per request
+MAX_BATCH_CHANGES = 1000
+MAX_BATCH_RECORDS = 1000
+MAX_BATCH_VALUE_CHARS = 32000
 
 # -------------------------
 # RECORD FUNCTIONS
 # -------------------------
 
 def create_route53_record(zone_id, record_name, record_type, record_value, ttl=300):
-    client = boto3.client('route53')
-    response = client.change_resource_record_sets(
-        HostedZoneId=zone_id,
-        ChangeBatch={
-            "Changes": [{
-                "Action": "UPSERT",
-                "ResourceRecordSet": {
-                    "Name": record_name,
-                    "Type": record_type,
-                    "TTL": ttl,  # default TTL to 300
-                    "ResourceRecords": [{"Value": record_value}]
-                }
-            }]
+    client = get_client('route53')
+    changes = [{
+        "Action": "UPSERT",
+        "ResourceRecordSet": {
+            "Name": record_name,
+            "Type": record_type,
+            "TTL": ttl,  # default TTL to 300
+            "ResourceRecords": [{"Value": record_value}]
         }
-    )
-    change_info = response.get("ChangeInfo", {})
-    change_id = change_info.get("Id")
-    status = change_info.get("Status")
+    }]
+    response = client.change_resource_record_sets(HostedZoneId=zone_id, ChangeBatch={"Changes": changes})
+    record_index.apply(zone_id, changes)
+    inventory_invalidation.invalidate(f"route53_records:{zone_id}")
+    change = change_tracker.track(response["ChangeInfo"], zone_id=zone_id, description=f"Create {record_name} ({record_type})")
     print(f"Record {record_name} ({record_type}) created in zone {zone_id}")
-    print(f"Change ID: {change_id}, Status: {status}")
+    print(f"Change ID: {change['change_id']}, Status: {change['status']}")
+    return change
 
-def list_dns_records(zone_id):
-    client = boto3.client('route53')
+@single_flight.coalesce(lambda zone_id, *args, **kwargs: f"route53_records:{zone_id}")
+def list_dns_records(zone_id, limit=None, cursor=None):
     try:
-        response = client.list_resource_record_sets(HostedZoneId=zone_id)
-        records = response.get('ResourceRecordSets', [])
-        if not records:
+        if limit or cursor:
+            # One page of the listing; pass the returned next_cursor back to get the next one.
+            pages = _record_set_pages(zone_id, {"MaxItems": limit, "StartingToken": cursor})
+            record_list = [_format_record(record) for page in pages for record in page.get('ResourceRecordSets', [])]
+            return {"records": record_list, "next_cursor": pages.resume_token}
+        records = list(_iter_record_sets(zone_id))
+        record_index.ingest(zone_id, records)
+        record_list = [_format_record(record) for record in records]
+        if not record_list:
             return {"message": f"No DNS records found in zone {zone_id}."}
-        record_list = []
-        for record in records:
-            name = record.get('Name')
-            record_type = record.get('Type')
-            ttl = record.get('TTL', 'N/A')
-            values = ', '.join([r.get('Value') for r in record.get('ResourceRecords', [])]) if record.get('ResourceRecords') else "N/A"
-            record_list.append({
-                "Name": name,
-                "Type": record_type,
-                "TTL": ttl,
-                "Values": values
-            })
         return {"records": record_list}
     except Exception as e:
         return {"error": str(e)}
 
+def iter_dns_record_pages(zone_id):
+    # Yields one list of formatted records per AWS page, so callers can stream big zones.
+    for page in _record_set_pages(zone_id):
+        yield [_format_record(record) for record in page.get('ResourceRecordSets', [])]
+
+def _format_record(record):
+    values = ', '.join([r.get('Value') for r in record.get('ResourceRecords', [])]) if record.get('ResourceRecords') else "N/A"
+    formatted = {
+        "Name": record.get('Name'),
+        "Type": record.get('Type'),
+        "TTL": record.get('TTL', 'N/A'),
+        "Values": values
+    }
+    if record.get('SetIdentifier'):
+        formatted["SetIdentifier"] = record['SetIdentifier']
+    return formatted
+
+def _record_set_pages(zone_id, pagination_config=None):
+    paginator = get_client('route53').get_paginator('list_resource_record_sets')
+    return paginator.paginate(HostedZoneId=zone_id, PaginationConfig=pagination_config or {})
+
+def _iter_record_sets(zone_id):
+    for page in _record_set_pages(zone_id):
+        yield from page.get('ResourceRecordSets', [])
+
 def update_route53_record(zone_id, record_name, record_type, record_value, ttl=300):
-    client = boto3.client('route53')
-    response = client.list_resource_record_sets(HostedZoneId=zone_id)
-    records = response.get("ResourceRecordSets", [])
-    normalized_target = record_name.rstrip(".")
-    target_record = None
-    for record in records:
-        existing_name = record.get("Name", "").rstrip(".")
-        if existing_name == normalized_target and record.get("Type") == record_type:
-            target_record = record
-            break
-    if not target_record:
+    client = get_client('route53')
+    if not record_index.get(zone_id, record_name, record_type):
         error_msg = f"Error: Record {record_name} of type {record_type} does not exist in zone {zone_id}."
         print(error_msg)
         raise HTTPException(status_code=404, detail=error_msg)
-    response = client.change_resource_record_sets(
-        HostedZoneId=zone_id,
-        ChangeBatch={
-            "Changes": [{
-                "Action": "UPSERT",
-                "ResourceRecordSet": {
-                    "Name": record_name,
-                    "Type": record_type,
-                    "TTL": ttl,
-                    "ResourceRecords": [{"Value": record_value}]
-                }
-            }]
+    changes = [{
+        "Action": "UPSERT",
+        "ResourceRecordSet": {
+            "Name": record_name,
+            "Type": record_type,
+            "TTL": ttl,
+            "ResourceRecords": [{"Value": record_value}]
         }
-    )
-    change_info = response.get("ChangeInfo", {})
-    change_id = change_info.get("Id")
-    status = change_info.get("Status")
+    }]
+    response = client.change_resource_record_sets(HostedZoneId=zone_id, ChangeBatch={"Changes": changes})
+    record_index.apply(zone_id, changes)
+    inventory_invalidation.invalidate(f"route53_records:{zone_id}")
+    change = change_tracker.track(response["ChangeInfo"], zone_id=zone_id, description=f"Update {record_name} ({record_type})")
     print(f"Record {record_name} ({record_type}) updated in zone {zone_id}")
-    print(f"Change ID: {change_id}, Status: {status}")
-
-def delete_route53_record(zone_id, record_name):
-    client = boto3.client('route53')
-    # Fetch existing records in the hosted zone
-    response = client.list_resource_record_sets(HostedZoneId=zone_id)
-    records = response.get('ResourceRecordSets', [])
-    # Find the record to delete
-    for record in records:
-        if record['Name'] == record_name:
-            record_type = record['Type']
-            if record_type in ["NS", "SOA"]:
-                # raise an exception so the user sees an error
-                raise HTTPException(status_code=400, detail=f"Cannot delete default record of type {record_type}.")
-            record_value = record['ResourceRecords'][0]['Value']
-            client.change_resource_record_sets(
-                HostedZoneId=zone_id,
-                ChangeBatch={
-                    "Changes": [{
-                        "Action": "DELETE",
-                        "ResourceRecordSet": {
-                            "Name": record_name,
-                            "Type": record_type,
-                            "TTL": record['TTL'],
-                            "ResourceRecords": [{"Value": record_value}]
-                        }
-                    }]
-                }
-            )
-            print(f"Record {record_name} ({record_type}) deleted from zone {zone_id}")
-            return
-    raise HTTPException(status_code=404, detail=f"Record {record_name} not found in zone {zone_id}")
-
-def get_existing_record(zone_id, record_name):
-    client = boto3.client('route53')
-    response = client.list_resource_record_sets(HostedZoneId=zone_id)
-    records = response.get("ResourceRecordSets", [])
-    normalized_target = record_name.rstrip(".")
-    for record in records:
-        existing_name = record.get("Name", "").rstrip(".")
-        if existing_name == normalized_target:
-            return record
-    return None
+    print(f"Change ID: {change['change_id']}, Status: {change['status']}")
+    return change
+
+def delete_route53_record(zone_id, record_name, record_type=None, set_identifier=None):
+    client = get_client('route53')
+    # Find the record set to delete; without a type the name must hold a single deletable one
+    candidates = [
+        record for (existing_type, existing_set), record in record_index.records_for(zone_id, record_name).items()
+        if record_type in (None, existing_type) and set_identifier in (None, existing_set)
+    ]
+    if not candidates:
+        raise HTTPException(status_code=404, detail=f"Record {record_name} not found in zone {zone_id}")
+    deletable = [record for record in candidates if not record_index.is_apex_default(zone_id, record)]
+    if not deletable:
+        # raise an exception so the user sees an error
+        types = sorted({record["Type"] for record in candidates})
+        raise HTTPException(status_code=400, detail=f"Cannot delete default record of type {', '.join(types)}.")
+    types = sorted({record["Type"] for record in deletable})
+    if len(types) > 1:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Record {record_name} has types {', '.join(types)}. Specify the record type to delete."
+        )
+    if len(deletable) > 1:
+        set_identifiers = sorted(record["SetIdentifier"] for record in deletable)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Record {record_name} has {len(deletable)} {types[0]} record sets ({', '.join(set_identifiers)}). "
+                   "Specify the set identifier to delete."
+        )
+    record = deletable[0]
+    # Route53 only deletes a record set when every value matches, so send it back as listed
+    changes = [{"Action": "DELETE", "ResourceRecordSet": record}]
+    response = client.change_resource_record_sets(HostedZoneId=zone_id, ChangeBatch={"Changes": changes})
+    record_index.apply(zone_id, changes)
+    inventory_invalidation.invalidate(f"route53_records:{zone_id}")
+    print(f"Record {record_name} ({record['Type']}) deleted from zone {zone_id}")
+    return change_tracker.track(response["ChangeInfo"], zone_id=zone_id, description=f"Delete {record_name} ({record['Type']})")
+
+def get_existing_record(zone_id, record_name, record_type=None):
+    # Prefers a record set of `record_type` when the name holds several types
+    records = list(record_index.records_for(zone_id, record_name).values())
+    return next((record for record in records if record["Type"] == record_type), None) or next(iter(records), None)
+
+
+# -------------------------
+# BATCHED CHANGES
+# -------------------------
+
+def apply_record_changes(zone_id, changes):
+    # Sends Route53 changes ({"Action", "ResourceRecordSet"}) packed into as few
+    # ChangeBatches as the API limits allow. Each batch is applied atomically; the first
+    # failing batch stops the run and is reported with the batches already applied.
+    client = get_client('route53')
+    applied = []
+    for batch in _change_batches(changes):
+        try:
+            response = client.change_resource_record_sets(HostedZoneId=zone_id, ChangeBatch={"Changes": batch})
+        except Exception as e:
+            return {
+                "error": f"Change batch of {len(batch)} change(s) failed: {e}",
+                "applied_changes": sum(item["changes"] for item in applied),
+                "batches": applied,
+            }
+        record_index.apply(zone_id, batch)
+        inventory_invalidation.invalidate(f"route53_records:{zone_id}")
+        change = change_tracker.track(response["ChangeInfo"], zone_id=zone_id, description=f"{len(batch)} record change(s)")
+        applied.append({"changes": len(batch), "change_id": change["change_id"], "status": change["status"]})
+        print(f"Applied {len(batch)} change(s) to zone {zone_id}, Change ID: {change['change_id']}")
+    return {"applied_changes": sum(item["changes"] for item in applied), "batches": applied}
+
+def _change_batches(changes):
+    # Route53 limits a request to MAX_BATCH_RECORDS ResourceRecord elements and
+    # MAX_BATCH_VALUE_CHARS characters of values; an UPSERT counts twice towards both.
+    batch, records, chars = [], 0, 0
+    for change in changes:
+        record_set = change["ResourceRecordSet"]
+        weight = 2 if change["Action"] == "UPSERT" else 1
+        values = [record.get("Value", "") for record in record_set.get("ResourceRecords", [])]
+        change_records = weight * max(len(values), 1)
+        change_chars = weight * sum(len(value) for value in values)
+        if batch and (
+            len(batch) >= MAX_BATCH_CHANGES
+            or records + change_records > MAX_BATCH_RECORDS
+            or chars + change_chars > MAX_BATCH_VALUE_CHARS
+        ):
+            yield batch
+            batch, records, chars = [], 0, 0
+        batch.append(change)
+        records += change_records
+        chars += change_chars
+    if batch:
+        yield batch
+
+def bulk_record_changes(zone_id, requested):
+    # requested: [{"action", "record_name", "record_type", "record_values", "ttl", "set_identifier"}]
+    # DELETEs without values remove the record set as it currently exists in the zone; the
+    # set identifier picks one of several weighted, latency or failover record sets.
+    # Every change is checked before any batch is sent, so one bad change doesn't fail a batch at AWS.
+    changes = []
+    for number, item in enumerate(requested, start=1):
+        action = item["action"].upper()
+        if action not in ("CREATE", "UPSERT", "DELETE"):
+            return {"error": f"Change {number}: unknown action '{item['action']}'."}
+        if action != "DELETE" and not item.get("record_values"):
+            return {"error": f"Change {number}: {action} {item['record_name']} ({item['record_type']}) needs record_values."}
+        if action == "DELETE" and not item.get("record_values"):
+            record = record_index.get(zone_id, item["record_name"], item["record_type"], item.get("set_identifier"))
+            if record is None:
+                return {"error": f"Change {number}: record {item['record_name']} ({item['record_type']}) not found in zone {zone_id}."}
+            changes.append({"Action": "DELETE", "ResourceRecordSet": record})
+            continue
+        changes.append({
+            "Action": action,
+            "ResourceRecordSet": {
+                "Name": item["record_name"],
+                "Type": item["record_type"],
+                "TTL": item.get("ttl") or 300,
+                "ResourceRecords": [{"Value": value} for value in item["record_values"]]
+            }
+        })
+    return apply_record_changes(zone_id, changes)
 
 
 # -------------------------
@@ -133,7 +226,7 @@ def get_existing_record(zone_id, record_name):
 # -------------------------
 
 def create_route53_zone(zone_name):
-    client = boto3.client('route53')
+    client = get_client('route53')
     response = client.create_hosted_zone(
         Name=zone_name,
         CallerReference=str(hash(zone_name)),
@@ -146,34 +239,70 @@ def create_route53_zone(zone_name):
         ResourceId=zone_id,
         AddTags=[{"Key": "cli-managed", "Value": "true"}]
     )
+    inventory_invalidation.invalidate("route53_zones")
+    change = change_tracker.track(response["ChangeInfo"], zone_id=zone_id, description=f"Create zone {zone_name}")
     print("Hosted zone created:")
     print(f"Hosted zone {zone_name} created with ID {response['HostedZone']['Id']}")
-    return zone_id
+    return {"zone_id": zone_id, "change": change}
 
+@single_flight.coalesce("route53_zones")
 def list_route53_zones():
-    client = boto3.client('route53')
-    zones = client.list_hosted_zones()['HostedZones']
-    
-    cli_managed_zones = []
-    for zone in zones:
-        zone_id = zone['Id'].split('/')[-1]  # Extract only the Zone ID
+    return [zone for page in iter_route53_zone_pages() for zone in page]
+
+@single_flight.coalesce("route53_zones")
+def list_route53_zones_page(limit=None, cursor=None):
+    # One page of the listing; pass the returned next_cursor back to get the next one.
+    pages = _hosted_zone_pages({"MaxItems": limit, "StartingToken": cursor})
+    zones = [zone for page in pages for zone in _managed_zones(page['HostedZones'])]
+    return {"zones": zones, "next_cursor": pages.resume_token}
+
+def iter_route53_zone_pages():
+    # Yields the cli-managed zones of one list_hosted_zones page at a time.
+    for page in _hosted_zone_pages():
+        yield _managed_zones(page['HostedZones'])
+
+def _hosted_zone_pages(pagination_config=None):
+    paginator = get_client('route53').get_paginator('list_hosted_zones')
+    return paginator.paginate(PaginationConfig=pagination_config or {})
+
+def _managed_zones(zones):
+    client = get_client('route53')
+    zone_ids = [zone['Id'].split('/')[-1] for zone in zones]  # Extract only the Zone IDs
+
+    # Route53 returns the tags of up to 10 zones per call
+    managed_ids = set()
+    for start in range(0, len(zone_ids), TAG_BATCH_SIZE):
+        batch = zone_ids[start:start + TAG_BATCH_SIZE]
         try:
-            tags = client.list_tags_for_resource(ResourceType='hostedzone', ResourceId=zone_id)['ResourceTagSet']['Tags']
-            if any(tag['Key'] == 'cli-managed' and tag['Value'] == 'true' for tag in tags):
-                cli_managed_zones.append({
-                    "ZoneId": zone_id, 
-                    "HostName": zone['Name']
-                })
+            tag_sets = client.list_tags_for_resources(ResourceType='hostedzone', ResourceIds=batch)['ResourceTagSets']
         except Exception as e:
-            print(f"Error retrieving tags for {zone_id}: {e}")
-            continue 
+            # One bad zone fails the whole batch, so retry its zones one by one
+            print(f"Error retrieving tags for zones {batch}: {e}")
+            tag_sets = _get_zone_tag_sets(client, batch)
+        for tag_set in tag_sets:
+            if any(tag['Key'] == 'cli-managed' and tag['Value'] == 'true' for tag in tag_set.get('Tags', [])):
+                managed_ids.add(tag_set['ResourceId'])
 
+    cli_managed_zones = []
+    for zone, zone_id in zip(zones, zone_ids):
+        if zone_id in managed_ids:
+            cli_managed_zones.append({
+                "ZoneId": zone_id, 
+                "HostName": zone['Name']
+            })
     return cli_managed_zones
 
-
+def _get_zone_tag_sets(client, zone_ids):
+    tag_sets = []
+    for zone_id in zone_ids:
+        try:
+            tag_sets.append(client.list_tags_for_resource(ResourceType='hostedzone', ResourceId=zone_id)['ResourceTagSet'])
+        except Exception as e:
+            print(f"Error retrieving tags for {zone_id}: {e}")
+    return tag_sets
 
 def delete_hosted_zone(zone_id):
-    client = boto3.client('route53')
+    client = get_client('route53')
     # Try to get tags for the hosted zone
     try:
         tags_response = client.list_tags_for_resource(
@@ -190,37 +319,30 @@ def delete_hosted_zone(zone_id):
         return {"message": "No CLI-managed zone found for deletion."}  
     # List all records in the zone
     try:
-        response = client.list_resource_record_sets(HostedZoneId=zone_id)
-        records = response.get('ResourceRecordSets', [])
+        records = list(_iter_record_sets(zone_id))
+        record_index.ingest(zone_id, records)
     except Exception as e:
         print(f"Error listing records for hosted zone {zone_id}: {e}")
         return {"error": "Failed to list records for the hosted zone."}  # ✅ More user-friendly error
 
-    # Filter out default NS and SOA records
-    records_to_delete = [record for record in records if record.get('Type') not in ['NS', 'SOA']]
+    # Filter out the default NS and SOA records at the zone apex
+    records_to_delete = [record for record in records if not record_index.is_apex_default(zone_id, record)]
 
-    # Delete each non-default record
-    for record in records_to_delete:
-        try:
-            print(f"Deleting record {record.get('Name')} ({record.get('Type')})...")
-            client.change_resource_record_sets(
-                HostedZoneId=zone_id,
-                ChangeBatch={
-                    "Changes": [{
-                        "Action": "DELETE",
-                        "ResourceRecordSet": record
-                    }]
-                }
-            )
-        except Exception as e:
-            print(f"Error deleting record {record.get('Name')} ({record.get('Type')}): {e}")
-            return {"error": f"Failed to delete record {record.get('Name')}."}  
+    # Delete the non-default records in as few change batches as Route53 allows
+    print(f"Deleting {len(records_to_delete)} record(s) from zone {zone_id}...")
+    result = apply_record_changes(zone_id, [{"Action": "DELETE", "ResourceRecordSet": record} for record in records_to_delete])
+    if "error" in result:
+        print(f"Error deleting records from zone {zone_id}: {result['error']}")
+        return {"error": f"Failed to delete records: {result['error']}"}
 
     # Delete the hosted zone
     try:
-        client.delete_hosted_zone(Id=zone_id)
+        response = client.delete_hosted_zone(Id=zone_id)
+        record_index.drop(zone_id)
+        inventory_invalidation.invalidate("route53_zones")
+        change = change_tracker.track(response["ChangeInfo"], zone_id=zone_id, description=f"Delete zone {zone_id}")
         print(f"Hosted zone {zone_id} deleted successfully.")
-        return {"message": "Hosted zone deleted successfully."}  
+        return {"message": "Hosted zone deleted successfully.", "change": change}
     except Exception as e:
         print(f"Error deleting hosted zone {zone_id}: {e}")
         return {"error": "Failed to delete hosted zone."}  
@@ -1,10 +1,36 @@
 import json
-import boto3
-from botocore.exceptions import ClientError
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from backend.functions.aws_clients import get_client
+from backend.functions.inventory_invalidation import inventory_invalidation
+from backend.functions.jobs import jobs
+from backend.functions.shared_state import shared_state
+from backend.functions.single_flight import single_flight
 
-s3_client = boto3.client("s3")
+# Workers for per-bucket region and tag lookups the listing and tagging API sweep can't
+# cover; the pool is created on first use
+TAG_WORKERS = int(os.getenv("AWS_UI_S3_TAG_WORKERS", "16"))
+_tag_pool = None
+_tag_pool_lock = threading.Lock()
+# Bucket regions looked up with get_bucket_location, when list_buckets leaves out
+# BucketRegion; a bucket never changes region, so each is looked up once
+_bucket_regions = {}  # bucket name -> region
+# Multipart settings shared by form uploads and streaming uploads
+PART_SIZE = int(os.getenv("AWS_UI_S3_PART_SIZE_MB", "16")) * 1024 * 1024
+UPLOAD_CONCURRENCY = int(os.getenv("AWS_UI_S3_UPLOAD_CONCURRENCY", "4"))
+_transfer_config = None  # built on first upload, importing s3transfer is slow
+# Bucket emptying: parallel delete_objects calls, each removing up to 1000 versions
+DELETE_WORKERS = int(os.getenv("AWS_UI_S3_DELETE_WORKERS", "8"))
+DELETE_BATCH_SIZE = 1000
+# Buckets created by this app recently (by any worker, with shared state), which the
+# tagging API may not report yet
+RECENT_BUCKET_WINDOW = 300
+_recent_buckets = {}  # bucket name -> creation time
 
 def create_s3(bucket_name, access):
+    s3_client = get_client("s3")
     try:
         # Check if the bucket already exists
         existing_buckets = s3_client.list_buckets()
@@ -59,10 +85,12 @@ def create_s3(bucket_name, access):
         except Exception as e:
             raise Exception(f"Error tagging bucket: {e}")
 
+        _remember_bucket(bucket_name)
+        inventory_invalidation.invalidate("s3")
         print(f"S3 bucket '{bucket_name}' created with {access} access.")
         return {"message": f"S3 bucket '{bucket_name}' created successfully with {access} access."}
 
-    except ClientError as e:
+    except s3_client.exceptions.ClientError as e:
         error_code = e.response["Error"]["Code"]
         if error_code == "BucketAlreadyExists":
             raise Exception(f"Bucket name '{bucket_name}' is already in use globally.")
@@ -72,31 +100,133 @@ def create_s3(bucket_name, access):
             raise Exception(f"Error creating S3 bucket: {e}")
 
 
+@single_flight.coalesce("s3")
 def list_s3():
-    s3_client = boto3.client("s3")
-    buckets_list = []
     try:
-        response = s3_client.list_buckets()
+        return [bucket for page in iter_s3_pages() for bucket in page]
     except Exception as e:
-        print("Error listing buckets:", e)
-        return []
-    
-    for bucket in response.get("Buckets", []):
+        error_msg = f"Error listing buckets: {e}"
+        print(error_msg)
+        return {"error": error_msg}
+
+@single_flight.coalesce("s3")
+def list_s3_page(limit=None, cursor=None):
+    # One page of the listing; pass the returned next_cursor back to get the next one.
+    try:
+        pages = _list_bucket_pages({"MaxItems": limit, "StartingToken": cursor})
+        managed_tags = _get_managed_bucket_tags()
+        buckets_list = [
+            bucket for page in pages
+            for bucket in _managed_buckets(page.get("Buckets", []), managed_tags)
+        ]
+        return {"buckets": buckets_list, "next_cursor": pages.resume_token}
+    except Exception as e:
+        error_msg = f"Error listing buckets: {e}"
+        print(error_msg)
+        return {"error": error_msg}
+
+def iter_s3_pages():
+    # Yields the cli-managed buckets of one list_buckets page at a time.
+    # One paginated sweep returns the tags of every cli-managed bucket in our region
+    managed_tags = _get_managed_bucket_tags()
+    for page in _list_bucket_pages():
+        yield _managed_buckets(page.get("Buckets", []), managed_tags)
+
+def _list_bucket_pages(pagination_config=None):
+    paginator = get_client("s3").get_paginator("list_buckets")
+    return paginator.paginate(PaginationConfig=pagination_config or {})
+
+def _managed_buckets(buckets, managed_tags):
+    region = get_client("s3").meta.region_name
+    now = time.time()
+    recent_buckets = _recent_bucket_times()
+    tags_by_bucket = {}
+    unresolved = []
+    candidates = []
+    for bucket in buckets:
         bucket_name = bucket["Name"]
-        try:
-            tag_response = s3_client.get_bucket_tagging(Bucket=bucket_name)
-            tags = {tag["Key"]: tag["Value"] for tag in tag_response.get("TagSet", [])}
-            if tags.get("cli-managed") == "true":
-                access = tags.get("access", "private")
-                buckets_list.append({
-                    "BucketName": bucket_name,
-                    "Access": access
-                })
-        except s3_client.exceptions.ClientError:
-            continue
+        if managed_tags is None:
+            unresolved.append(bucket_name)
+        elif bucket_name in managed_tags:
+            tags_by_bucket[bucket_name] = managed_tags[bucket_name]
+        elif now - recent_buckets.get(bucket_name, float("-inf")) < RECENT_BUCKET_WINDOW:
+            # Created moments ago: checked directly, the tagging API lags behind
+            unresolved.append(bucket_name)
+        else:
+            candidates.append(bucket)
+
+    # The sweep covered our region, so untagged buckets there are not cli-managed. Buckets in
+    # other regions (or of unknown region) are looked up concurrently instead of one after another.
+    regions = _bucket_regions_of(candidates)
+    unresolved += [bucket["Name"] for bucket in candidates if regions.get(bucket["Name"]) != region]
+    for bucket_name, tags in zip(unresolved, _get_tag_pool().map(_get_bucket_tags, unresolved)):
+        if tags is not None:
+            tags_by_bucket[bucket_name] = tags
+
+    buckets_list = []
+    for bucket in buckets:
+        tags = tags_by_bucket.get(bucket["Name"])
+        if tags and tags.get("cli-managed") == "true":
+            buckets_list.append({
+                "BucketName": bucket["Name"],
+                "Access": tags.get("access", "private")
+            })
     return buckets_list
 
-def upload_to_s3(bucket_name, file):
+def _get_tag_pool():
+    global _tag_pool
+    with _tag_pool_lock:
+        if _tag_pool is None:
+            _tag_pool = ThreadPoolExecutor(max_workers=TAG_WORKERS, thread_name_prefix="s3-tags")
+        return _tag_pool
+
+def _bucket_regions_of(buckets):
+    # bucket name -> region (None if it could not be found) for list_buckets entries
+    regions = {bucket["Name"]: bucket.get("BucketRegion") or _bucket_regions.get(bucket["Name"]) for bucket in buckets}
+    unknown = [bucket_name for bucket_name, region in regions.items() if region is None]
+    for bucket_name, region in zip(unknown, _get_tag_pool().map(_get_bucket_region, unknown)):
+        regions[bucket_name] = region
+        if region is not None:
+            _bucket_regions[bucket_name] = region
+    return regions
+
+def _get_bucket_region(bucket_name):
+    s3_client = get_client("s3")
+    try:
+        location = s3_client.get_bucket_location(Bucket=bucket_name)
+    except s3_client.exceptions.ClientError:
+        return None
+    # us-east-1 buckets report no location constraint
+    return location.get("LocationConstraint") or "us-east-1"
+
+def _get_managed_bucket_tags():
+    tagging_client = get_client("resourcegroupstaggingapi")
+    managed_tags = {}
+    try:
+        paginator = tagging_client.get_paginator("get_resources")
+        pages = paginator.paginate(
+            ResourceTypeFilters=["s3"],
+            TagFilters=[{"Key": "cli-managed", "Values": ["true"]}],
+        )
+        for page in pages:
+            for mapping in page.get("ResourceTagMappingList", []):
+                bucket_name = mapping["ResourceARN"].split(":::")[-1]
+                managed_tags[bucket_name] = {tag["Key"]: tag["Value"] for tag in mapping.get("Tags", [])}
+    except Exception as e:
+        print(f"Tagging API unavailable, falling back to per-bucket lookups: {e}")
+        return None
+    return managed_tags
+
+def _get_bucket_tags(bucket_name):
+    s3_client = get_client("s3")
+    try:
+        tag_response = s3_client.get_bucket_tagging(Bucket=bucket_name)
+    except s3_client.exceptions.ClientError:
+        return None
+    return {tag["Key"]: tag["Value"] for tag in tag_response.get("TagSet", [])}
+
+def check_cli_managed(bucket_name):
+    s3_client = get_client("s3")
     try:
         tag_response = s3_client.get_bucket_tagging(Bucket=bucket_name)
         tags = {tag["Key"]: tag["Value"] for tag in tag_response.get("TagSet", [])}
@@ -104,40 +234,150 @@ def upload_to_s3(bucket_name, file):
             raise Exception(f"Bucket '{bucket_name}' is not CLI-managed.")
     except s3_client.exceptions.ClientError:
         raise Exception(f"Bucket '{bucket_name}' does not have CLI-managed tagging.")
-        
+
+def _remember_bucket(bucket_name):
+    now = time.time()
+    _recent_buckets[bucket_name] = now
+    if shared_state.enabled:
+        shared_state.store.update(
+            "recent_buckets", "s3",
+            lambda recent: ({**{name: at for name, at in (recent or {}).items() if now - at < RECENT_BUCKET_WINDOW},
+                             bucket_name: now}, None),
+            ttl=RECENT_BUCKET_WINDOW,
+        )
+
+def _recent_bucket_times():
+    if shared_state.enabled:
+        return shared_state.store.get("recent_buckets", "s3") or {}
+    return _recent_buckets
+
+def upload_to_s3(bucket_name, file):
+    s3_client = get_client("s3")
+    check_cli_managed(bucket_name)
 
     try:
         file_name = file.filename
-        s3_client.upload_fileobj(file.file, bucket_name, file_name)
+        s3_client.upload_fileobj(file.file, bucket_name, file_name, Config=_get_transfer_config())
         print(f"File '{file_name}' uploaded to '{bucket_name}'.")
     except Exception as e:
-        print(f"Error uploading file: {e}")
+        raise Exception(f"Error uploading file: {e}")
 
-def delete_s3(bucket_name):
-    # Check if the bucket is cli-,manged=true.
+def _get_transfer_config():
+    global _transfer_config
+    if _transfer_config is None:
+        from boto3.s3.transfer import TransferConfig
+
+        _transfer_config = TransferConfig(
+            multipart_threshold=PART_SIZE,
+            multipart_chunksize=PART_SIZE,
+            max_concurrency=UPLOAD_CONCURRENCY,
+        )
+    return _transfer_config
+
+def start_delete_s3(bucket_name):
+    # Runs delete_s3 on a background thread and returns a job the client can poll
+    check_cli_managed(bucket_name)
+    job = jobs.create(
+        "s3-delete",
+        bucket_name=bucket_name,
+        phase="queued",
+        objects_deleted=0,
+        uploads_aborted=0,
+        errors=[],
+        error=None,
+    )
+    threading.Thread(target=_run_delete_job, args=(bucket_name, job["job_id"]), daemon=True).start()
+    return job
+
+def _run_delete_job(bucket_name, job_id):
+    # start_delete_s3 already checked the bucket is cli-managed
     try:
-        tag_response = s3_client.get_bucket_tagging(Bucket=bucket_name)
-        tags = {tag["Key"]: tag["Value"] for tag in tag_response.get("TagSet", [])}
-        if tags.get("cli-managed") != "true":
-            raise Exception(f"Bucket '{bucket_name}' is not CLI-managed.")
-    except s3_client.exceptions.ClientError as e:
-        raise Exception(f"Could not retrieve tags for bucket '{bucket_name}': {e}")
-    
-    # Empty the bucket by deleting all objects inside.
+        _delete_bucket(bucket_name, job_id=job_id)
+    except Exception as e:
+        print(e)
+        jobs.update(job_id, status="failed", error=str(e))
+
+def delete_s3(bucket_name):
+    check_cli_managed(bucket_name)
+    _delete_bucket(bucket_name)
+
+def _delete_bucket(bucket_name, job_id=None):
+    s3_client = get_client("s3")
+
+    def progress(**fields):
+        if job_id:
+            jobs.update(job_id, **fields)
+
+    # Empty the bucket: every object version, delete marker and unfinished multipart upload.
+    progress(status="running", phase="emptying")
     try:
-        paginator = s3_client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket_name):
-            if 'Contents' in page:
-                delete_keys = {'Objects': [{'Key': obj['Key']} for obj in page['Contents']]}
-                s3_client.delete_objects(Bucket=bucket_name, Delete=delete_keys)
-        print(f"Bucket '{bucket_name}' has been emptied.")
+        errors = _empty_bucket(bucket_name, progress)
+        _abort_multipart_uploads(bucket_name, progress)
     except Exception as e:
         raise Exception(f"Error emptying bucket: {e}")
+    if errors:
+        raise Exception(f"Error emptying bucket: {len(errors)} object(s) could not be deleted, e.g. {errors[0]}")
+    print(f"Bucket '{bucket_name}' has been emptied.")
 
     # Now delete the bucket.
+    progress(phase="deleting bucket")
     try:
         s3_client.delete_bucket(Bucket=bucket_name)
+        _bucket_regions.pop(bucket_name, None)
+        inventory_invalidation.invalidate("s3")
         print(f"S3 bucket '{bucket_name}' has been deleted.")
     except Exception as e:
         raise Exception(f"Error deleting S3 bucket: {e}")
+    progress(status="completed", phase="done")
+
+def _empty_bucket(bucket_name, progress):
+    # Listing runs on this thread while delete_objects batches run on a worker pool.
+    # At most 2 * DELETE_WORKERS batches are queued so memory stays bounded.
+    deleted = 0
+    errors = []
+    in_flight = set()
+
+    def collect(done):
+        nonlocal deleted
+        for future in done:
+            count, batch_errors = future.result()
+            deleted += count
+            errors.extend(batch_errors)
+        progress(objects_deleted=deleted, errors=errors[:10])
+
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS, thread_name_prefix="s3-delete") as pool:
+        for batch in _iter_version_batches(bucket_name):
+            if len(in_flight) >= 2 * DELETE_WORKERS:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(pool.submit(_delete_batch, bucket_name, batch))
+        collect(wait(in_flight).done)
+    return errors
+
+def _iter_version_batches(bucket_name):
+    # list_object_versions also covers unversioned buckets (VersionId "null")
+    paginator = get_client("s3").get_paginator("list_object_versions")
+    batch = []
+    for page in paginator.paginate(Bucket=bucket_name):
+        for version in page.get("Versions", []) + page.get("DeleteMarkers", []):
+            batch.append({"Key": version["Key"], "VersionId": version["VersionId"]})
+            if len(batch) == DELETE_BATCH_SIZE:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def _delete_batch(bucket_name, objects):
+    response = get_client("s3").delete_objects(Bucket=bucket_name, Delete={"Objects": objects, "Quiet": True})
+    errors = [f"{error['Key']}: {error.get('Message', error.get('Code'))}" for error in response.get("Errors", [])]
+    return len(objects) - len(errors), errors
 
+def _abort_multipart_uploads(bucket_name, progress):
+    s3_client = get_client("s3")
+    paginator = s3_client.get_paginator("list_multipart_uploads")
+    aborted = 0
+    for page in paginator.paginate(Bucket=bucket_name):
+        for upload in page.get("Uploads", []):
+            s3_client.abort_multipart_upload(Bucket=bucket_name, Key=upload["Key"], UploadId=upload["UploadId"])
+            aborted += 1
+        progress(uploads_aborted=aborted)
@@ -0,0 +1,103 @@
+import os
+from backend.functions.aws_clients import get_client
+from backend.functions.s3_functions import check_cli_managed
+
+# -------------------------
+# PRESIGNED URLS
+# -------------------------
+# Hands out short-lived URLs so browsers and scripts transfer objects directly to and
+# from S3 instead of through this server. Only cli-managed buckets are allowed.
+
+DEFAULT_EXPIRES_IN = int(os.getenv("AWS_UI_PRESIGN_EXPIRES", "900"))
+MAX_EXPIRES_IN = 7 * 24 * 3600  # SigV4 limit
+MAX_PARTS = 10000
+
+
+def _expiry(expires_in):
+    return min(max(int(expires_in or DEFAULT_EXPIRES_IN), 1), MAX_EXPIRES_IN)
+
+
+def presign_upload(bucket_name, key, method="put", expires_in=None, content_type=None, max_size=None):
+    check_cli_managed(bucket_name)
+    s3_client = get_client("s3")
+    expires_in = _expiry(expires_in)
+    if method == "post":
+        # Browser form upload; the policy can cap the object size
+        fields = {}
+        conditions = []
+        if max_size:
+            conditions.append(["content-length-range", 0, max_size])
+        if content_type:
+            fields["Content-Type"] = content_type
+            conditions.append({"Content-Type": content_type})
+        post = s3_client.generate_presigned_post(
+            bucket_name, key, Fields=fields or None, Conditions=conditions or None, ExpiresIn=expires_in
+        )
+        return {"method": "POST", "url": post["url"], "fields": post["fields"], "expires_in": expires_in}
+    if method != "put":
+        raise Exception(f"Unsupported upload method '{method}', use 'put' or 'post'.")
+    params = {"Bucket": bucket_name, "Key": key}
+    if content_type:
+        params["ContentType"] = content_type
+    url = s3_client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in)
+    return {"method": "PUT", "url": url, "expires_in": expires_in}
+
+
+def presign_download(bucket_name, key, expires_in=None):
+    check_cli_managed(bucket_name)
+    expires_in = _expiry(expires_in)
+    url = get_client("s3").generate_presigned_url(
+        "get_object", Params={"Bucket": bucket_name, "Key": key}, ExpiresIn=expires_in
+    )
+    return {"method": "GET", "url": url, "expires_in": expires_in}
+
+
+def presign_multipart(bucket_name, key, parts, expires_in=None):
+    # Opens a multipart upload and signs one PUT URL per part. The client uploads the parts
+    # in parallel and reports their ETags to complete_multipart().
+    if not 1 <= parts <= MAX_PARTS:
+        raise Exception(f"A multipart upload needs between 1 and {MAX_PARTS} parts.")
+    check_cli_managed(bucket_name)
+    s3_client = get_client("s3")
+    expires_in = _expiry(expires_in)
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket_name, Key=key)["UploadId"]
+    part_urls = [
+        {
+            "part_number": part_number,
+            "url": s3_client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket_name, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+                ExpiresIn=expires_in,
+            ),
+        }
+        for part_number in range(1, parts + 1)
+    ]
+    print(f"Presigned multipart upload of '{key}' to '{bucket_name}' started ({upload_id}).")
+    return {"upload_id": upload_id, "parts": part_urls, "expires_in": expires_in}
+
+
+def complete_multipart(bucket_name, key, upload_id, parts=None):
+    # parts: [{"part_number": n, "etag": "..."}]; when omitted the parts S3 holds are used
+    check_cli_managed(bucket_name)
+    s3_client = get_client("s3")
+    if parts:
+        completed = [{"PartNumber": part["part_number"], "ETag": part["etag"]} for part in parts]
+    else:
+        completed = []
+        paginator = s3_client.get_paginator("list_parts")
+        for page in paginator.paginate(Bucket=bucket_name, Key=key, UploadId=upload_id):
+            completed.extend({"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in page.get("Parts", []))
+    s3_client.complete_multipart_upload(
+        Bucket=bucket_name,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": sorted(completed, key=lambda part: part["PartNumber"])},
+    )
+    print(f"File '{key}' uploaded to '{bucket_name}'.")
+    return {"message": f"File '{key}' uploaded successfully to bucket '{bucket_name}'."}
+
+
+def abort_multipart(bucket_name, key, upload_id):
+    check_cli_managed(bucket_name)
+    get_client("s3").abort_multipart_upload(Bucket=bucket_name, Key=key, UploadId=upload_id)
+    return {"message": f"Upload of '{key}' aborted."}
@@ -0,0 +1,248 @@
+import asyncio
+import time
+from backend.functions import executor
+from backend.functions.aws_clients import get_client
+from backend.functions.jobs import jobs
+from backend.functions.s3_functions import PART_SIZE, UPLOAD_CONCURRENCY, check_cli_managed
+
+# -------------------------
+# STREAMING MULTIPART UPLOADS
+# -------------------------
+# The request body is cut into parts as it arrives and each part is sent to S3 while
+# the next one is being read, so nothing is staged on local disk and at most
+# UPLOAD_CONCURRENCY parts are held in memory. Failed or interrupted uploads stay open
+# in S3 and can be resumed from the first missing part. An upload whose worker stopped
+# sending heartbeats (e.g. the process died) counts as interrupted too.
+# S3 allows 10,000 parts per upload: when the body length is known the parts are sized
+# to fit, otherwise the part size doubles every PART_GROWTH_INTERVAL parts.
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects smaller parts (except the last one)
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+MAX_PARTS = 10000
+PART_GROWTH_INTERVAL = 1000
+PROGRESS_INTERVAL = 1  # seconds between progress writes to the job (and heartbeats)
+STALE_UPLOAD_AFTER = 30  # seconds without a heartbeat before an upload counts as interrupted
+
+
+def start_upload(bucket_name, key, part_size=None):
+    check_cli_managed(bucket_name)
+    part_size = max(part_size or PART_SIZE, MIN_PART_SIZE)
+    s3_client = get_client("s3")
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket_name, Key=key)["UploadId"]
+    job = jobs.create(
+        "s3-upload",
+        bucket_name=bucket_name,
+        key=key,
+        upload_id=upload_id,
+        part_size=part_size,
+        bytes_received=0,
+        bytes_uploaded=0,
+        parts_uploaded=0,
+        total_bytes=None,
+        resume_offset=0,
+        error=None,
+    )
+    print(f"Multipart upload of '{key}' to '{bucket_name}' started ({upload_id}).")
+    return job
+
+
+def get_upload(job_id):
+    # The job, if job_id is a streaming upload (other kinds of jobs are not served here)
+    job = jobs.get(job_id)
+    return job if job is not None and job["kind"] == "s3-upload" else None
+
+
+def upload_status(job_id):
+    # Re-reads the uploaded parts from S3 so the resume offset is authoritative
+    job = get_upload(job_id)
+    if job is None:
+        return None
+    if job["status"] in ("completed", "aborted"):
+        return job
+    parts = _list_parts(job)
+    _, resume_offset = _resume_point(parts)
+    fields = {}
+    if _is_stale(job):
+        fields = {"status": "failed", "error": f"Upload stopped responding, resume at byte {resume_offset}."}
+    return jobs.update(
+        job_id,
+        parts_uploaded=len(parts),
+        bytes_uploaded=sum(part["Size"] for part in parts.values()),
+        resume_offset=resume_offset,
+        **fields,
+    )
+
+
+def abort_upload(job_id):
+    job = get_upload(job_id)
+    if job is None:
+        return None
+    get_client("s3").abort_multipart_upload(Bucket=job["bucket_name"], Key=job["key"], UploadId=job["upload_id"])
+    print(f"Multipart upload of '{job['key']}' to '{job['bucket_name']}' aborted.")
+    return jobs.update(job_id, status="aborted")
+
+
+async def stream_upload(job_id, chunks, offset=0, total_bytes=None):
+    # Uploads an async iterator of byte chunks, continuing the upload at `offset`.
+    # Job reads and writes go through the executor too: with shared state each one is a
+    # SQLite transaction that can wait on other workers
+    job = await executor.run("s3", get_upload, job_id)
+    if job is None:
+        raise Exception(f"Upload job '{job_id}' not found.")
+    if job["status"] in ("completed", "aborted") or job["status"] == "uploading" and not _is_stale(job):
+        raise Exception(f"Upload job '{job_id}' is {job['status']}.")
+
+    parts = await executor.run("s3", _list_parts, job)
+    next_part, resume_offset = _resume_point(parts)
+    # Parts past the first gap are sent again, so earlier copies must not be completed
+    parts = {number: part for number, part in parts.items() if number < next_part}
+    if offset != resume_offset:
+        raise Exception(f"Upload must continue at byte {resume_offset}, got offset {offset}.")
+    end = resume_offset + total_bytes if total_bytes is not None else None
+    if end is not None and _part_size(job["part_size"], next_part, end - resume_offset) > MAX_PART_SIZE:
+        raise Exception(f"Upload of {end} bytes would not fit in S3's {MAX_PARTS} parts.")
+    # Another request may have claimed the upload since it was read
+    read = (job["status"], job["updated_at"])
+    job = await executor.run(
+        "s3",
+        jobs.update_if,
+        job_id,
+        lambda current: (current["status"], current["updated_at"]) == read,
+        status="uploading",
+        error=None,
+        bytes_received=resume_offset,
+        total_bytes=end,
+        heartbeat_at=time.time(),
+    )
+    if job is None:
+        raise Exception(f"Upload job '{job_id}' was resumed by another request.")
+
+    slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    pending = set()
+    received = resume_offset
+    submitted = resume_offset
+
+    async def send(part_number, data):
+        try:
+            etag = await executor.run("s3", _upload_part, job, part_number, data)
+            parts[part_number] = {"ETag": etag, "Size": len(data)}
+        finally:
+            slots.release()
+
+    async def submit(data):
+        nonlocal next_part, submitted
+        if next_part > MAX_PARTS:
+            raise Exception(f"Upload exceeds S3's limit of {MAX_PARTS} parts.")
+        # Waiting for a free slot stops us reading the body faster than S3 accepts it
+        await slots.acquire()
+        task = asyncio.ensure_future(send(next_part, data))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        next_part += 1
+        submitted += len(data)
+
+    def next_part_size():
+        return _part_size(job["part_size"], next_part, end - submitted if end is not None else None)
+
+    def progress():
+        return {
+            "bytes_received": received,
+            "parts_uploaded": len(parts),
+            "bytes_uploaded": sum(part["Size"] for part in parts.values()),
+            "heartbeat_at": time.time(),
+        }
+
+    async def report_progress():
+        # Progress is written at most every PROGRESS_INTERVAL, and doubles as the heartbeat
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            await executor.run("s3", jobs.update, job_id, **progress())
+
+    reporter = asyncio.ensure_future(report_progress())
+    buffer = bytearray()
+    try:
+        async for chunk in chunks:
+            buffer += chunk
+            received += len(chunk)
+            while len(buffer) >= next_part_size():
+                part_size = next_part_size()
+                await submit(bytes(buffer[:part_size]))
+                del buffer[:part_size]
+            # Surface a failed part early instead of reading the rest of the body
+            for task in [task for task in pending if task.done()]:
+                task.result()
+        if buffer or not parts and not pending:
+            await submit(bytes(buffer))
+        await asyncio.gather(*pending)
+        await executor.run("s3", _complete_upload, job, parts)
+    except BaseException as e:
+        reporter.cancel()
+        if isinstance(e, Exception):
+            # Parts already on their way to S3 still count toward the resume point
+            await asyncio.gather(*pending, return_exceptions=True)
+        else:
+            for task in pending:
+                task.cancel()
+        _, resume_offset = _resume_point(parts)
+        error_msg = f"Upload interrupted, resume at byte {resume_offset}: {e!r}"
+        print(error_msg)
+        await executor.run("s3", jobs.update, job_id, status="failed", error=error_msg,
+                           resume_offset=resume_offset, **progress())
+        raise
+    reporter.cancel()
+    print(f"File '{job['key']}' uploaded to '{job['bucket_name']}'.")
+    return await executor.run("s3", jobs.update, job_id, status="completed", resume_offset=received, **progress())
+
+
+def _part_size(base, part_number, bytes_left=None):
+    # Size of part `part_number`, given the bytes left to send from its start if known
+    if bytes_left is None:
+        return min(base * 2 ** ((part_number - 1) // PART_GROWTH_INTERVAL), MAX_PART_SIZE)
+    parts_left = max(MAX_PARTS - part_number + 1, 1)
+    return max(base, -(-bytes_left // parts_left))
+
+
+def _is_stale(job):
+    return job["status"] == "uploading" and time.time() - job.get("heartbeat_at", job["updated_at"]) > STALE_UPLOAD_AFTER
+
+
+def _list_parts(job):
+    s3_client = get_client("s3")
+    parts = {}
+    paginator = s3_client.get_paginator("list_parts")
+    for page in paginator.paginate(Bucket=job["bucket_name"], Key=job["key"], UploadId=job["upload_id"]):
+        for part in page.get("Parts", []):
+            parts[part["PartNumber"]] = {"ETag": part["ETag"], "Size": part["Size"]}
+    return parts
+
+
+def _resume_point(parts):
+    # The first missing part and the byte offset it starts at
+    part_number = 1
+    offset = 0
+    while part_number in parts:
+        offset += parts[part_number]["Size"]
+        part_number += 1
+    return part_number, offset
+
+
+def _upload_part(job, part_number, data):
+    response = get_client("s3").upload_part(
+        Bucket=job["bucket_name"],
+        Key=job["key"],
+        UploadId=job["upload_id"],
+        PartNumber=part_number,
+        Body=data,
+    )
+    return response["ETag"]
+
+
+def _complete_upload(job, parts):
+    get_client("s3").complete_multipart_upload(
+        Bucket=job["bucket_name"],
+        Key=job["key"],
+        UploadId=job["upload_id"],
+        MultipartUpload={
+            "Parts": [{"PartNumber": number, "ETag": parts[number]["ETag"]} for number in sorted(parts)]
+        },
+    )
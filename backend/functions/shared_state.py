@@ -0,0 +1,377 @@
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+# -------------------------
+# SHARED STATE
+# -------------------------
+# Lets several uvicorn/gunicorn worker processes act as one app. With AWS_UI_SHARED_STATE
+# set, job and Route53 change status, listing dirty marks, rate limiter buckets and the
+# EC2 launch quota live in a store every worker uses. Listing invalidations and live
+# dashboard events reach the other workers through an event log, and a lease elects the
+# one worker per host that runs the inventory sync and AMI refresh. "sqlite" keeps all
+# of it in a local SQLite file in WAL mode (workers on one host); "redis" uses
+# AWS_UI_REDIS_URL (workers on several hosts, needs the redis package). Unset, each process keeps its state in
+# memory, which is all a single worker needs.
+
+BACKEND = os.getenv("AWS_UI_SHARED_STATE", "")  # "" | sqlite | redis
+DB_PATH = os.getenv("AWS_UI_SHARED_STATE_DB", os.path.join(tempfile.gettempdir(), "aws-ui-shared.sqlite3"))
+REDIS_URL = os.getenv("AWS_UI_REDIS_URL", "redis://localhost:6379/0")
+LEASE_TTL = float(os.getenv("AWS_UI_LEADER_LEASE", "15"))  # seconds before a silent leader is replaced
+LOCK_LEASE = 15  # seconds a lock outlives a holder that stopped renewing it (e.g. died)
+POLL_INTERVAL = 0.2  # seconds between reads of the event log
+EVENT_RETENTION = 300  # seconds events stay in the log
+CLEANUP_INTERVAL = 60
+REDIS_PREFIX = "aws-ui"
+REDIS_STREAM_LENGTH = 10000
+
+# The inventory store is a SQLite file on the host, so the sync leader and live events
+# are per host; everything else is shared by all workers using the store.
+HOST_ID = socket.gethostname()
+WORKER_ID = f"{HOST_ID}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+if BACKEND not in ("", "sqlite", "redis"):
+    raise ValueError(f"Unknown AWS_UI_SHARED_STATE '{BACKEND}', expected 'sqlite' or 'redis'")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _expiry(ttl, value):
+    # ttl is seconds, None for no expiry, or a function of the value returning either
+    ttl = ttl(value) if callable(ttl) else ttl
+    return time.time() + ttl if ttl else None
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()  # sqlite3 connections can't be shared across threads
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit: every statement is its own transaction unless update() opens one
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace, key):
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, namespace, key, value, ttl=None):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, default=str), _expiry(ttl, value)),
+        )
+
+    def delete(self, namespace, *keys):
+        self._connection().executemany(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?", [(namespace, key) for key in keys]
+        )
+
+    def update(self, namespace, key, func, ttl=None):
+        # Atomic read-modify-write across processes. func(current value or None) returns
+        # (new value, result): the same object leaves the entry alone, None deletes it.
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            current = self.get(namespace, key)
+            value, result = func(current)
+            if value is None and current is not None:
+                self.delete(namespace, key)
+            elif value is not current and value is not None:
+                self.put(namespace, key, value, ttl)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return result
+
+    def append_event(self, kind, data):
+        self._connection().execute(
+            "INSERT INTO events (origin, kind, data, created_at) VALUES (?, ?, ?, ?)",
+            (WORKER_ID, kind, json.dumps(data, default=str), time.time()),
+        )
+
+    def read_events(self, after):
+        # Returns (position, [(origin, kind, data)]); after=None starts at the end of the log
+        connection = self._connection()
+        if after is None:
+            return connection.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0], []
+        rows = connection.execute("SELECT id, origin, kind, data FROM events WHERE id > ? ORDER BY id", (after,)).fetchall()
+        if not rows:
+            return after, []
+        return rows[-1][0], [(origin, kind, json.loads(data)) for _, origin, kind, data in rows]
+
+    def cleanup(self):
+        now = time.time()
+        connection = self._connection()
+        connection.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        connection.execute("DELETE FROM events WHERE created_at <= ?", (now - EVENT_RETENTION,))
+
+
+class RedisStore:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("AWS_UI_SHARED_STATE=redis needs the redis package: pip install redis")
+        self._redis = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self._stream = f"{REDIS_PREFIX}:events"
+
+    def _key(self, namespace, key):
+        return f"{REDIS_PREFIX}:{namespace}:{key}"
+
+    def _set(self, client, name, value, ttl):
+        expires_at = _expiry(ttl, value)
+        client.set(name, json.dumps(value, default=str),
+                   px=max(1, int((expires_at - time.time()) * 1000)) if expires_at else None)
+
+    def get(self, namespace, key):
+        raw = self._redis.get(self._key(namespace, key))
+        return json.loads(raw) if raw is not None else None
+
+    def put(self, namespace, key, value, ttl=None):
+        self._set(self._redis, self._key(namespace, key), value, ttl)
+
+    def delete(self, namespace, *keys):
+        if keys:
+            self._redis.delete(*(self._key(namespace, key) for key in keys))
+
+    def update(self, namespace, key, func, ttl=None):
+        # Same contract as SQLiteStore.update, with optimistic WATCH/MULTI retries
+        name = self._key(namespace, key)
+        with self._redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(name)
+                    raw = pipe.get(name)
+                    current = json.loads(raw) if raw is not None else None
+                    value, result = func(current)
+                    pipe.multi()
+                    if value is None and current is not None:
+                        pipe.delete(name)
+                    elif value is not current and value is not None:
+                        self._set(pipe, name, value, ttl)
+                    pipe.execute()
+                    return result
+                except self._watch_error:
+                    continue
+
+    def append_event(self, kind, data):
+        self._redis.xadd(self._stream, {"origin": WORKER_ID, "kind": kind, "data": json.dumps(data, default=str)},
+                         maxlen=REDIS_STREAM_LENGTH, approximate=True)
+
+    def read_events(self, after):
+        if after is None:
+            last = self._redis.xrevrange(self._stream, count=1)
+            return (last[0][0] if last else "0-0"), []
+        streams = self._redis.xread({self._stream: after}, count=1000)
+        if not streams:
+            return after, []
+        entries = streams[0][1]
+        events = [
+            (fields[b"origin"].decode(), fields[b"kind"].decode(), json.loads(fields[b"data"]))
+            for _, fields in entries
+        ]
+        return entries[-1][0], events
+
+    def cleanup(self):
+        # Keys expire on their own and the stream is capped
+        pass
+
+
+class SharedState:
+    def __init__(self, backend):
+        self.backend = backend
+        self.enabled = bool(backend)
+        self._store = None
+        self._lock = threading.Lock()
+        self._handlers = {}  # event kind -> [handler(data)]
+        self._listener = None
+
+    @property
+    def store(self):
+        with self._lock:
+            if self._store is None:
+                self._store = SQLiteStore(DB_PATH) if self.backend == "sqlite" else RedisStore(REDIS_URL)
+            return self._store
+
+    def subscribe(self, kind, handler):
+        # handler(data) runs on the listener thread for events published by other workers
+        with self._lock:
+            self._handlers.setdefault(kind, []).append(handler)
+
+    def publish(self, kind, data):
+        if self.enabled:
+            self.store.append_event(kind, data)
+
+    @contextlib.contextmanager
+    def lock(self, name, timeout, lease=LOCK_LEASE):
+        # Held by one worker at a time; yields False if it could not be had within timeout,
+        # and callers must not go ahead then. The claim expires `lease` seconds after its
+        # last renewal, and is renewed while held, so a slow holder keeps it and a worker
+        # that died loses it.
+        if not self.enabled:
+            yield True
+            return
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while True:
+            acquired = self.store.update("locks", name, lambda held: _claim(held, token), ttl=lease)
+            if acquired or time.monotonic() >= deadline:
+                break
+            time.sleep(0.05)
+        if not acquired:
+            yield False
+            return
+        released = threading.Event()
+        renewer = threading.Thread(target=self._renew, args=(name, token, lease, released),
+                                   name=f"lock-{name}", daemon=True)
+        renewer.start()
+        try:
+            yield True
+        finally:
+            released.set()
+            renewer.join()
+            self.store.update("locks", name, lambda held: (None if held and held["owner"] == token else held, None))
+
+    def _renew(self, name, token, lease, released):
+        while not released.wait(lease / 3):
+            try:
+                if not self.store.update("locks", name, lambda held: _renewed(held, token), ttl=lease):
+                    print(f"Shared lock '{name}' expired while held.")
+                    return
+            except Exception as e:
+                print(f"Error renewing shared lock '{name}': {e}")
+
+    def start(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="shared-state-events", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        position, last_cleanup = None, 0.0
+        while True:
+            events = []
+            try:
+                position, events = self.store.read_events(position)
+                for origin, kind, data in events:
+                    if origin == WORKER_ID:
+                        continue
+                    with self._lock:
+                        handlers = list(self._handlers.get(kind, ()))
+                    for handler in handlers:
+                        try:
+                            handler(data)
+                        except Exception as e:
+                            print(f"Error handling shared '{kind}' event: {e}")
+                if time.monotonic() - last_cleanup > CLEANUP_INTERVAL:
+                    self.store.cleanup()
+                    last_cleanup = time.monotonic()
+            except Exception as e:
+                print(f"Error reading shared events: {e}")
+            if not events:
+                time.sleep(POLL_INTERVAL)
+
+    def status(self):
+        return {"backend": self.backend or "memory", "worker_id": WORKER_ID}
+
+
+def _claim(held, owner):
+    if held is None or held["owner"] == owner:
+        return {"owner": owner, "claimed_at": time.time()}, True
+    return held, False
+
+
+def _renewed(held, owner):
+    if held is None or held["owner"] != owner:
+        return held, False
+    return {**held, "renewed_at": time.time()}, True
+
+
+class LeaderElection:
+    # One worker per host holds the lease and runs the leader-only loops; the others
+    # take over within LEASE_TTL seconds if it goes away
+    def __init__(self, state):
+        self._state = state
+        self._name = f"leader:{HOST_ID}"
+        self._stop = threading.Event()
+        self._thread = None
+        self.is_leader = False
+
+    def start(self, on_elected, on_deposed):
+        if not self._state.enabled:
+            self.is_leader = True
+            on_elected()
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(on_elected, on_deposed), name="leader-election", daemon=True)
+        self._thread.start()
+
+    def _run(self, on_elected, on_deposed):
+        while not self._stop.is_set():
+            try:
+                leader = self._state.store.update("leases", self._name, lambda held: _claim(held, WORKER_ID), ttl=LEASE_TTL)
+            except Exception as e:
+                print(f"Error renewing the leader lease: {e}")
+                leader = False
+            if leader and not self.is_leader:
+                self.is_leader = True
+                print(f"Worker {WORKER_ID} is now the leader.")
+                on_elected()
+            elif not leader and self.is_leader:
+                self.is_leader = False
+                print(f"Worker {WORKER_ID} lost the leader lease.")
+                on_deposed()
+            self._stop.wait(LEASE_TTL / 3)
+
+    def stop(self):
+        self._stop.set()
+        if self._state.enabled and self.is_leader:
+            self.is_leader = False
+            self._state.store.update(
+                "leases", self._name, lambda held: (None if held and held["owner"] == WORKER_ID else held, None)
+            )
+
+    def status(self):
+        if not self._state.enabled:
+            return {"is_leader": self.is_leader, "leader": WORKER_ID}
+        held = self._state.store.get("leases", self._name)
+        return {"is_leader": self.is_leader, "leader": held["owner"] if held else None}
+
+
+shared_state = SharedState(BACKEND)
+leader_election = LeaderElection(shared_state)
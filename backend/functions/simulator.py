@@ -0,0 +1,649 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from botocore.exceptions import ClientError
+from botocore.hooks import HierarchicalEmitter
+
+# -------------------------
+# AWS SIMULATOR
+# -------------------------
+# In-memory stand-in for the boto3 clients, used when AWS_UI_PROVIDER=simulator. It covers
+# the EC2, S3, tagging, Route53 and SSM calls this app makes, with the same request and
+# response shapes and error codes. Instances boot, stop and terminate over time, Route53
+# changes go from PENDING to INSYNC, every call takes a (jittered) latency and each
+# service has an account rate limit that answers with its throttling error. The clients
+# emit the botocore events the rate limiter and metrics hook into, and retry throttled
+# calls like botocore's standard mode. State lives in this process only.
+
+LATENCY_SCALE = float(os.getenv("AWS_UI_SIM_LATENCY_SCALE", "1"))  # 0 = no latency
+THROTTLING = os.getenv("AWS_UI_SIM_THROTTLING", "1") == "1"
+BOOT_SECONDS = float(os.getenv("AWS_UI_SIM_BOOT_SECONDS", "5"))  # pending -> running
+STATUS_SECONDS = float(os.getenv("AWS_UI_SIM_STATUS_SECONDS", "10"))  # running -> status checks ok
+STOP_SECONDS = float(os.getenv("AWS_UI_SIM_STOP_SECONDS", "3"))  # stopping/shutting-down -> stopped/terminated
+CHANGE_SECONDS = float(os.getenv("AWS_UI_SIM_CHANGE_SECONDS", "5"))  # Route53 PENDING -> INSYNC
+# Demo inventory created on first use, e.g. "instances=20,buckets=5,zones=2,records=50"
+SEED = os.getenv("AWS_UI_SIM_SEED", "")
+MAX_ATTEMPTS = int(os.getenv("AWS_UI_MAX_ATTEMPTS", "5"))
+
+# service -> (mean latency in ms, account requests per second, burst, throttling error code)
+SERVICES = {
+    "ec2": (80, 20, 100, "RequestLimitExceeded"),
+    "s3": (40, 3500, 3500, "SlowDown"),
+    "resourcegroupstaggingapi": (60, 5, 10, "ThrottlingException"),
+    "route53": (60, 5, 5, "Throttling"),
+    "ssm": (40, 40, 40, "ThrottlingException"),
+}
+
+# operation -> (result key, page size) for the paginators the app uses
+PAGINATED = {
+    "describe_instances": ("Reservations", 1000),
+    "describe_instance_status": ("InstanceStatuses", 1000),
+    "list_buckets": ("Buckets", 1000),
+    "get_resources": ("ResourceTagMappingList", 100),
+    "list_object_versions": ("Versions", 1000),
+    "list_multipart_uploads": ("Uploads", 1000),
+    "list_parts": ("Parts", 1000),
+    "list_hosted_zones": ("HostedZones", 100),
+    "list_resource_record_sets": ("ResourceRecordSets", 300),
+}
+
+
+class SimulatedError(Exception):
+    def __init__(self, code, message, status=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+def _tags(tag_list):
+    return {tag["Key"]: tag["Value"] for tag in tag_list or []}
+
+
+def _tag_list(tags):
+    return [{"Key": key, "Value": value} for key, value in tags.items()]
+
+
+def _record_order(name):
+    # Route53 lists record sets by name with the labels reversed (com.example.www)
+    return tuple(reversed(name.rstrip(".").lower().split(".")))
+
+
+def _fqdn(name):
+    return name if name.endswith(".") else name + "."
+
+
+class Backend:
+    # The simulated account: every client of every service shares this state
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._buckets_by_service = {}  # service -> [tokens, updated]
+        self.instances = {}
+        self.key_pairs = {}
+        self.buckets = {}
+        self.zones = {}
+        self.changes = {}
+        self._seeded = False
+
+    # ---- plumbing ----
+
+    def call(self, service, operation, params, region):
+        latency, rate, burst, throttle_code = SERVICES.get(service, (50, 50, 50, "Throttling"))
+        if THROTTLING and not self._take_token(service, rate, burst):
+            raise SimulatedError(throttle_code, "Rate exceeded", 400 if service != "s3" else 503)
+        if LATENCY_SCALE > 0:
+            time.sleep(latency * LATENCY_SCALE * random.uniform(0.75, 1.25) / 1000)
+        handler = getattr(self, f"{service}_{operation}", None)
+        if handler is None:
+            raise SimulatedError("InvalidAction", f"The simulator does not implement {service}.{operation}.")
+        with self._lock:
+            self._seed_once(region)
+            return handler(region=region, **params)
+
+    def _take_token(self, service, rate, burst):
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets_by_service.get(service, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            self._buckets_by_service[service] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+
+    def _seed_once(self, region):
+        if self._seeded or not SEED:
+            return
+        self._seeded = True
+        counts = {key.strip(): int(value) for key, value in (item.split("=") for item in SEED.split(","))}
+        managed = [{"Key": "cli-managed", "Value": "true"}]
+        for number in range(1, counts.get("instances", 0) + 1):
+            instance = self._new_instance("ami-simulated", "t3.micro", None, region,
+                                          managed + [{"Key": "Name", "Value": f"demo-{number}"}])
+            # Already booted and past its status checks
+            instance["launched_at"] -= BOOT_SECONDS + STATUS_SECONDS
+            instance["state_at"] -= BOOT_SECONDS + STATUS_SECONDS
+        for number in range(1, counts.get("buckets", 0) + 1):
+            self.s3_create_bucket(region, Bucket=f"demo-bucket-{number}")
+            self.buckets[f"demo-bucket-{number}"]["tags"] = _tags(managed + [{"Key": "access", "Value": "private"}])
+        for number in range(1, counts.get("zones", 0) + 1):
+            zone_id = self.route53_create_hosted_zone(region, Name=f"demo{number}.example.com",
+                                                      CallerReference=f"demo-{number}")["HostedZone"]["Id"].split("/")[-1]
+            self.zones[zone_id]["tags"] = _tags(managed)
+            for record in range(counts.get("records", 0)):
+                self.zones[zone_id]["records"][(f"host{record}.demo{number}.example.com.", "A")] = {
+                    "Name": f"host{record}.demo{number}.example.com.", "Type": "A", "TTL": 300,
+                    "ResourceRecords": [{"Value": f"10.0.{record // 256 % 256}.{record % 256}"}],
+                }
+
+    # ---- EC2 ----
+
+    def _new_instance(self, image_id, instance_type, key_name, region, tags):
+        instance_id = "i-" + uuid.uuid4().hex[:17]
+        instance = {
+            "InstanceId": instance_id,
+            "ImageId": image_id,
+            "InstanceType": instance_type,
+            "KeyName": key_name,
+            "Placement": {"AvailabilityZone": f"{region}a"},
+            "tags": _tags(tags),
+            "launched_at": time.time(),
+            "state": "pending",
+            "state_at": time.time(),
+            "public_ip": None,
+            "reservation": "r-" + uuid.uuid4().hex[:17],
+        }
+        self.instances[instance_id] = instance
+        return instance
+
+    def _advance(self, instance):
+        # Applies the state transitions that are due by now
+        now = time.time()
+        if instance["state"] == "pending" and now - instance["state_at"] >= BOOT_SECONDS:
+            instance.update(state="running", state_at=instance["state_at"] + BOOT_SECONDS)
+        elif instance["state"] == "stopping" and now - instance["state_at"] >= STOP_SECONDS:
+            instance.update(state="stopped", state_at=instance["state_at"] + STOP_SECONDS, public_ip=None)
+        elif instance["state"] == "shutting-down" and now - instance["state_at"] >= STOP_SECONDS:
+            instance.update(state="terminated", state_at=instance["state_at"] + STOP_SECONDS, public_ip=None)
+        if instance["state"] == "running" and instance["public_ip"] is None:
+            instance["public_ip"] = f"198.51.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        return instance
+
+    def _describe(self, instance):
+        self._advance(instance)
+        described = {
+            "InstanceId": instance["InstanceId"],
+            "ImageId": instance["ImageId"],
+            "InstanceType": instance["InstanceType"],
+            "LaunchTime": instance["launched_at"],
+            "Placement": instance["Placement"],
+            "State": {"Name": instance["state"], "Code": _STATE_CODES[instance["state"]]},
+            "Tags": _tag_list(instance["tags"]),
+        }
+        if instance["KeyName"]:
+            described["KeyName"] = instance["KeyName"]
+        if instance["public_ip"]:
+            described["PublicIpAddress"] = instance["public_ip"]
+        return described
+
+    def _instances(self, instance_ids):
+        missing = [instance_id for instance_id in instance_ids if instance_id not in self.instances]
+        if missing:
+            raise SimulatedError("InvalidInstanceID.NotFound", f"The instance IDs '{', '.join(missing)}' do not exist")
+        return [self.instances[instance_id] for instance_id in instance_ids]
+
+    def ec2_describe_instances(self, region, Filters=(), InstanceIds=(), **kwargs):
+        instances = self._instances(InstanceIds) if InstanceIds else list(self.instances.values())
+        for instance in instances:
+            self._advance(instance)
+        for instance_filter in Filters:
+            name, values = instance_filter["Name"], set(instance_filter["Values"])
+            if name.startswith("tag:"):
+                instances = [i for i in instances if i["tags"].get(name[4:]) in values]
+            elif name == "instance-id":
+                instances = [i for i in instances if i["InstanceId"] in values]
+            elif name == "instance-state-name":
+                instances = [i for i in instances if i["state"] in values]
+            else:
+                raise SimulatedError("InvalidParameterValue", f"The filter '{name}' is invalid")
+        reservations = {}
+        for instance in instances:
+            reservations.setdefault(instance["reservation"], []).append(self._describe(instance))
+        return {"Reservations": [{"ReservationId": reservation, "Instances": described}
+                                 for reservation, described in reservations.items()]}
+
+    def ec2_describe_instance_status(self, region, InstanceIds=(), **kwargs):
+        statuses = []
+        for instance in self._instances(InstanceIds) if InstanceIds else list(self.instances.values()):
+            self._advance(instance)
+            if instance["state"] != "running":
+                continue
+            ready = time.time() - instance["state_at"] >= STATUS_SECONDS
+            status = "ok" if ready else "initializing"
+            statuses.append({
+                "InstanceId": instance["InstanceId"],
+                "InstanceState": {"Name": "running", "Code": 16},
+                "SystemStatus": {"Status": status},
+                "InstanceStatus": {"Status": status},
+            })
+        return {"InstanceStatuses": statuses}
+
+    def ec2_run_instances(self, region, ImageId, MinCount, MaxCount, InstanceType="m1.small", KeyName=None,
+                          TagSpecifications=(), **kwargs):
+        if KeyName and KeyName not in self.key_pairs:
+            raise SimulatedError("InvalidKeyPair.NotFound", f"The key pair '{KeyName}' does not exist")
+        tags = [tag for spec in TagSpecifications if spec["ResourceType"] == "instance" for tag in spec["Tags"]]
+        reservation = "r-" + uuid.uuid4().hex[:17]
+        launched = []
+        for _ in range(MaxCount):
+            instance = self._new_instance(ImageId, InstanceType, KeyName, region, tags)
+            instance["reservation"] = reservation
+            launched.append(self._describe(instance))
+        return {"ReservationId": reservation, "Instances": launched}
+
+    def _transition(self, instance_ids, target, allowed, key):
+        changed = []
+        for instance in self._instances(instance_ids):
+            self._advance(instance)
+            previous = instance["state"]
+            if previous not in allowed:
+                raise SimulatedError(
+                    "IncorrectInstanceState",
+                    f"The instance '{instance['InstanceId']}' is not in a state from which it can be {target}.",
+                )
+            if previous in ("pending", "running", "stopping", "stopped") and target != previous:
+                instance.update(state=target, state_at=time.time())
+                if target == "pending":
+                    instance["launched_at"] = time.time()
+            changed.append({
+                "InstanceId": instance["InstanceId"],
+                "CurrentState": {"Name": instance["state"], "Code": _STATE_CODES[instance["state"]]},
+                "PreviousState": {"Name": previous, "Code": _STATE_CODES[previous]},
+            })
+        return {key: changed}
+
+    def ec2_start_instances(self, region, InstanceIds, **kwargs):
+        return self._transition(InstanceIds, "pending", {"pending", "running", "stopped"}, "StartingInstances")
+
+    def ec2_stop_instances(self, region, InstanceIds, **kwargs):
+        return self._transition(InstanceIds, "stopping", {"pending", "running", "stopping", "stopped"}, "StoppingInstances")
+
+    def ec2_terminate_instances(self, region, InstanceIds, **kwargs):
+        return self._transition(InstanceIds, "shutting-down", set(_STATE_CODES), "TerminatingInstances")
+
+    def ec2_describe_key_pairs(self, region, KeyNames=(), **kwargs):
+        missing = [name for name in KeyNames if name not in self.key_pairs]
+        if missing:
+            raise SimulatedError("InvalidKeyPair.NotFound", f"The key pair '{missing[0]}' does not exist")
+        names = KeyNames or list(self.key_pairs)
+        return {"KeyPairs": [{"KeyName": name, "KeyFingerprint": self.key_pairs[name]} for name in names]}
+
+    def ec2_import_key_pair(self, region, KeyName, PublicKeyMaterial, **kwargs):
+        if KeyName in self.key_pairs:
+            raise SimulatedError("InvalidKeyPair.Duplicate", f"The keypair '{KeyName}' already exists.")
+        material = PublicKeyMaterial.encode() if isinstance(PublicKeyMaterial, str) else PublicKeyMaterial
+        self.key_pairs[KeyName] = hashlib.md5(material).hexdigest()
+        return {"KeyName": KeyName, "KeyFingerprint": self.key_pairs[KeyName]}
+
+    # ---- S3 ----
+
+    def _bucket(self, name):
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            raise SimulatedError("NoSuchBucket", "The specified bucket does not exist", 404)
+        return bucket
+
+    def s3_list_buckets(self, region, **kwargs):
+        return {"Buckets": [{"Name": name, "CreationDate": bucket["created"], "BucketRegion": bucket["region"]}
+                            for name, bucket in sorted(self.buckets.items())]}
+
+    def s3_create_bucket(self, region, Bucket, **kwargs):
+        if Bucket in self.buckets:
+            raise SimulatedError("BucketAlreadyOwnedByYou", "Your previous request to create the named bucket succeeded.", 409)
+        self.buckets[Bucket] = {"created": time.time(), "region": region, "tags": {}, "objects": {}, "uploads": {}}
+        return {"Location": f"/{Bucket}"}
+
+    def s3_get_bucket_location(self, region, Bucket, **kwargs):
+        bucket_region = self._bucket(Bucket)["region"]
+        return {"LocationConstraint": None if bucket_region == "us-east-1" else bucket_region}
+
+    def s3_put_public_access_block(self, region, Bucket, PublicAccessBlockConfiguration, **kwargs):
+        self._bucket(Bucket)["public_access_block"] = PublicAccessBlockConfiguration
+        return {}
+
+    def s3_put_bucket_policy(self, region, Bucket, Policy, **kwargs):
+        self._bucket(Bucket)["policy"] = Policy
+        return {}
+
+    def s3_put_bucket_tagging(self, region, Bucket, Tagging, **kwargs):
+        self._bucket(Bucket)["tags"] = _tags(Tagging["TagSet"])
+        return {}
+
+    def s3_get_bucket_tagging(self, region, Bucket, **kwargs):
+        bucket = self._bucket(Bucket)
+        if not bucket["tags"]:
+            raise SimulatedError("NoSuchTagSet", "The TagSet does not exist", 404)
+        return {"TagSet": _tag_list(bucket["tags"])}
+
+    def s3_delete_bucket(self, region, Bucket, **kwargs):
+        if self._bucket(Bucket)["objects"]:
+            raise SimulatedError("BucketNotEmpty", "The bucket you tried to delete is not empty", 409)
+        del self.buckets[Bucket]
+        return {}
+
+    def s3_put_object(self, region, Bucket, Key, Body=b"", **kwargs):
+        data = Body.read() if hasattr(Body, "read") else Body
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self._bucket(Bucket)["objects"][Key] = {"Size": len(data), "ETag": etag, "LastModified": time.time()}
+        return {"ETag": etag}
+
+    def s3_list_object_versions(self, region, Bucket, **kwargs):
+        objects = self._bucket(Bucket)["objects"]
+        return {"Versions": [{"Key": key, "VersionId": "null", "IsLatest": True, **obj}
+                             for key, obj in sorted(objects.items())], "DeleteMarkers": []}
+
+    def s3_delete_objects(self, region, Bucket, Delete, **kwargs):
+        objects = self._bucket(Bucket)["objects"]
+        for obj in Delete["Objects"]:
+            objects.pop(obj["Key"], None)
+        return {"Errors": []} if Delete.get("Quiet") else {"Deleted": Delete["Objects"], "Errors": []}
+
+    def s3_create_multipart_upload(self, region, Bucket, Key, **kwargs):
+        upload_id = uuid.uuid4().hex
+        self._bucket(Bucket)["uploads"][upload_id] = {"Key": Key, "parts": {}, "Initiated": time.time()}
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    def _upload(self, bucket_name, upload_id):
+        upload = self._bucket(bucket_name)["uploads"].get(upload_id)
+        if upload is None:
+            raise SimulatedError("NoSuchUpload", "The specified upload does not exist.", 404)
+        return upload
+
+    def s3_upload_part(self, region, Bucket, Key, UploadId, PartNumber, Body=b"", **kwargs):
+        data = Body.read() if hasattr(Body, "read") else Body
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self._upload(Bucket, UploadId)["parts"][PartNumber] = {"PartNumber": PartNumber, "ETag": etag, "Size": len(data)}
+        return {"ETag": etag}
+
+    def s3_list_parts(self, region, Bucket, Key, UploadId, **kwargs):
+        parts = self._upload(Bucket, UploadId)["parts"]
+        return {"Parts": [parts[number] for number in sorted(parts)]}
+
+    def s3_list_multipart_uploads(self, region, Bucket, **kwargs):
+        return {"Uploads": [{"Key": upload["Key"], "UploadId": upload_id, "Initiated": upload["Initiated"]}
+                            for upload_id, upload in self._bucket(Bucket)["uploads"].items()]}
+
+    def s3_complete_multipart_upload(self, region, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        upload = self._upload(Bucket, UploadId)
+        for part in MultipartUpload["Parts"]:
+            stored = upload["parts"].get(part["PartNumber"])
+            if stored is None or stored["ETag"] != part["ETag"]:
+                raise SimulatedError("InvalidPart", f"Part {part['PartNumber']} was not uploaded or its ETag differs.")
+        size = sum(upload["parts"][part["PartNumber"]]["Size"] for part in MultipartUpload["Parts"])
+        etag = f'"{uuid.uuid4().hex}-{len(MultipartUpload["Parts"])}"'
+        bucket = self._bucket(Bucket)
+        bucket["objects"][Key] = {"Size": size, "ETag": etag, "LastModified": time.time()}
+        del bucket["uploads"][UploadId]
+        return {"Bucket": Bucket, "Key": Key, "ETag": etag}
+
+    def s3_abort_multipart_upload(self, region, Bucket, Key, UploadId, **kwargs):
+        self._upload(Bucket, UploadId)
+        del self._bucket(Bucket)["uploads"][UploadId]
+        return {}
+
+    def resourcegroupstaggingapi_get_resources(self, region, ResourceTypeFilters=(), TagFilters=(), **kwargs):
+        mappings = []
+        if "s3" in ResourceTypeFilters:
+            for name, bucket in sorted(self.buckets.items()):
+                if bucket["region"] != region:
+                    continue
+                if all(bucket["tags"].get(tag_filter["Key"]) in tag_filter.get("Values", [bucket["tags"].get(tag_filter["Key"])])
+                       and tag_filter["Key"] in bucket["tags"] for tag_filter in TagFilters):
+                    mappings.append({"ResourceARN": f"arn:aws:s3:::{name}", "Tags": _tag_list(bucket["tags"])})
+        return {"ResourceTagMappingList": mappings}
+
+    # ---- Route53 ----
+
+    def _zone(self, zone_id):
+        zone = self.zones.get(zone_id.split("/")[-1])
+        if zone is None:
+            raise SimulatedError("NoSuchHostedZone", f"No hosted zone found with ID: {zone_id}", 404)
+        return zone
+
+    def _change(self):
+        change_id = "C" + uuid.uuid4().hex[:13].upper()
+        self.changes[change_id] = time.time()
+        return self._change_info(change_id)
+
+    def _change_info(self, change_id):
+        submitted = self.changes[change_id]
+        status = "INSYNC" if time.time() - submitted >= CHANGE_SECONDS else "PENDING"
+        return {"Id": f"/change/{change_id}", "Status": status,
+                "SubmittedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(submitted))}
+
+    def route53_create_hosted_zone(self, region, Name, CallerReference, HostedZoneConfig=None, **kwargs):
+        if any(zone["CallerReference"] == CallerReference for zone in self.zones.values()):
+            raise SimulatedError("HostedZoneAlreadyExists", f"A hosted zone has already been created with the caller reference {CallerReference}", 409)
+        zone_id = "Z" + uuid.uuid4().hex[:20].upper()
+        name = _fqdn(Name)
+        servers = [f"ns-{n}.simulator.awsdns-{n}.com." for n in range(4)]
+        self.zones[zone_id] = {
+            "Id": f"/hostedzone/{zone_id}",
+            "Name": name,
+            "CallerReference": CallerReference,
+            "Config": HostedZoneConfig or {"PrivateZone": False},
+            "tags": {},
+            "records": {
+                (name, "NS"): {"Name": name, "Type": "NS", "TTL": 172800,
+                               "ResourceRecords": [{"Value": server} for server in servers]},
+                (name, "SOA"): {"Name": name, "Type": "SOA", "TTL": 900, "ResourceRecords": [
+                    {"Value": f"{servers[0]} awsdns-hostmaster.amazon.com. 1 7200 900 1209600 86400"}]},
+            },
+        }
+        zone = self._zone(zone_id)
+        return {
+            "HostedZone": {"Id": zone["Id"], "Name": name, "CallerReference": CallerReference, "Config": zone["Config"],
+                           "ResourceRecordSetCount": 2},
+            "ChangeInfo": self._change(),
+            "DelegationSet": {"NameServers": [server.rstrip(".") for server in servers]},
+            "Location": f"https://route53.amazonaws.com/2013-04-01/hostedzone/{zone_id}",
+        }
+
+    def route53_delete_hosted_zone(self, region, Id, **kwargs):
+        zone = self._zone(Id)
+        if any((name, record_type) not in ((zone["Name"], "NS"), (zone["Name"], "SOA")) for name, record_type in zone["records"]):
+            raise SimulatedError("HostedZoneNotEmpty", "The hosted zone contains resource records that are not SOA or NS records.")
+        del self.zones[Id.split("/")[-1]]
+        return {"ChangeInfo": self._change()}
+
+    def route53_list_hosted_zones(self, region, **kwargs):
+        return {"HostedZones": [
+            {"Id": zone["Id"], "Name": zone["Name"], "CallerReference": zone["CallerReference"], "Config": zone["Config"],
+             "ResourceRecordSetCount": len(zone["records"])}
+            for zone in sorted(self.zones.values(), key=lambda zone: (zone["Name"], zone["Id"]))
+        ], "IsTruncated": False, "MaxItems": "100"}
+
+    def route53_change_tags_for_resource(self, region, ResourceType, ResourceId, AddTags=(), RemoveTagKeys=(), **kwargs):
+        zone = self._zone(ResourceId)
+        zone["tags"].update(_tags(AddTags))
+        for key in RemoveTagKeys:
+            zone["tags"].pop(key, None)
+        return {}
+
+    def route53_list_tags_for_resource(self, region, ResourceType, ResourceId, **kwargs):
+        return {"ResourceTagSet": {"ResourceType": ResourceType, "ResourceId": ResourceId,
+                                   "Tags": _tag_list(self._zone(ResourceId)["tags"])}}
+
+    def route53_list_tags_for_resources(self, region, ResourceType, ResourceIds, **kwargs):
+        if len(ResourceIds) > 10:
+            raise SimulatedError("InvalidInput", "At most 10 resource IDs are allowed.")
+        return {"ResourceTagSets": [self.route53_list_tags_for_resource(region, ResourceType, resource_id)["ResourceTagSet"]
+                                    for resource_id in ResourceIds]}
+
+    def route53_list_resource_record_sets(self, region, HostedZoneId, StartRecordName=None, StartRecordType=None,
+                                          MaxItems=None, **kwargs):
+        records = sorted(self._zone(HostedZoneId)["records"].values(),
+                         key=lambda record: (_record_order(record["Name"]), record["Type"]))
+        if StartRecordName:
+            start = (_record_order(StartRecordName), StartRecordType or "")
+            records = [record for record in records if (_record_order(record["Name"]), record["Type"]) >= start]
+        limit = int(MaxItems) if MaxItems else len(records)
+        page = {"ResourceRecordSets": records[:limit], "IsTruncated": len(records) > limit, "MaxItems": str(limit)}
+        if len(records) > limit:
+            page.update(NextRecordName=records[limit]["Name"], NextRecordType=records[limit]["Type"])
+        return page
+
+    def route53_change_resource_record_sets(self, region, HostedZoneId, ChangeBatch, **kwargs):
+        zone = self._zone(HostedZoneId)
+        records = dict(zone["records"])  # applied all-or-nothing
+        for change in ChangeBatch["Changes"]:
+            record = dict(change["ResourceRecordSet"], Name=_fqdn(change["ResourceRecordSet"]["Name"]).replace("*", "\\052"))
+            key = (record["Name"].lower(), record["Type"])
+            if change["Action"] == "CREATE" and key in records:
+                raise SimulatedError("InvalidChangeBatch", f"Tried to create resource record set [name='{record['Name']}', "
+                                     f"type='{record['Type']}'] but it already exists")
+            if change["Action"] == "DELETE":
+                if records.get(key) != record:
+                    raise SimulatedError("InvalidChangeBatch", f"Tried to delete resource record set [name='{record['Name']}', "
+                                         f"type='{record['Type']}'] but it was not found")
+                del records[key]
+            else:
+                records[key] = record
+        zone["records"] = records
+        return {"ChangeInfo": self._change()}
+
+    def route53_get_change(self, region, Id, **kwargs):
+        change_id = Id.split("/")[-1]
+        if change_id not in self.changes:
+            raise SimulatedError("NoSuchChange", f"Could not find resource with ID: {change_id}", 404)
+        return {"ChangeInfo": self._change_info(change_id)}
+
+    # ---- SSM ----
+
+    def ssm_get_parameters(self, region, Names, **kwargs):
+        # No public parameters are simulated, so the catalog keeps its pinned AMI IDs
+        return {"Parameters": [], "InvalidParameters": list(Names)}
+
+
+_STATE_CODES = {"pending": 0, "running": 16, "shutting-down": 32, "terminated": 48, "stopping": 64, "stopped": 80}
+
+
+class SimulatedPaginator:
+    def __init__(self, client, operation):
+        self._client = client
+        self._operation = operation
+
+    def paginate(self, PaginationConfig=None, **params):
+        return SimulatedPageIterator(self._client, self._operation, params, PaginationConfig or {})
+
+
+class SimulatedPageIterator:
+    # Each page is one simulated call. StartingToken/resume_token are offsets into the listing.
+    def __init__(self, client, operation, params, config):
+        self._client = client
+        self._operation = operation
+        self._params = params
+        self._max_items = config.get("MaxItems")
+        self._offset = int(config.get("StartingToken") or 0)
+        self._page_size = config.get("PageSize")
+        self.resume_token = None
+
+    def __iter__(self):
+        key, page_size = PAGINATED[self._operation]
+        page_size = self._page_size or page_size
+        offset, returned = self._offset, 0
+        while True:
+            limit = page_size if self._max_items is None else min(page_size, self._max_items - returned)
+            page = self._client._call(self._operation, dict(self._params), page=(key, offset, limit))
+            items = len(page.get(key, []))
+            offset += items
+            returned += items
+            yield page
+            if not page.pop("_more"):
+                return
+            if self._max_items is not None and returned >= self._max_items:
+                self.resume_token = str(offset)
+                return
+
+
+class SimulatedClient:
+    def __init__(self, service, region, backend):
+        self._service = service
+        self._backend = backend
+        self.meta = SimpleNamespace(region_name=region, events=HierarchicalEmitter(), service_model=SimpleNamespace(service_name=service))
+        self.exceptions = SimpleNamespace(ClientError=ClientError)
+
+    def __getattr__(self, name):
+        if name.startswith("_") or not hasattr(self._backend, f"{self._service}_{name}"):
+            raise AttributeError(f"'{self._service}' simulated client has no operation '{name}'")
+        return lambda **params: self._call(name, params)
+
+    def get_paginator(self, operation):
+        if operation not in PAGINATED:
+            raise AttributeError(f"The simulator has no paginator for '{operation}'")
+        return SimulatedPaginator(self, operation)
+
+    def _call(self, operation, params, page=None):
+        # Emits the botocore events the rate limiter and metrics listen to and retries
+        # throttled calls like botocore's standard retry mode
+        model = SimpleNamespace(name="".join(part.title() for part in operation.split("_")))
+        suffix = f"{self._service}.{model.name}"
+        context = {}
+        self.meta.events.emit(f"before-call.{suffix}", model=model, params=params, context=context)
+        attempts = 0
+        while True:
+            attempts += 1
+            self.meta.events.emit(f"before-send.{suffix}", request=None)
+            try:
+                parsed, status = self._backend.call(self._service, operation, params, self.meta.region_name), 200
+                if page is not None:
+                    parsed = _page(parsed, *page)
+            except SimulatedError as e:
+                parsed, status = {"Error": {"Code": e.code, "Message": e.message}}, e.status
+            http_response = SimpleNamespace(status_code=status)
+            self.meta.events.emit(f"needs-retry.{suffix}", response=(http_response, parsed), endpoint=None,
+                                  operation=model, attempts=attempts, caught_exception=None, request_dict={})
+            throttled = status == 503 or parsed.get("Error", {}).get("Code") in {code for *_, code in SERVICES.values()}
+            if not throttled or attempts >= MAX_ATTEMPTS:
+                break
+            time.sleep(random.uniform(0, min(20, 2 ** (attempts - 1))) * (LATENCY_SCALE or 0.01))
+        parsed["ResponseMetadata"] = {"HTTPStatusCode": status, "RetryAttempts": attempts - 1}
+        self.meta.events.emit(f"after-call.{suffix}", http_response=http_response, parsed=parsed, model=model, context=context)
+        if status >= 300:
+            raise ClientError(parsed, model.name)
+        return parsed
+
+    # Client-side helpers that don't call AWS
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, **kwargs):
+        params = Params or {}
+        return (f"https://{params.get('Bucket')}.s3.simulator.invalid/{params.get('Key', '')}"
+                f"?X-Simulated-Method={ClientMethod}&X-Amz-Expires={ExpiresIn}")
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=3600):
+        return {"url": f"https://{Bucket}.s3.simulator.invalid/", "fields": {"key": Key, **(Fields or {})}}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        data = Fileobj.read()
+        self._call("put_object", {"Bucket": Bucket, "Key": Key, "Body": data})
+        if Callback:
+            Callback(len(data))
+
+
+def _page(result, key, offset, limit):
+    items = result.get(key, [])
+    page = dict(result, **{key: items[offset:offset + limit]})
+    page["_more"] = offset + limit < len(items)
+    return page
+
+
+backend = Backend()
+
+
+def client(service, region=None):
+    # Route53 is global; boto3 reports its region as aws-global
+    if service == "route53":
+        region = "aws-global"
+    return SimulatedClient(service, region or os.getenv("AWS_DEFAULT_REGION", "us-east-1"), backend)
@@ -0,0 +1,74 @@
+import functools
+import threading
+
+# -------------------------
+# REQUEST COALESCING
+# -------------------------
+# Identical reads that arrive while one is already running wait for it and share its
+# result (or exception) instead of calling AWS again. Calls are grouped under the
+# inventory key of the listing they read, so an invalidation of that key makes later
+# callers start a new call rather than join one that may predate the change.
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}  # (group, call key) -> _Flight
+        self._counters = {"calls": 0, "shared": 0}
+
+    def do(self, group, key, func, *args, **kwargs):
+        with self._lock:
+            self._counters["calls"] += 1
+            flight = self._flights.get((group, key))
+            leader = flight is None
+            if leader:
+                flight = self._flights[(group, key)] = _Flight()
+            else:
+                self._counters["shared"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func(*args, **kwargs)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get((group, key)) is flight:
+                    del self._flights[(group, key)]
+            flight.done.set()
+        return flight.result
+
+    def coalesce(self, group):
+        # Decorator; group is a string or a function of the call's arguments returning one
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                name = group(*args, **kwargs) if callable(group) else group
+                key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+                return self.do(name, key, func, *args, **kwargs)
+            return wrapper
+        return decorator
+
+    def forget(self, *groups):
+        # Running calls finish for the callers already waiting on them
+        with self._lock:
+            for flight_key in [flight_key for flight_key in self._flights if flight_key[0] in groups]:
+                del self._flights[flight_key]
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._flights)}
+
+
+single_flight = SingleFlight()
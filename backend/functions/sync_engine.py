@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+from backend.functions import ec2_functions, route53_functions, s3_functions
+from backend.functions.event_hub import event_hub
+from backend.functions.inventory_invalidation import inventory_invalidation
+from backend.functions.inventory_store import inventory_store
+from backend.functions.shared_state import leader_election, shared_state
+from backend.functions.single_flight import single_flight
+
+# -------------------------
+# INVENTORY SYNC
+# -------------------------
+# A background worker mirrors the cli-managed EC2 instances, S3 buckets, Route53 zones
+# and the records of those zones into the inventory store, and the list endpoints read
+# from the store. Listings are re-synced every AWS_UI_SYNC_INTERVAL_<TYPE> seconds, and
+# right away when this app changes them (mutating functions invalidate the listing, see
+# inventory_invalidation, which marks it dirty here). A read of a dirty listing, one that
+# was never synced, one twice its interval old, or one last synced before this process
+# started syncs before answering. status() counts the reads answered from the store
+# (hits) and those that synced first (misses), and each listing's synced_at shows how
+# fresh it is. Each sync reads the whole listing from AWS; only the rows that changed
+# are written to the store, and those changes are published to the event hub for the
+# live dashboard.
+# With several workers only the leader runs the background loop (see shared_state); the
+# others still sync on demand when they read, one worker per listing at a time, and a
+# listing synced by any worker after it was marked dirty counts as clean everywhere.
+
+intervals = {
+    "ec2": float(os.getenv("AWS_UI_SYNC_INTERVAL_EC2", "30")),
+    "s3": float(os.getenv("AWS_UI_SYNC_INTERVAL_S3", "300")),
+    "route53_zones": float(os.getenv("AWS_UI_SYNC_INTERVAL_ROUTE53", "300")),
+    "route53_records": float(os.getenv("AWS_UI_SYNC_INTERVAL_ROUTE53", "300")),
+}
+SYNC_ENABLED = os.getenv("AWS_UI_SYNC_ENABLED", "1") == "1"
+IDLE_WAIT = 5  # longest the worker sleeps between checks for due listings
+SHARED_SYNC_TIMEOUT = 120  # longest a worker waits for another worker's sync of a listing
+DIRTY_MARK_TTL = 3600  # shared dirty marks outlive any sync that could still be racing them
+# Listings synced before this process started may be from another configuration or long
+# out of date, so they are not trusted
+STARTED_AT = time.time()
+
+
+class SyncError(Exception):
+    pass
+
+
+class ListingGone(SyncError):
+    # The resource holding the listing no longer exists (e.g. a deleted hosted zone)
+    pass
+
+
+def _fetch_ec2(scope):
+    result = ec2_functions.list_ec2()
+    if "error" in result:
+        raise SyncError(result["error"])
+    return result["instances"]
+
+
+def _fetch_s3(scope):
+    result = s3_functions.list_s3()
+    if isinstance(result, dict):
+        raise SyncError(result["error"])
+    return result
+
+
+def _fetch_route53_zones(scope):
+    return route53_functions.list_route53_zones()
+
+
+def _fetch_route53_records(zone_id):
+    result = route53_functions.list_dns_records(zone_id)
+    if "error" in result:
+        if "NoSuchHostedZone" in result["error"]:
+            raise ListingGone(result["error"])
+        raise SyncError(result["error"])
+    return result.get("records", [])
+
+
+# resource type -> (fetcher taking the scope, key of one item)
+resource_types = {
+    "ec2": (_fetch_ec2, lambda instance: instance["id"]),
+    "s3": (_fetch_s3, lambda bucket: bucket["BucketName"]),
+    "route53_zones": (_fetch_route53_zones, lambda zone: zone["ZoneId"]),
+    "route53_records": (_fetch_route53_records, lambda record: "|".join(
+        [record["Name"], record["Type"]] + ([record["SetIdentifier"]] if "SetIdentifier" in record else [])
+    )),
+}
+
+
+def listing_key(resource_type, scope=""):
+    # The key that mutating functions invalidate for a listing (see inventory_invalidation)
+    return f"{resource_type}:{scope}" if scope else resource_type
+
+
+class SyncEngine:
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._dirty = {}  # (resource type, scope) -> time it was marked dirty
+        self._sync_locks = {}
+        self._attempted = {}  # (resource type, scope) -> time of the last sync attempt
+        self._reads = {}  # resource type -> {"hits", "misses"} of this worker's reads
+        self._worker = None
+        self._stopping = False
+
+    def read(self, resource_type, scope="", fresh=False, with_ids=False):
+        # Returns {"items", "synced_at", "error"}; synced_at is None if no sync ever succeeded.
+        # with_ids returns the items as {"id", "item"}, the form used by the live events.
+        state = self._state(resource_type, scope)
+        dirty = self._is_dirty((resource_type, scope), state)
+        miss = fresh or dirty or state is None or state["synced_at"] is None or state["synced_at"] < STARTED_AT or \
+            time.time() - state["synced_at"] > 2 * intervals[resource_type]
+        with self._lock:
+            reads = self._reads.setdefault(resource_type, {"hits": 0, "misses": 0})
+            reads["misses" if miss else "hits"] += 1
+        if miss:
+            self.sync(resource_type, scope, force=fresh)
+            state = self._state(resource_type, scope)
+        return {
+            "items": inventory_store.read(resource_type, scope, with_ids),
+            "synced_at": state["synced_at"] if state else None,
+            "error": state["error"] if state else None,
+        }
+
+    def sync(self, resource_type, scope="", force=False):
+        # Runs one sync of a listing. Callers that queue up behind a running sync of the same
+        # listing reuse its result unless force is set or the listing was changed meanwhile.
+        requested_at = time.time()
+        with self._lock:
+            lock = self._sync_locks.setdefault((resource_type, scope), threading.Lock())
+        with lock, shared_state.lock(f"sync:{resource_type}:{scope}", SHARED_SYNC_TIMEOUT) as acquired:
+            if not acquired:
+                # Another worker's sync of this listing is taking too long; its result will do
+                print(f"Skipping sync of {listing_key(resource_type, scope)}: another worker is still syncing it.")
+                return False
+            state = self._state(resource_type, scope)
+            dirty = self._is_dirty((resource_type, scope), state)
+            with self._lock:
+                if not force and not dirty and state and (state["synced_at"] or 0) >= requested_at:
+                    return True
+                self._dirty.pop((resource_type, scope), None)
+                self._attempted[(resource_type, scope)] = time.time()
+            fetch, key = resource_types[resource_type]
+            started = time.monotonic()
+            try:
+                items = fetch(scope)
+            except ListingGone as e:
+                print(f"Dropping {listing_key(resource_type, scope)}: {e}")
+                self._drop(resource_type, scope)
+                return False
+            except Exception as e:
+                print(f"Error syncing {listing_key(resource_type, scope)}: {e}")
+                inventory_store.record_error(resource_type, scope, str(e))
+                return False
+            if resource_type == "route53_zones":
+                previous = {zone["ZoneId"] for zone in inventory_store.read("route53_zones")}
+                self._drop_deleted_zones(previous - {zone["ZoneId"] for zone in items})
+            diff = inventory_store.replace(resource_type, scope, items, _unique_keys(key), time.monotonic() - started)
+            if diff["upserted"] or diff["removed"]:
+                print(f"Synced {listing_key(resource_type, scope)}: {len(items)} item(s), "
+                      f"{len(diff['upserted']) + len(diff['removed'])} change(s).")
+                event_hub.publish({"event": "diff", "type": resource_type, "scope": scope, "synced_at": time.time(), **diff})
+            return True
+
+    def mark_dirty(self, resource_type, scope="", marked_at=None):
+        marked_at = marked_at or time.time()
+        with self._lock:
+            self._dirty[(resource_type, scope)] = max(marked_at, self._dirty.get((resource_type, scope), 0))
+            self._lock.notify()
+        if shared_state.enabled:
+            # Other workers see the mark on their next read, before the invalidate event reaches them
+            shared_state.store.update("dirty", listing_key(resource_type, scope),
+                                      lambda current: (marked_at if marked_at > (current or 0) else current, None),
+                                      ttl=DIRTY_MARK_TTL)
+
+    def _is_dirty(self, listing, state):
+        # A sync that started after the listing was marked, by any worker, cleans it
+        shared_mark = shared_state.store.get("dirty", listing_key(*listing)) if shared_state.enabled else None
+        with self._lock:
+            if shared_mark and shared_mark > self._dirty.get(listing, 0):
+                self._dirty[listing] = shared_mark
+            marked_at = self._dirty.get(listing)
+            if marked_at is None:
+                return False
+            if state and state["synced_at"] and state["synced_at"] - (state["duration"] or 0) > marked_at:
+                self._dirty.pop(listing, None)
+                return False
+            return True
+
+    def status(self):
+        with self._lock:
+            dirty = sorted(listing_key(*listing) for listing in self._dirty)
+            running = self._worker is not None and self._worker.is_alive()
+            reads = {resource_type: dict(counts) for resource_type, counts in self._reads.items()}
+        return {
+            "worker_running": running,
+            "intervals": intervals,
+            "dirty": dirty,
+            "reads": reads,
+            "live_subscribers": event_hub.subscriber_count(),
+            "leader": leader_election.status(),
+            "shared_state": shared_state.status(),
+            "single_flight": single_flight.stats(),
+            "listings": inventory_store.sync_state(),
+        }
+
+    def start(self):
+        with self._lock:
+            # A worker that was asked to stop but hasn't yet keeps running
+            self._stopping = False
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="inventory-sync", daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._lock.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+            due, wait = self._due_listings()
+            for resource_type, scope in due:
+                try:
+                    self.sync(resource_type, scope)
+                except Exception as e:
+                    print(f"Error syncing {listing_key(resource_type, scope)}: {e}")
+            if not due:
+                with self._lock:
+                    if not self._dirty and not self._stopping:
+                        self._lock.wait(wait)
+
+    def _due_listings(self):
+        # Listings to sync now, and how long until the next one is due otherwise
+        listings = [("ec2", ""), ("s3", ""), ("route53_zones", "")]
+        listings += [("route53_records", zone["ZoneId"]) for zone in inventory_store.read("route53_zones")]
+        states = {(state["type"], state["scope"]): state for state in inventory_store.sync_state()}
+        synced = {listing: state["synced_at"] or 0 for listing, state in states.items() if (state["synced_at"] or 0) >= STARTED_AT}
+        with self._lock:
+            listings += [listing for listing in self._dirty if listing not in listings]
+        due = [listing for listing in listings if self._is_dirty(listing, states.get(listing))]
+        now = time.time()
+        with self._lock:
+            # Failed syncs leave synced_at alone, so retry them an interval after the attempt
+            last = {listing: max(synced.get(listing, 0), self._attempted.get(listing, 0)) for listing in listings}
+        wait = IDLE_WAIT
+        for listing in listings:
+            remaining = last[listing] + intervals[listing[0]] - now
+            if remaining <= 0 and listing not in due:
+                due.append(listing)
+            wait = min(wait, max(remaining, 0.1))
+        return due, wait
+
+    def _drop_deleted_zones(self, zone_ids):
+        for zone_id in zone_ids:
+            self._drop("route53_records", zone_id)
+            with self._lock:
+                self._dirty.pop(("route53_records", zone_id), None)
+
+    def _drop(self, resource_type, scope):
+        inventory_store.drop(resource_type, scope)
+        event_hub.publish({"event": "drop", "type": resource_type, "scope": scope})
+
+    def _state(self, resource_type, scope):
+        states = inventory_store.sync_state(resource_type, scope)
+        return states[0] if states else None
+
+    def _on_invalidate(self, keys, invalidated_at):
+        for key in keys:
+            resource_type, _, scope = key.partition(":")
+            if resource_type in resource_types:
+                self.mark_dirty(resource_type, scope, invalidated_at)
+
+
+def _unique_keys(key):
+    # Keys should be unique already (record sets with routing policies include their set
+    # identifier); number any repeats rather than lose an item
+    seen = {}
+
+    def unique(item):
+        item_key = key(item)
+        seen[item_key] = seen.get(item_key, 0) + 1
+        return item_key if seen[item_key] == 1 else f"{item_key}#{seen[item_key]}"
+    return unique
+
+
+sync_engine = SyncEngine()
+inventory_invalidation.add_listener(sync_engine._on_invalidate)
@@ -1,9 +1,19 @@
 import os
-from fastapi import FastAPI
+import threading
+import time
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse 
-from backend.api import ec2, s3, route53
+from fastapi.responses import FileResponse, PlainTextResponse
+from backend.api import ec2, s3, route53, sync
+from backend.functions import aws_clients, executor, launch_catalog
+from backend.functions.metrics import end_request_timing, metrics, start_request_timing
+from backend.functions.rate_limiter import rate_limiter
+from backend.functions.shared_state import leader_election, shared_state
+from backend.functions.sync_engine import sync_engine, SYNC_ENABLED
+
+# Build the AWS clients and load the launch configuration right after startup
+WARM_UP_ENABLED = os.getenv("AWS_UI_WARM_UP", "1") == "1"
 
 app = FastAPI()
 
@@ -22,6 +32,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route, and a Server-Timing header with the AWS time of each API call
+@app.middleware("http")
+async def record_timing(request: Request, call_next):
+    started = time.perf_counter()
+    token = start_request_timing()
+    response = await call_next(request)
+    duration = time.perf_counter() - started
+    server_timing = end_request_timing(token, duration)
+    if request.url.path.startswith("/api/"):
+        response.headers["Server-Timing"] = server_timing
+    metrics.observe(
+        "aws_ui_http_request_duration_seconds",
+        {"method": request.method, "route": _route_path(request), "status": str(response.status_code)},
+        duration,
+    )
+    return response
+
+_route_paths = {}
+
+def _route_path(request):
+    # The route's path template, so /api/ec2/create/jobs/{job_id} is one series
+    endpoint = request.scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in _route_paths:
+        _route_paths[endpoint] = next(
+            (route.path for route in app.routes if getattr(route, "endpoint", getattr(route, "app", None)) is endpoint),
+            "unmatched",
+        )
+    return _route_paths[endpoint]
+
 # absolute path to the frontend folder.
 frontend_path = os.path.join(os.path.dirname(__file__), "..", "frontend")
 
@@ -38,7 +79,71 @@ async def read_index():
 app.include_router(ec2.router, prefix="/api/ec2")
 app.include_router(s3.router, prefix="/api/s3")
 app.include_router(route53.router, prefix="/api/route53")
+app.include_router(sync.router, prefix="/api/sync")
+
+# Prometheus metrics: AWS call latency, retries, throttles and errors, request latency
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Per service and region: current request rate, queued calls and throttles seen
+@app.get("/api/rate-limits")
+async def rate_limits():
+    return rate_limiter.stats()
+
+# Nothing expensive happens at import. Once the server accepts requests, a background
+# thread imports boto3, builds the clients and validates the EC2 launch configuration,
+# so a bad configuration.txt shows up in the log at startup instead of on the first launch.
+@app.on_event("startup")
+async def start_warm_up():
+    if WARM_UP_ENABLED:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+def _warm_up():
+    started = time.perf_counter()
+    try:
+        launch_catalog.warm_up()
+    except (OSError, ValueError) as e:
+        print(f"Invalid EC2 launch configuration, instance launches will fail until it is fixed: {e}")
+    try:
+        aws_clients.warm_up()
+    except Exception as e:
+        print(f"Error building AWS clients: {e}")
+    print(f"Warm-up finished in {time.perf_counter() - started:.2f}s.")
+
+# Mirror the AWS inventory into the local store and refresh the AMI catalog in the
+# background. With several workers (AWS_UI_SHARED_STATE set) only the elected leader runs
+# these loops. The Route53 change poller and the EC2 launch watcher run in every worker:
+# each follows only the changes and launches submitted through its own worker, so every
+# change or instance is still polled once.
+@app.on_event("startup")
+async def start_sync():
+    shared_state.start()
+    if SYNC_ENABLED or launch_catalog.REFRESH_INTERVAL > 0:
+        leader_election.start(on_elected=_start_leader_tasks, on_deposed=_stop_leader_tasks)
+
+def _start_leader_tasks():
+    if SYNC_ENABLED:
+        sync_engine.start()
+    launch_catalog.start_refresher()
+
+def _stop_leader_tasks():
+    sync_engine.stop()
+    launch_catalog.stop_refresher()
+
+# Release the AWS worker threads when the server stops
+@app.on_event("shutdown")
+async def shutdown_executor():
+    leader_election.stop()
+    _stop_leader_tasks()
+    executor.shutdown()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("AWS_UI_WORKERS", "1"))
+    if workers > 1:
+        # Workers are separate processes; they need shared state to act as one app
+        os.environ.setdefault("AWS_UI_SHARED_STATE", "sqlite")
+        uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,388 @@
+"""Load-test the API against an in-process moto stand-in for AWS.
+
+Seeds moto with cli-managed EC2 instances, S3 buckets, Route53 zones and records, starts
+the FastAPI app from backend/main.py in-process, and sends each endpoint a number of
+requests with a fixed concurrency. Latency percentiles, throughput, status codes and the
+AWS calls each request made (from its Server-Timing header) are written as JSON.
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/run_benchmarks.py --instances 500 --buckets 50 --zones 5 --records 1000
+    python benchmarks/run_benchmarks.py --baseline results/previous.json   # flags regressions
+
+No real AWS account is used; fake credentials are set for the run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGION = "us-east-1"
+SERVER_TIMING = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="(\d+) call)?')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--instances", type=int, default=5000, help="cli-managed EC2 instances to seed")
+    parser.add_argument("--buckets", type=int, default=500, help="cli-managed S3 buckets to seed")
+    parser.add_argument("--zones", type=int, default=50, help="cli-managed hosted zones to seed")
+    parser.add_argument("--records", type=int, default=10000, help="A records to seed per zone")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--only", default="", help="comma-separated endpoint names or prefixes (e.g. ec2,route53_record)")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable the client-side AWS rate limiter")
+    parser.add_argument("--no-sync", action="store_true", help="don't run the background inventory sync worker")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown vs. the baseline (0.25 = 25%%)")
+    return parser.parse_args()
+
+
+def configure_environment(args, workdir):
+    # Must happen before the backend is imported, as its modules read the env at import time
+    os.environ.update({
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": REGION,
+        "AWS_UI_INVENTORY_DB": os.path.join(workdir, "inventory.sqlite3"),
+        "AWS_UI_MAX_RUNNING_INSTANCES": str(args.instances + 10 * args.requests),
+    })
+    os.environ.pop("AWS_PROFILE", None)
+    if args.no_rate_limit:
+        os.environ["AWS_UI_RATE_LIMIT_ENABLED"] = "0"
+    if args.no_sync:
+        os.environ["AWS_UI_SYNC_ENABLED"] = "0"
+    sys.path.insert(0, ROOT)
+
+
+# -------------------------
+# SEEDING
+# -------------------------
+# Seeding talks to moto through plain boto3 clients, so it is neither rate limited nor
+# counted in the app's metrics.
+
+def seed(args, workdir):
+    import boto3
+
+    started = time.perf_counter()
+    ec2 = boto3.client("ec2", region_name=REGION)
+    vpc_id = ec2.create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+    subnet_id = ec2.create_subnet(VpcId=vpc_id, CidrBlock="10.0.0.0/20")["Subnet"]["SubnetId"]
+    security_group = ec2.create_security_group(GroupName="benchmark", Description="benchmark", VpcId=vpc_id)["GroupId"]
+    # The app reads its launch network from this file (the backend is not imported yet)
+    network_config = os.path.join(workdir, "configuration.txt")
+    with open(network_config, "w") as f:
+        f.write(f"security-group:{security_group}\nsubnet-id:{subnet_id}\n")
+    os.environ["AWS_UI_EC2_CONFIG"] = network_config
+    ami = ec2.describe_images(Owners=["amazon"])["Images"][0]["ImageId"]
+    remaining, number = args.instances, 0
+    while remaining:
+        count = min(remaining, 500)
+        instances = ec2.run_instances(
+            ImageId=ami, InstanceType="t3.nano", MinCount=count, MaxCount=count,
+            SubnetId=subnet_id,
+            TagSpecifications=[{"ResourceType": "instance", "Tags": [{"Key": "cli-managed", "Value": "true"}]}],
+        )["Instances"]
+        for instance in instances:
+            number += 1
+            ec2.create_tags(Resources=[instance["InstanceId"]], Tags=[{"Key": "Name", "Value": f"bench-{number}"}])
+        remaining -= count
+
+    s3 = boto3.client("s3", region_name=REGION)
+    for number in range(1, args.buckets + 1):
+        bucket = f"bench-bucket-{number}"
+        s3.create_bucket(Bucket=bucket)
+        s3.put_bucket_tagging(Bucket=bucket, Tagging={"TagSet": [{"Key": "cli-managed", "Value": "true"}]})
+
+    route53 = boto3.client("route53", region_name=REGION)
+    zone_ids = []
+    for number in range(1, args.zones + 1):
+        zone = route53.create_hosted_zone(Name=f"bench{number}.example.com", CallerReference=f"bench-{number}")
+        zone_id = zone["HostedZone"]["Id"].split("/")[-1]
+        route53.change_tags_for_resource(
+            ResourceType="hostedzone", ResourceId=zone_id, AddTags=[{"Key": "cli-managed", "Value": "true"}]
+        )
+        for start in range(0, args.records, 1000):
+            changes = [
+                {"Action": "CREATE", "ResourceRecordSet": {
+                    "Name": f"host{record}.bench{number}.example.com", "Type": "A", "TTL": 300,
+                    "ResourceRecords": [{"Value": f"10.{record // 65536 % 256}.{record // 256 % 256}.{record % 256}"}],
+                }}
+                for record in range(start, min(start + 1000, args.records))
+            ]
+            route53.change_resource_record_sets(HostedZoneId=zone_id, ChangeBatch={"Changes": changes})
+        zone_ids.append(zone_id)
+
+    return {
+        "instances": args.instances,
+        "buckets": args.buckets,
+        "zones": args.zones,
+        "records_per_zone": args.records,
+        "zone_ids": zone_ids,
+        "pubkey_path": _write_public_key(workdir),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def _write_public_key(workdir):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    public_key = rsa.generate_private_key(public_exponent=65537, key_size=2048).public_key().public_bytes(
+        serialization.Encoding.OpenSSH, serialization.PublicFormat.OpenSSH
+    )
+    # Inside a container the app only reads keys from /root/.ssh
+    directory = "/root/.ssh" if os.path.exists("/.dockerenv") else workdir
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"aws-ui-benchmark-{os.getpid()}.pub")
+    with open(path, "wb") as f:
+        f.write(public_key)
+    return path
+
+
+# -------------------------
+# ENDPOINTS
+# -------------------------
+# name -> (method, request builder). A builder gets the request number and the shared
+# state and returns the path and keyword arguments for httpx. Endpoints run in this
+# order, so the create endpoints leave resources behind for the update/delete ones.
+# Server-sent event endpoints are left out, they stay open until a job finishes.
+
+def _zone(state, i):
+    return state["zone_ids"][i % len(state["zone_ids"])]
+
+
+def _instance(state, i):
+    return f"bench-{i % state['instances'] + 1}"
+
+
+ENDPOINTS = {
+    "ec2_list": ("GET", lambda i, s: ("/api/ec2/list", {})),
+    "ec2_list_fresh": ("GET", lambda i, s: ("/api/ec2/list?fresh=1", {})),
+    "ec2_list_page": ("GET", lambda i, s: ("/api/ec2/list?limit=100", {})),
+    "ec2_list_stream": ("GET", lambda i, s: ("/api/ec2/list?stream=1", {})),
+    "ec2_stop": ("POST", lambda i, s: ("/api/ec2/stop", {"json": {"instance_identifier": _instance(s, i)}})),
+    "ec2_start": ("POST", lambda i, s: ("/api/ec2/start", {"json": {"instance_identifier": _instance(s, i)}})),
+    "ec2_bulk_stop": ("POST", lambda i, s: ("/api/ec2/bulk/stop", {
+        "json": {"instance_identifiers": [_instance(s, i * 10 + n) for n in range(10)]}})),
+    "ec2_bulk_start": ("POST", lambda i, s: ("/api/ec2/bulk/start", {
+        "json": {"instance_identifiers": [_instance(s, i * 10 + n) for n in range(10)]}})),
+    "ec2_create": ("POST", lambda i, s: ("/api/ec2/create", {"json": {
+        "instance_name": f"bench-new-{i}", "instance_type": "t3.nano", "ami": "ubuntu", "pubkey_path": s["pubkey_path"]}})),
+    "ec2_create_batch": ("POST", lambda i, s: ("/api/ec2/create/batch", {"json": {
+        "name_template": f"bench-batch-{i}-{{n}}", "count": 5, "instance_type": "t3.nano", "ami": "ubuntu",
+        "pubkey_path": s["pubkey_path"]}})),
+    "ec2_create_job": ("GET", lambda i, s: (f"/api/ec2/create/jobs/{s['jobs'][i % len(s['jobs'])]}", {})),
+    "ec2_terminate": ("POST", lambda i, s: ("/api/ec2/terminate", {"json": {"instance_identifier": f"bench-new-{i}"}})),
+    "ec2_bulk_terminate": ("POST", lambda i, s: ("/api/ec2/bulk/terminate", {
+        "json": {"instance_identifiers": [f"bench-batch-{i}-{n}" for n in range(1, 6)]}})),
+    "s3_list": ("GET", lambda i, s: ("/api/s3/list", {})),
+    "s3_list_fresh": ("GET", lambda i, s: ("/api/s3/list?fresh=1", {})),
+    "s3_list_page": ("GET", lambda i, s: ("/api/s3/list?limit=100", {})),
+    "s3_list_stream": ("GET", lambda i, s: ("/api/s3/list?stream=1", {})),
+    "s3_create": ("POST", lambda i, s: ("/api/s3/create", {"json": {"bucket_name": f"bench-new-{i}", "access": "private"}})),
+    "s3_upload": ("POST", lambda i, s: ("/api/s3/upload", {
+        "data": {"bucket_name": f"bench-new-{i}"}, "files": {"file": (f"file-{i}.txt", b"x" * 1024)}})),
+    "s3_presign_upload": ("POST", lambda i, s: ("/api/s3/presign/upload", {
+        "json": {"bucket_name": f"bench-new-{i}", "key": f"presigned-{i}.txt"}})),
+    "s3_presign_download": ("GET", lambda i, s: (f"/api/s3/presign/download?bucket_name=bench-new-{i}&key=file-{i}.txt", {})),
+    "s3_delete": ("DELETE", lambda i, s: (f"/api/s3/delete/bench-new-{i}", {})),
+    "route53_zone_list": ("GET", lambda i, s: ("/api/route53/zone/list", {})),
+    "route53_zone_list_fresh": ("GET", lambda i, s: ("/api/route53/zone/list?fresh=1", {})),
+    "route53_zone_list_page": ("GET", lambda i, s: ("/api/route53/zone/list?limit=100", {})),
+    "route53_zone_create": ("POST", lambda i, s: ("/api/route53/zone/create", {"json": {"zone_name": f"new{i}.example.com"}})),
+    "route53_zone_delete": ("DELETE", lambda i, s: (f"/api/route53/zone/delete?zone_id={s['new_zones'][i % len(s['new_zones'])]}", {})),
+    "route53_record_list": ("GET", lambda i, s: (f"/api/route53/record/list?zone_id={_zone(s, i)}", {})),
+    "route53_record_list_fresh": ("GET", lambda i, s: (f"/api/route53/record/list?zone_id={_zone(s, i)}&fresh=1", {})),
+    "route53_record_list_page": ("GET", lambda i, s: (f"/api/route53/record/list?zone_id={_zone(s, i)}&limit=300", {})),
+    "route53_record_create": ("POST", lambda i, s: ("/api/route53/record/create", {"json": {
+        "zone_id": _zone(s, i), "record_name": f"new{i}.bench{i % len(s['zone_ids']) + 1}.example.com",
+        "record_type": "A", "record_value": "192.0.2.1"}})),
+    "route53_record_update": ("PUT", lambda i, s: ("/api/route53/record/update", {"json": {
+        "zone_id": _zone(s, i), "record_name": f"new{i}.bench{i % len(s['zone_ids']) + 1}.example.com",
+        "record_type": "A", "record_value": "192.0.2.2"}})),
+    "route53_record_delete": ("DELETE", lambda i, s: (
+        f"/api/route53/record/delete?zone_id={_zone(s, i)}&record_name=new{i}.bench{i % len(s['zone_ids']) + 1}.example.com", {})),
+    "route53_record_bulk": ("POST", lambda i, s: ("/api/route53/record/bulk", {"json": {"zone_id": _zone(s, i), "changes": [
+        {"action": "UPSERT", "record_name": f"bulk{i}-{n}.bench{i % len(s['zone_ids']) + 1}.example.com",
+         "record_type": "A", "record_values": ["192.0.2.3"]} for n in range(50)]}})),
+    "route53_change": ("GET", lambda i, s: (f"/api/route53/change/{s['changes'][i % len(s['changes'])]}", {})),
+}
+
+
+def _remember(name, response, state):
+    # Keeps the IDs later endpoints need
+    if response.status_code >= 400:
+        return
+    if name == "ec2_create":
+        state["jobs"].append(response.json()["job_id"])
+    elif name == "route53_zone_create":
+        state["new_zones"].append(response.json()["zone_id"])
+    elif name in ("route53_record_create", "route53_record_update"):
+        state["changes"].append(response.json()["change"]["change_id"])
+
+
+# -------------------------
+# LOAD
+# -------------------------
+
+async def run_endpoint(client, name, count, concurrency, state):
+    method, build = ENDPOINTS[name]
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i):
+        path, kwargs = build(i, state)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latency = time.perf_counter() - started
+        _remember(name, response, state)
+        timing = {key: (float(duration), int(calls or 0)) for key, duration, calls in
+                  SERVER_TIMING.findall(response.headers.get("server-timing", ""))}
+        samples.append({
+            "latency": latency,
+            "status": response.status_code,
+            "aws_calls": timing.get("aws", (0, 0))[1],
+            "aws_ms": timing.get("aws", (0, 0))[0],
+            "ratelimit_ms": timing.get("ratelimit", (0, 0))[0],
+        })
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample["latency"] * 1000 for sample in samples)
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+    aws_calls = [sample["aws_calls"] for sample in samples]
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for sample in samples if sample["status"] >= 400),
+        "status_codes": statuses,
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 2),
+            "p50": round(_percentile(latencies, 50), 2),
+            "p95": round(_percentile(latencies, 95), 2),
+            "p99": round(_percentile(latencies, 99), 2),
+            "max": round(latencies[-1], 2),
+        },
+        "aws_calls_per_request": {"mean": round(statistics.mean(aws_calls), 2), "max": max(aws_calls)},
+        "aws_ms_per_request": round(statistics.mean(sample["aws_ms"] for sample in samples), 2),
+        "ratelimit_wait_ms_per_request": round(statistics.mean(sample["ratelimit_ms"] for sample in samples), 2),
+    }
+
+
+def _percentile(sorted_values, percent):
+    # Nearest-rank percentile
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+async def run_load(args, state):
+    import httpx
+    from backend.main import app
+
+    selected = [name for name in ENDPOINTS if not args.only or
+                any(name.startswith(prefix.strip()) for prefix in args.only.split(","))]
+    results = {}
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark",
+                                     timeout=None) as client:
+            for name in selected:
+                if name == "ec2_create_job" and not state["jobs"] or \
+                        name == "route53_zone_delete" and not state["new_zones"] or \
+                        name == "route53_change" and not state["changes"]:
+                    print(f"{name}: skipped, the endpoint creating its inputs did not run or failed")
+                    continue
+                results[name] = await run_endpoint(client, name, args.requests, args.concurrency, state)
+                summary = results[name]
+                print(f"{name}: {summary['throughput_rps']} req/s, p50 {summary['latency_ms']['p50']} ms, "
+                      f"p95 {summary['latency_ms']['p95']} ms, {summary['aws_calls_per_request']['mean']} AWS calls/req, "
+                      f"{summary['errors']} error(s)")
+    finally:
+        await app.router.shutdown()
+    return results
+
+
+# -------------------------
+# REPORT
+# -------------------------
+
+def compare(results, baseline, tolerance):
+    # Endpoints whose p95 latency or AWS calls per request grew compared to the baseline
+    regressions = []
+    for name, summary in results.items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        if summary["latency_ms"]["p95"] > before["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['latency_ms']['p95']} -> {summary['latency_ms']['p95']} ms")
+        if summary["aws_calls_per_request"]["mean"] > before["aws_calls_per_request"]["mean"]:
+            regressions.append(f"{name}: AWS calls/request {before['aws_calls_per_request']['mean']} -> "
+                               f"{summary['aws_calls_per_request']['mean']}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="aws-ui-benchmark-")
+    configure_environment(args, workdir)
+    from moto import mock_aws
+
+    with mock_aws():
+        print(f"Seeding {args.instances} instances, {args.buckets} buckets, {args.zones} zones x {args.records} records...")
+        state = seed(args, workdir)
+        print(f"Seeded in {state['seconds']}s.")
+        state.update(jobs=[], new_zones=[], changes=[])
+        started = time.time()
+        try:
+            results = asyncio.run(run_load(args, state))
+        finally:
+            if not state["pubkey_path"].startswith(workdir):
+                os.remove(state["pubkey_path"])
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "started_at": started,
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "seed": {key: value for key, value in state.items() if key in ("instances", "buckets", "zones", "records_per_zone", "seconds")},
+        "endpoints": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression}")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
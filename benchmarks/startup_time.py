@@ -0,0 +1,157 @@
+"""Measure how long the API takes to cold-start.
+
+Each run starts a fresh interpreter, so nothing is cached between runs:
+
+- import: time to import backend.main
+- ready: from spawning `python -m uvicorn backend.main:app` until `GET /` answers
+- first_request: the first `GET /api/ec2/list?fresh=1` after that, which needs the AWS clients
+
+The server runs against the in-memory AWS simulator (AWS_UI_PROVIDER=simulator) with no
+simulated latency, so only the app's own startup cost is measured.
+
+    python benchmarks/startup_time.py --runs 10
+    python benchmarks/startup_time.py --baseline benchmarks/results/startup-previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import backend.main; print(time.perf_counter() - started)"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=10, help="cold starts to measure")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for the server to answer")
+    parser.add_argument("--no-warm-up", action="store_true", help="disable the startup warm-up (AWS_UI_WARM_UP=0)")
+    parser.add_argument("--output", default=None, help="JSON results file (default: benchmarks/results/startup-<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown vs. the baseline (0.25 = 25%%)")
+    return parser.parse_args()
+
+
+def environment(args, workdir):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": ROOT,
+        "AWS_UI_PROVIDER": "simulator",
+        "AWS_UI_SIM_LATENCY_SCALE": "0",
+        "AWS_UI_SYNC_ENABLED": "0",
+        "AWS_UI_INVENTORY_DB": os.path.join(workdir, "inventory.sqlite3"),
+        "AWS_UI_WARM_UP": "0" if args.no_warm_up else "1",
+    })
+    return env
+
+
+def measure_import(env):
+    output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_server(env, timeout):
+    # Returns (seconds until GET / answered, seconds of the first AWS-backed request)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with status {server.returncode}")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"Server did not answer within {timeout}s")
+            try:
+                urllib.request.urlopen(f"{base_url}/", timeout=1).read()
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        ready = time.perf_counter() - started
+        request_started = time.perf_counter()
+        urllib.request.urlopen(f"{base_url}/api/ec2/list?fresh=1", timeout=timeout).read()
+        return ready, time.perf_counter() - request_started
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "min_ms": round(values[0] * 1000, 1),
+        "p50_ms": round(statistics.median(values) * 1000, 1),
+        "max_ms": round(values[-1] * 1000, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Measurements whose median grew by more than the tolerance
+    regressions = []
+    for name, summary in results.items():
+        before = baseline.get("startup", {}).get(name)
+        if before and summary["p50_ms"] > before["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {before['p50_ms']} -> {summary['p50_ms']} ms")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    args = parse_args()
+    samples = {"import": [], "ready": [], "first_request": []}
+    with tempfile.TemporaryDirectory(prefix="aws-ui-startup-") as workdir:
+        env = environment(args, workdir)
+        for run in range(1, args.runs + 1):
+            samples["import"].append(measure_import(env))
+            ready, first_request = measure_server(env, args.timeout)
+            samples["ready"].append(ready)
+            samples["first_request"].append(first_request)
+            print(f"run {run}: import {samples['import'][-1] * 1000:.0f} ms, ready {ready * 1000:.0f} ms, "
+                  f"first request {first_request * 1000:.0f} ms")
+
+    results = {name: summarize(values) for name, values in samples.items()}
+    report = {
+        "started_at": time.time(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "config": {"runs": args.runs, "warm_up": not args.no_warm_up},
+        "startup": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", time.strftime("startup-%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, summary in results.items():
+        print(f"{name}: p50 {summary['p50_ms']} ms (min {summary['min_ms']}, max {summary['max_ms']})")
+    print(f"Results written to {output}")
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression}")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Must happen before the backend is imported, as its modules read the env at import time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="aws-ui-tests-")
+os.environ.update({
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_UI_INVENTORY_DB": os.path.join(WORKDIR, "inventory.sqlite3"),
+    "AWS_UI_SYNC_ENABLED": "0",
+    "AWS_UI_WARM_UP": "0",
+    "AWS_UI_RATE_LIMIT_ENABLED": "0",
+})
+for name in ("AWS_PROFILE", "AWS_UI_SHARED_STATE", "AWS_UI_PROVIDER"):
+    os.environ.pop(name, None)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def aws():
+    # moto stands in for AWS; the backend builds its clients lazily, inside the mock
+    from moto import mock_aws
+    from backend.functions import aws_clients
+
+    with mock_aws():
+        yield
+    aws_clients._clients.clear()
@@ -0,0 +1,54 @@
+import boto3
+import pytest
+from backend.functions import ec2_functions
+from backend.functions.ec2_functions import MAX_RUNNING_INSTANCES, _launch_instances
+from backend.functions.instance_index import InstanceIndex
+
+
+@pytest.fixture
+def launch_spec(aws, monkeypatch):
+    # Every test starts from an empty account, so nothing may be remembered from the last one
+    monkeypatch.setattr(ec2_functions, "_recent_launches", {})
+    monkeypatch.setattr(ec2_functions, "instance_index", InstanceIndex())
+    ec2 = boto3.client("ec2")
+    vpc_id = ec2.create_vpc(CidrBlock="10.0.0.0/16")["Vpc"]["VpcId"]
+    subnet_id = ec2.create_subnet(VpcId=vpc_id, CidrBlock="10.0.0.0/20")["Subnet"]["SubnetId"]
+    security_group = ec2.create_security_group(GroupName="tests", Description="tests", VpcId=vpc_id)["GroupId"]
+    ec2.create_key_pair(KeyName="tests")
+    return {
+        "ami": ec2.describe_images(Owners=["amazon"])["Images"][0]["ImageId"],
+        "user_data": "#!/bin/bash\n",
+        "user_data_sha256": "0" * 64,
+        "subnet_id": subnet_id,
+        "security_group": security_group,
+        "key_name": "tests",
+    }
+
+
+def names(prefix, count):
+    return [f"{prefix}-{number}" for number in range(count)]
+
+
+def test_batch_over_the_quota_is_refused(launch_spec):
+    result = _launch_instances(names("big", MAX_RUNNING_INSTANCES + 1), "t3.micro", launch_spec)
+    assert result["error"].startswith(f"Maximum running instances is {MAX_RUNNING_INSTANCES}.")
+    assert not boto3.client("ec2").describe_instances()["Reservations"]
+
+
+def test_recent_launches_count_against_the_quota(launch_spec):
+    result = _launch_instances(names("web", MAX_RUNNING_INSTANCES), "t3.micro", launch_spec)
+    assert [instance["name"] for instance in result["instances"]] == names("web", MAX_RUNNING_INSTANCES)
+    assert all(instance["id"] for instance in result["instances"])
+
+    result = _launch_instances(["one-more"], "t3.micro", launch_spec)
+    assert "error" in result
+    assert f"while {MAX_RUNNING_INSTANCES} are running or pending" in result["error"]
+
+
+def test_instances_are_named_at_launch(launch_spec):
+    result = _launch_instances(["named"], "t3.micro", launch_spec)
+    instance_id = result["instances"][0]["id"]
+    reservations = boto3.client("ec2").describe_instances(InstanceIds=[instance_id])["Reservations"]
+    tags = {tag["Key"]: tag["Value"] for tag in reservations[0]["Instances"][0]["Tags"]}
+    assert tags["Name"] == "named"
+    assert tags["cli-managed"] == "true"
@@ -0,0 +1,34 @@
+import time
+from backend.functions.instance_index import InstanceIndex
+
+
+def instance(instance_id, name, state="running"):
+    return {"id": instance_id, "name": name, "state": state}
+
+
+def test_names_marked_while_listing_stay_dirty():
+    index = InstanceIndex()
+    started = time.monotonic()
+    # Marked while the listing was still being read, so the listing may predate the change
+    index.mark_changed(names=["web"])
+    index.ingest([instance("i-1", "web"), instance("i-2", "db")], started)
+    with index._lock:
+        assert index._needs_refresh("web")
+        assert not index._needs_refresh("db")
+
+
+def test_names_marked_before_listing_are_cleared():
+    index = InstanceIndex()
+    index.mark_changed(names=["web"])
+    index.ingest([instance("i-1", "web")], time.monotonic())
+    with index._lock:
+        assert not index._needs_refresh("web")
+
+
+def test_older_listing_does_not_replace_a_newer_one():
+    index = InstanceIndex()
+    started = time.monotonic()
+    index.ingest([instance("i-1", "renamed")], time.monotonic())
+    index.ingest([instance("i-1", "web")], started)
+    with index._lock:
+        assert index._instances["i-1"] == ("renamed", "running")
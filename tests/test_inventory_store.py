@@ -0,0 +1,38 @@
+import pytest
+from backend.functions.inventory_store import InventoryStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return InventoryStore(str(tmp_path / "inventory.sqlite3"))
+
+
+def replace(store, items):
+    return store.replace("route53_records", "Z1", items, lambda item: item["Name"])
+
+
+def records(count):
+    return [{"Name": f"r{number}.example.com.", "Value": "192.0.2.1"} for number in range(count)]
+
+
+def test_first_sync_upserts_every_row(store):
+    diff = replace(store, records(5))
+    assert len(diff["upserted"]) == 5
+    assert diff["removed"] == []
+
+
+def test_rows_that_only_moved_are_not_in_the_diff(store):
+    items = records(22)
+    replace(store, items)
+    diff = replace(store, items[2:])
+    assert diff == {"upserted": [], "removed": ["r0.example.com.", "r1.example.com."]}
+    assert store.read("route53_records", "Z1") == items[2:]
+    assert store.sync_state("route53_records", "Z1")[0]["changed"] == 2
+
+
+def test_changed_rows_are_upserted(store):
+    items = records(3)
+    replace(store, items)
+    updated = {**items[1], "Value": "192.0.2.2"}
+    diff = replace(store, [items[0], updated, items[2]])
+    assert diff == {"upserted": [{"id": updated["Name"], "item": updated}], "removed": []}
@@ -0,0 +1,80 @@
+import threading
+import boto3
+import pytest
+from backend.functions import record_index as record_index_module
+from backend.functions.record_index import RecordIndex
+
+
+@pytest.fixture
+def zones(aws):
+    route53 = boto3.client("route53")
+    zone_ids = []
+    for name in ("one.example.com", "two.example.com"):
+        zone_id = route53.create_hosted_zone(Name=name, CallerReference=name)["HostedZone"]["Id"].split("/")[-1]
+        route53.change_resource_record_sets(HostedZoneId=zone_id, ChangeBatch={"Changes": [upsert(f"www.{name}.")]})
+        zone_ids.append(zone_id)
+    return zone_ids
+
+
+def upsert(name, value="192.0.2.1", action="UPSERT"):
+    return {
+        "Action": action,
+        "ResourceRecordSet": {"Name": name, "Type": "A", "TTL": 300, "ResourceRecords": [{"Value": value}]},
+    }
+
+
+def slow_zone(monkeypatch, slow_zone_id):
+    # Holds the full listing of one zone until released, as a large zone would
+    loading, release = threading.Event(), threading.Event()
+    iter_zone = record_index_module._iter_zone
+
+    def blocking_iter_zone(zone_id):
+        records = list(iter_zone(zone_id))
+        if zone_id == slow_zone_id:
+            loading.set()
+            assert release.wait(5)
+        return records
+    monkeypatch.setattr(record_index_module, "_iter_zone", blocking_iter_zone)
+    return loading, release
+
+
+def test_loading_one_zone_does_not_block_another(zones, monkeypatch):
+    index = RecordIndex()
+    loading, release = slow_zone(monkeypatch, zones[0])
+    loader = threading.Thread(target=index.records_for, args=(zones[0], "www.one.example.com"))
+    loader.start()
+    assert loading.wait(5)
+    found = []
+    reader = threading.Thread(target=lambda: found.append(index.get(zones[1], "www.two.example.com", "A")))
+    reader.start()
+    reader.join(2)
+    answered = list(found)
+    release.set()
+    loader.join()
+    reader.join()
+    assert answered and answered[0] is not None
+    assert index.get(zones[0], "www.one.example.com", "A") is not None
+
+
+def test_change_applied_during_a_load_is_kept(zones, monkeypatch):
+    index = RecordIndex()
+    loading, release = slow_zone(monkeypatch, zones[0])
+    loader = threading.Thread(target=index.records_for, args=(zones[0], "www.one.example.com"))
+    loader.start()
+    assert loading.wait(5)
+    index.apply(zones[0], [upsert("api.one.example.com.", "192.0.2.9"), upsert("www.one.example.com.", action="DELETE")])
+    release.set()
+    loader.join()
+    assert index.get(zones[0], "api.one.example.com", "A")["ResourceRecords"] == [{"Value": "192.0.2.9"}]
+    assert index.get(zones[0], "www.one.example.com", "A") is None
+
+
+def test_missing_name_is_looked_up_once(zones, monkeypatch):
+    index = RecordIndex()
+    index.records_for(zones[0], "www.one.example.com")
+    lookups = []
+    lookup = record_index_module._lookup
+    monkeypatch.setattr(record_index_module, "_lookup", lambda *args: lookups.append(args) or lookup(*args))
+    assert index.records_for(zones[0], "nothing.one.example.com") == {}
+    assert index.records_for(zones[0], "nothing.one.example.com") == {}
+    assert len(lookups) == 1
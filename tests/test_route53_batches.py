@@ -0,0 +1,54 @@
+from backend.functions.route53_functions import (
+    MAX_BATCH_CHANGES,
+    MAX_BATCH_RECORDS,
+    MAX_BATCH_VALUE_CHARS,
+    _change_batches,
+)
+
+
+def change(action="CREATE", values=("192.0.2.1",), name="www.example.com."):
+    return {
+        "Action": action,
+        "ResourceRecordSet": {
+            "Name": name,
+            "Type": "A",
+            "TTL": 300,
+            "ResourceRecords": [{"Value": value} for value in values],
+        },
+    }
+
+
+def test_small_request_is_one_batch():
+    changes = [change(), change(action="DELETE"), change(action="UPSERT")]
+    assert list(_change_batches(changes)) == [changes]
+
+
+def test_change_count_limit():
+    changes = [change(action="DELETE", values=()) for _ in range(MAX_BATCH_CHANGES + 1)]
+    batches = list(_change_batches(changes))
+    assert [len(batch) for batch in batches] == [MAX_BATCH_CHANGES, 1]
+
+
+def test_record_limit_counts_upserts_twice():
+    # Each UPSERT of 10 values counts as 20 records
+    changes = [change(action="UPSERT", values=[f"192.0.2.{i}" for i in range(10)]) for _ in range(60)]
+    batches = list(_change_batches(changes))
+    assert [len(batch) for batch in batches] == [MAX_BATCH_RECORDS // 20, 10]
+
+
+def test_value_character_limit():
+    value = "x" * 255
+    per_change = 10 * len(value)
+    changes = [change(values=[value] * 10) for _ in range(20)]
+    batches = list(_change_batches(changes))
+    assert len(batches[0]) == MAX_BATCH_VALUE_CHARS // per_change
+    assert sum(len(batch) for batch in batches) == 20
+    for batch in batches:
+        assert sum(len(record["Value"]) for c in batch for record in c["ResourceRecordSet"]["ResourceRecords"]) <= MAX_BATCH_VALUE_CHARS
+
+
+def test_oversized_change_gets_its_own_batch():
+    big = change(values=[f"192.0.2.{i % 250}" for i in range(MAX_BATCH_RECORDS + 5)])
+    batches = list(_change_batches([change(), big, change()]))
+    assert [len(batch) for batch in batches] == [1, 1, 1]
+    assert batches[1] == [big]
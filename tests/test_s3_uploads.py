@@ -0,0 +1,96 @@
+import asyncio
+import os
+import time
+import boto3
+import pytest
+from backend.functions import s3_uploads
+from backend.functions.jobs import jobs
+from backend.functions.s3_uploads import (
+    MAX_PART_SIZE,
+    MAX_PARTS,
+    MIN_PART_SIZE,
+    PART_GROWTH_INTERVAL,
+    _part_size,
+    start_upload,
+    stream_upload,
+    upload_status,
+)
+
+BUCKET = "upload-bucket"
+BODY = os.urandom(2 * MIN_PART_SIZE + 1000)
+
+
+@pytest.fixture
+def bucket(aws):
+    s3 = boto3.client("s3")
+    s3.create_bucket(Bucket=BUCKET)
+    s3.put_bucket_tagging(Bucket=BUCKET, Tagging={"TagSet": [{"Key": "cli-managed", "Value": "true"}]})
+    return s3
+
+
+async def chunks(data, fail_after=None, size=1024 * 1024):
+    # The request body as it arrives; fail_after cuts the connection after that many bytes
+    for start in range(0, len(data), size):
+        if fail_after is not None and start >= fail_after:
+            raise ConnectionError("client went away")
+        yield data[start:start + size]
+
+
+def upload(job_id, data, offset=0, fail_after=None):
+    return asyncio.run(stream_upload(job_id, chunks(data, fail_after), offset=offset))
+
+
+def test_interrupted_upload_resumes_at_first_missing_part(bucket):
+    job = start_upload(BUCKET, "file.bin", part_size=MIN_PART_SIZE)
+    with pytest.raises(ConnectionError):
+        upload(job["job_id"], BODY, fail_after=2 * MIN_PART_SIZE)
+
+    failed = jobs.get(job["job_id"])
+    assert failed["status"] == "failed"
+    assert failed["resume_offset"] == 2 * MIN_PART_SIZE
+    assert upload_status(job["job_id"])["resume_offset"] == 2 * MIN_PART_SIZE
+
+    with pytest.raises(Exception, match=f"must continue at byte {2 * MIN_PART_SIZE}"):
+        upload(job["job_id"], BODY[MIN_PART_SIZE:], offset=MIN_PART_SIZE)
+
+    done = upload(job["job_id"], BODY[2 * MIN_PART_SIZE:], offset=2 * MIN_PART_SIZE)
+    assert done["status"] == "completed"
+    assert bucket.get_object(Bucket=BUCKET, Key="file.bin")["Body"].read() == BODY
+
+
+def test_live_upload_is_not_resumed_twice(bucket):
+    job = start_upload(BUCKET, "live.bin", part_size=MIN_PART_SIZE)
+    jobs.update(job["job_id"], status="uploading", heartbeat_at=time.time())
+    with pytest.raises(Exception, match="is uploading"):
+        upload(job["job_id"], BODY)
+
+
+def test_stale_upload_can_be_resumed(bucket):
+    job = start_upload(BUCKET, "stale.bin", part_size=MIN_PART_SIZE)
+    # The worker that was uploading stopped sending heartbeats
+    jobs.update(job["job_id"], status="uploading", heartbeat_at=time.time() - s3_uploads.STALE_UPLOAD_AFTER - 1)
+    assert upload_status(job["job_id"])["status"] == "failed"
+    assert upload(job["job_id"], BODY)["status"] == "completed"
+    assert bucket.get_object(Bucket=BUCKET, Key="stale.bin")["ContentLength"] == len(BODY)
+
+
+def test_upload_past_the_part_limit_fails(bucket, monkeypatch):
+    monkeypatch.setattr(s3_uploads, "MAX_PARTS", 2)
+    job = start_upload(BUCKET, "big.bin", part_size=MIN_PART_SIZE)
+    with pytest.raises(Exception, match="limit of 2 parts"):
+        upload(job["job_id"], BODY)
+    assert jobs.get(job["job_id"])["resume_offset"] == 2 * MIN_PART_SIZE
+
+
+def test_part_size_grows_for_unknown_lengths():
+    assert _part_size(MIN_PART_SIZE, 1) == MIN_PART_SIZE
+    assert _part_size(MIN_PART_SIZE, PART_GROWTH_INTERVAL) == MIN_PART_SIZE
+    assert _part_size(MIN_PART_SIZE, PART_GROWTH_INTERVAL + 1) == 2 * MIN_PART_SIZE
+    assert _part_size(MIN_PART_SIZE, MAX_PARTS) <= MAX_PART_SIZE
+
+
+def test_part_size_fits_known_lengths_in_the_part_limit():
+    total = 100 * 1024 ** 3
+    size = _part_size(MIN_PART_SIZE, 1, total)
+    assert size * MAX_PARTS >= total
+    assert _part_size(MIN_PART_SIZE, 1, 10 * MIN_PART_SIZE) == MIN_PART_SIZE
@@ -0,0 +1,67 @@
+import threading
+import time
+import pytest
+from backend.functions.shared_state import SharedState, SQLiteStore, _claim
+
+
+@pytest.fixture
+def state(tmp_path):
+    state = SharedState("sqlite")
+    state._store = SQLiteStore(str(tmp_path / "shared.sqlite3"))
+    return state
+
+
+def hold(state, name, seconds, lease=15):
+    # Holds the lock on another thread (as another worker would); returns once it is held
+    held = threading.Event()
+
+    def run():
+        with state.lock(name, timeout=1, lease=lease) as acquired:
+            assert acquired
+            held.set()
+            time.sleep(seconds)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert held.wait(1)
+    return thread
+
+
+def test_lock_without_shared_state_is_always_acquired():
+    with SharedState("").lock("anything", timeout=0) as acquired:
+        assert acquired
+
+
+def test_lock_times_out_while_held(state):
+    holder = hold(state, "launch", 0.5)
+    started = time.monotonic()
+    with state.lock("launch", timeout=0.2) as acquired:
+        assert not acquired
+    assert 0.2 <= time.monotonic() - started < 0.5
+    holder.join()
+    with state.lock("launch", timeout=0.2) as acquired:
+        assert acquired
+
+
+def test_waiter_gets_lock_once_released(state):
+    holder = hold(state, "launch", 0.2)
+    with state.lock("launch", timeout=2) as acquired:
+        assert acquired
+    holder.join()
+
+
+def test_lock_of_dead_holder_expires(state):
+    # A claim nobody renews, as left behind by a worker that died holding the lock
+    state.store.update("locks", "launch", lambda held: _claim(held, "dead-worker"), ttl=0.3)
+    with state.lock("launch", timeout=0.1) as acquired:
+        assert not acquired
+    with state.lock("launch", timeout=2) as acquired:
+        assert acquired
+
+
+def test_held_lock_is_renewed_past_its_lease(state):
+    holder = hold(state, "sync", 1.0, lease=0.3)
+    time.sleep(0.6)
+    with state.lock("sync", timeout=0.1) as acquired:
+        assert not acquired
+    holder.join()